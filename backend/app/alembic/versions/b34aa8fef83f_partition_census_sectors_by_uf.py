@@ -0,0 +1,97 @@
+"""Partition census sectors by UF
+
+Revision ID: b34aa8fef83f
+Revises: be7f489db732
+Create Date: 2026-10-19 23:41:52.117604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b34aa8fef83f'
+down_revision = 'be7f489db732'
+branch_labels = None
+depends_on = None
+
+# CD_UF das 27 UFs; códigos inesperados caem na partição default
+UF_CODES = [
+    "11", "12", "13", "14", "15", "16", "17",
+    "21", "22", "23", "24", "25", "26", "27", "28", "29",
+    "31", "32", "33", "35",
+    "41", "42", "43",
+    "50", "51", "52", "53",
+]
+
+GEOHASH_KEY = "ST_GeoHash(ST_PointOnSurface(geom), 10)"
+
+COLUMNS = "id, code, city_code, uf_code, properties, geom"
+
+
+def _create_indexes() -> None:
+    op.create_index('ix_census_sectors_code', 'census_sectors', ['code', 'uf_code'], unique=True)
+    op.create_index(op.f('ix_census_sectors_city_code'), 'census_sectors', ['city_code'], unique=False)
+    op.create_index(op.f('ix_census_sectors_id'), 'census_sectors', ['id'], unique=False)
+    op.create_index('idx_census_sectors_geom', 'census_sectors', ['geom'], unique=False, postgresql_using='gist')
+
+
+def upgrade() -> None:
+    # Tabela nova particionada; os dados são copiados já na ordem (UF, geohash), então
+    # cada partição nasce fisicamente agrupada no espaço.
+    op.execute("""
+        CREATE TABLE census_sectors_new (
+            id SERIAL NOT NULL,
+            code VARCHAR NOT NULL,
+            city_code VARCHAR NOT NULL,
+            uf_code VARCHAR(2) NOT NULL,
+            properties JSONB,
+            geom geometry(MULTIPOLYGON, 4326),
+            CONSTRAINT census_sectors_new_pkey PRIMARY KEY (id, uf_code)
+        ) PARTITION BY LIST (uf_code)
+    """)
+    for uf in UF_CODES:
+        op.execute(f"CREATE TABLE census_sectors_{uf} PARTITION OF census_sectors_new FOR VALUES IN ('{uf}')")
+    op.execute("CREATE TABLE census_sectors_default PARTITION OF census_sectors_new DEFAULT")
+
+    op.execute(f"""
+        INSERT INTO census_sectors_new ({COLUMNS})
+        SELECT {COLUMNS} FROM census_sectors
+        ORDER BY uf_code, {GEOHASH_KEY}
+    """)
+    op.execute("SELECT setval('census_sectors_new_id_seq', COALESCE((SELECT MAX(id) FROM census_sectors_new), 0) + 1, false)")
+
+    op.drop_table('census_sectors')
+    op.execute("ALTER TABLE census_sectors_new RENAME TO census_sectors")
+    op.execute("ALTER TABLE census_sectors RENAME CONSTRAINT census_sectors_new_pkey TO census_sectors_pkey")
+    op.execute("ALTER SEQUENCE census_sectors_new_id_seq RENAME TO census_sectors_id_seq")
+
+    # Índices depois da carga (uma ordenação em vez de inserção linha a linha)
+    _create_indexes()
+    op.execute(f"CREATE INDEX ix_census_sectors_geohash ON census_sectors ({GEOHASH_KEY})")
+
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE TABLE census_sectors_old (
+            id SERIAL NOT NULL,
+            code VARCHAR NOT NULL,
+            city_code VARCHAR NOT NULL,
+            uf_code VARCHAR(2) NOT NULL,
+            properties JSONB,
+            geom geometry(MULTIPOLYGON, 4326),
+            CONSTRAINT census_sectors_old_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute(f"INSERT INTO census_sectors_old ({COLUMNS}) SELECT {COLUMNS} FROM census_sectors ORDER BY id")
+    op.execute("SELECT setval('census_sectors_old_id_seq', COALESCE((SELECT MAX(id) FROM census_sectors_old), 0) + 1, false)")
+
+    op.drop_table('census_sectors')  # Leva as partições junto
+    op.execute("ALTER TABLE census_sectors_old RENAME TO census_sectors")
+    op.execute("ALTER TABLE census_sectors RENAME CONSTRAINT census_sectors_old_pkey TO census_sectors_pkey")
+    op.execute("ALTER SEQUENCE census_sectors_old_id_seq RENAME TO census_sectors_id_seq")
+
+    op.create_index(op.f('ix_census_sectors_code'), 'census_sectors', ['code'], unique=True)
+    op.create_index(op.f('ix_census_sectors_city_code'), 'census_sectors', ['city_code'], unique=False)
+    op.create_index(op.f('ix_census_sectors_id'), 'census_sectors', ['id'], unique=False)
+    op.create_index('idx_census_sectors_geom', 'census_sectors', ['geom'], unique=False, postgresql_using='gist')
@@ -0,0 +1,40 @@
+"""Add geohash cluster keys to cities and districts
+
+Revision ID: be7f489db732
+Revises: b9344de546ed
+Create Date: 2026-10-19 23:18:09.642317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'be7f489db732'
+down_revision = 'b9344de546ed'
+branch_labels = None
+depends_on = None
+
+# Chave de ordenação física: geohash (curva Z) de um ponto interno. Polígonos vizinhos
+# ficam em páginas vizinhas depois do CLUSTER (python -m app.maintenance cluster).
+# Índice de expressão: o Alembic não reflete, então fica só aqui (não no modelo).
+GEOHASH_KEY = "ST_GeoHash(ST_PointOnSurface(geom), 10)"
+
+
+def upgrade() -> None:
+    op.execute(f"CREATE INDEX ix_cities_geohash ON cities ({GEOHASH_KEY})")
+    op.execute(f"CREATE INDEX ix_districts_geohash ON districts ({GEOHASH_KEY})")
+    # Marca o índice de clustering: `CLUSTER cities` (sem USING) passa a usá-lo
+    op.execute("ALTER TABLE cities CLUSTER ON ix_cities_geohash")
+    op.execute("ALTER TABLE districts CLUSTER ON ix_districts_geohash")
+    # Espaço livre na página: updates de indicadores ficam na mesma página (HOT) e não
+    # desfazem a ordem física a cada refresh
+    op.execute("ALTER TABLE cities SET (fillfactor = 90)")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE cities RESET (fillfactor)")
+    op.execute("ALTER TABLE districts SET WITHOUT CLUSTER")
+    op.execute("ALTER TABLE cities SET WITHOUT CLUSTER")
+    op.drop_index('ix_districts_geohash', table_name='districts')
+    op.drop_index('ix_cities_geohash', table_name='cities')
@@ -1,18 +1,30 @@
 # backend/app/api/deps.py
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy import select
+from app.core.admission import rate_limiter, heavy_limiter
+from app.core.cache import cache
 from app.core.config import settings
-from app.core.database import get_db
-from app.core.security import verify_password
+from app.core.database import (
+    get_db, AsyncSessionLocal, ReplicaSessionLocal, replica_monitor, current_wal_lsn
+)
+from app.core.lifecycle import etl_tracker
+from app.core.security import verify_password, token_subject
 from app.models.user import User
+from app.repositories.city_repository import MAP_FIELDS
 from app.schemas.auth import TokenData
+from typing import AsyncGenerator, Optional, Tuple
 
 # Define que o token vem do header "Authorization: Bearer <token>"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Read-your-writes: LSN do último import do cliente (cookie no navegador, header para scripts)
+MIN_LSN_COOKIE = "min_lsn"
+MIN_LSN_HEADER = "X-Min-LSN"
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     """
     Decodifica o token, extrai o usuário e busca no banco.
@@ -39,4 +51,118 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    return user
+
+def get_bbox(
+    bbox: Optional[str] = Query(None, description="minLon,minLat,maxLon,maxLat (EPSG:4326)")
+) -> Optional[Tuple[float, float, float, float]]:
+    """Converte o parâmetro ?bbox= em tupla. 400 se mal formatado."""
+    if not bbox:
+        return None
+    try:
+        min_x, min_y, max_x, max_y = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox deve ser minLon,minLat,maxLon,maxLat")
+    if min_x >= max_x or min_y >= max_y:
+        raise HTTPException(status_code=400, detail="bbox inválido (min >= max)")
+    return (min_x, min_y, max_x, max_y)
+
+def parse_map_fields(fields: Optional[str] = Query(
+    None, description=f"Propriedades separadas por vírgula (code sempre vem). Opções: {','.join(MAP_FIELDS)}"
+)) -> Optional[tuple]:
+    """?fields=name,population -> ("name", "population"). 400 se algum campo não existir."""
+    if not fields:
+        return None
+    requested = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in MAP_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos desconhecidos: {', '.join(unknown)}")
+    return requested
+
+def rate_limit(lane: str):
+    """
+    Dependência: token bucket da faixa ("read", "heavy", "etl") para o cliente.
+    Cliente = usuário do JWT (sem ida ao banco) ou, sem login, o IP. 429 + Retry-After.
+    """
+    async def dependency(request: Request):
+        user = token_subject(request.headers.get("authorization"))
+        ip = request.client.host if request.client else None
+        await rate_limiter.check(lane, user, ip)
+    return dependency
+
+async def heavy_read_slot():
+    """
+    Vaga entre as HEAVY_READ_MAX_CONCURRENT leituras pesadas do worker (fila com timeout).
+    Liberada só depois que a resposta termina de ser enviada (inclusive streams do /export):
+    depende do FastAPI >= 0.118, que roda a saída de dependências com yield após a resposta
+    (de 0.106 a 0.117 ela rodava antes do corpo e o teto não valia para o stream).
+    """
+    async with heavy_limiter.slot():
+        yield
+
+def ensure_etl_accepted():
+    """Recusa novos ETLs enquanto o worker está desligando (os em andamento terminam)."""
+    if etl_tracker.draining:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor reiniciando; tente novamente.",
+            headers={"Retry-After": "10"},
+        )
+
+async def choose_read_sessionmaker(
+    request: Request,
+    cache_namespace: Optional[str] = None
+) -> async_sessionmaker:
+    """
+    Decide onde uma leitura roda. Réplica só quando ela está configurada, com lag
+    aceitável e já aplicou o último import deste cliente (LSN do cookie/header).
+    Com cache_namespace: logo após uma escrita nele, lê do primário, senão o cache
+    seria preenchido com o dado anterior e ficaria velho até a próxima invalidação.
+    """
+    if not await replica_monitor.available():
+        return AsyncSessionLocal
+    if cache_namespace and cache.invalidated_within(cache_namespace, replica_monitor.staleness_bound):
+        return AsyncSessionLocal
+    min_lsn = request.headers.get(MIN_LSN_HEADER) or request.cookies.get(MIN_LSN_COOKIE)
+    if min_lsn and not await replica_monitor.has_replayed(min_lsn):
+        return AsyncSessionLocal
+    return ReplicaSessionLocal
+
+async def _read_session(request: Request, cache_namespace: Optional[str]) -> AsyncGenerator[AsyncSession, None]:
+    factory = await choose_read_sessionmaker(request, cache_namespace)
+    session = factory()
+    if factory is not AsyncSessionLocal:
+        try:
+            await session.connection()  # Conecta já: réplica caída => primário, não 500
+        except (OSError, DBAPIError) as e:
+            await session.close()
+            replica_monitor.mark_unavailable(e)
+            session = AsyncSessionLocal()
+    try:
+        yield session
+    finally:
+        await session.close()
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Sessão para rotas só de leitura (réplica quando possível, senão primário)."""
+    async for session in _read_session(request, None):
+        yield session
+
+def get_cached_read_db(cache_namespace: str):
+    """get_read_db para rotas que preenchem o cache `cache_namespace` (Ex: "map")."""
+    async def dependency(request: Request) -> AsyncGenerator[AsyncSession, None]:
+        async for session in _read_session(request, cache_namespace):
+            yield session
+    return dependency
+
+async def remember_write(response: Response, db: AsyncSession) -> None:
+    """
+    Após um import (já commitado), devolve o LSN do primário ao cliente: as próximas
+    leituras dele só vão para a réplica quando ela tiver aplicado até esse ponto.
+    """
+    if ReplicaSessionLocal is None:
+        return
+    lsn = await current_wal_lsn(db)
+    response.set_cookie(MIN_LSN_COOKIE, lsn, max_age=settings.READ_YOUR_WRITES_SECONDS,
+                        httponly=True, samesite="lax")
+    response.headers[MIN_LSN_HEADER] = lsn
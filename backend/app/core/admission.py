@@ -0,0 +1,244 @@
+# app/core/admission.py
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import text
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class AdmissionRejected(Exception):
+    """Pedido recusado (limite de taxa ou fila cheia). retry_after em segundos."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# --- TOKEN BUCKET (taxa por cliente) ---
+
+@dataclass(frozen=True)
+class RateLimit:
+    rate: float   # Tokens repostos por segundo
+    burst: int    # Capacidade do balde (rajada permitida)
+
+def lane_limit(lane: str, authenticated: bool) -> RateLimit:
+    """
+    Limites por faixa: "read" (leituras baratas, cacheadas), "heavy" (export, polígono)
+    e "etl" (imports, refresh). Usuários logados ganham RATE_LIMIT_USER_MULTIPLIER.
+    """
+    rate, burst = {
+        "read": (settings.RATE_LIMIT_READ_PER_SECOND, settings.RATE_LIMIT_READ_BURST),
+        "heavy": (settings.RATE_LIMIT_HEAVY_PER_SECOND, settings.RATE_LIMIT_HEAVY_BURST),
+        "etl": (settings.RATE_LIMIT_ETL_PER_SECOND, settings.RATE_LIMIT_ETL_BURST),
+    }[lane]
+    if authenticated:
+        rate, burst = rate * settings.RATE_LIMIT_USER_MULTIPLIER, int(burst * settings.RATE_LIMIT_USER_MULTIPLIER)
+    return RateLimit(rate=rate, burst=burst)
+
+
+class MemoryBucketStore:
+    """Baldes no processo. Com N workers, o limite efetivo por cliente é até N vezes maior."""
+
+    # Baldes cheios há muito tempo são descartados quando o dicionário passa disso
+    MAX_KEYS = 100_000
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, atualizado em)
+
+    async def take(self, key: str, limit: RateLimit, cost: float = 1.0) -> float:
+        """Consome `cost` tokens. Retorna 0 se permitido, senão segundos até haver saldo."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (float(limit.burst), now))
+        tokens = min(float(limit.burst), tokens + (now - updated) * limit.rate)
+        if tokens >= cost:
+            self._buckets[key] = (tokens - cost, now)
+            wait = 0.0
+        else:
+            self._buckets[key] = (tokens, now)
+            wait = (cost - tokens) / limit.rate
+        if len(self._buckets) > self.MAX_KEYS:
+            self._prune(now, limit)
+        return wait
+
+    def _prune(self, now: float, limit: RateLimit) -> None:
+        # Balde que já teria enchido de novo equivale a balde inexistente
+        full_after = limit.burst / limit.rate
+        self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < full_after}
+
+
+class PostgresBucketStore:
+    """
+    Baldes na tabela UNLOGGED rate_limit_buckets: limite único entre todos os workers.
+    Um UPSERT atômico por pedido (o lock da linha serializa o mesmo cliente).
+    Banco indisponível => deixa passar (o limitador não pode derrubar a API).
+    """
+
+    _REFILLED = ("LEAST(CAST(:burst AS float8), b.tokens"
+                 " + EXTRACT(EPOCH FROM now() - b.updated_at)::float8 * CAST(:rate AS float8))")
+    TAKE_SQL = text(f"""
+        INSERT INTO rate_limit_buckets AS b (key, tokens, allowed, updated_at)
+        VALUES (:key, CAST(:burst AS float8) - CAST(:cost AS float8), true, now())
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = CASE WHEN {_REFILLED} >= CAST(:cost AS float8)
+                          THEN {_REFILLED} - CAST(:cost AS float8) ELSE {_REFILLED} END,
+            allowed = {_REFILLED} >= CAST(:cost AS float8),
+            updated_at = now()
+        RETURNING allowed, tokens
+    """)
+
+    async def take(self, key: str, limit: RateLimit, cost: float = 1.0) -> float:
+        from app.core.database import engine
+
+        try:
+            async with engine.begin() as conn:
+                row = (await conn.execute(self.TAKE_SQL, {
+                    "key": key, "rate": limit.rate, "burst": float(limit.burst), "cost": cost
+                })).one()
+        except Exception as e:
+            logger.warning(f"Rate limit no Postgres indisponível ({type(e).__name__}); liberando pedido.")
+            return 0.0
+        return 0.0 if row.allowed else (cost - row.tokens) / limit.rate
+
+
+class RateLimiter:
+    """Token bucket por (faixa, cliente). Cliente = usuário do JWT ou, sem login, o IP."""
+
+    def __init__(self, store):
+        self.store = store
+        self.rejected: Dict[str, int] = {}
+
+    async def check(self, lane: str, user: Optional[str], ip: Optional[str]) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        key = f"{lane}:user:{user}" if user else f"{lane}:ip:{ip or 'unknown'}"
+        wait = await self.store.take(key, lane_limit(lane, authenticated=user is not None))
+        if wait > 0:
+            self.rejected[lane] = self.rejected.get(lane, 0) + 1
+            raise AdmissionRejected(f"Limite de requisições '{lane}' excedido.", retry_after=wait)
+
+
+# --- CONCORRÊNCIA (ETL e leituras pesadas) ---
+
+# Prioridade na fila (menor = antes): pedido de usuário passa na frente do refresh noturno
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+class ConcurrencyLimiter:
+    """
+    No máximo `limit` execuções simultâneas; as demais esperam numa fila por prioridade.
+    Como cada execução segura uma conexão do pool (e, no ETL, requisições ao IBGE),
+    o teto garante que sobram conexões para as leituras baratas, que não passam por aqui.
+
+    Pedidos interativos esperam até queue_timeout e são recusados (429) se a fila tiver
+    max_queue pedidos; tarefas em background esperam o tempo que for preciso.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future, bool]] = []  # heap (prioridade, ordem, future, background)
+        self._order = itertools.count()
+        self._avg_seconds = 10.0  # Média móvel da duração (estimativa do Retry-After)
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, f, _ in self._waiters if not f.done())
+
+    @property
+    def queued_interactive(self) -> int:
+        # Tarefas em background na fila não contam para o teto dos pedidos interativos
+        return sum(1 for _, _, f, background in self._waiters if not f.done() and not background)
+
+    def _retry_after(self) -> float:
+        return max(1.0, self._avg_seconds * (self.queued + 1) / self.limit)
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, background: bool = False) -> None:
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            return
+        if not background and self.queued_interactive >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(f"Fila de '{self.name}' cheia.", retry_after=self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future, background))
+        try:
+            await asyncio.wait_for(asyncio.shield(future), None if background else self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done():  # Ganhou a vaga no mesmo instante do timeout
+                return
+            future.cancel()
+            self.rejected += 1
+            raise AdmissionRejected(f"Tempo de espera na fila de '{self.name}' esgotado.",
+                                    retry_after=self._retry_after())
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # Vaga já era nossa: devolve
+            future.cancel()
+            raise
+
+    def release(self) -> None:
+        # A vaga passa direto para o próximo da fila (active não muda)
+        while self._waiters:
+            _, _, future, _ = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE, background: bool = False):
+        await self.acquire(priority, background)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - started)
+            self.release()
+
+    def snapshot(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "avg_seconds": round(self._avg_seconds, 2),
+        }
+
+
+# Instâncias únicas por processo
+rate_limiter = RateLimiter(PostgresBucketStore() if settings.RATE_LIMIT_STORE == "postgres" else MemoryBucketStore())
+etl_limiter = ConcurrencyLimiter(
+    "etl",
+    limit=settings.ETL_MAX_CONCURRENT,
+    max_queue=settings.ETL_MAX_QUEUED,
+    queue_timeout=settings.ETL_QUEUE_TIMEOUT_SECONDS,
+)
+heavy_limiter = ConcurrencyLimiter(
+    "heavy",
+    limit=settings.HEAVY_READ_MAX_CONCURRENT,
+    max_queue=settings.HEAVY_READ_MAX_QUEUED,
+    queue_timeout=settings.HEAVY_READ_QUEUE_TIMEOUT_SECONDS,
+)
+
+def admission_status() -> Dict:
+    return {
+        "rate_limit": {
+            "enabled": settings.RATE_LIMIT_ENABLED,
+            "store": settings.RATE_LIMIT_STORE,
+            "rejected": rate_limiter.rejected,
+        },
+        "etl": etl_limiter.snapshot(),
+        "heavy": heavy_limiter.snapshot(),
+    }
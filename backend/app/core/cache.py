@@ -0,0 +1,157 @@
+# app/core/cache.py
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# Canal do Postgres usado para invalidar os caches de TODOS os workers
+INVALIDATION_CHANNEL = "cache_invalidation"
+
+class LocalCache:
+    """
+    Cache em memória por namespace (Ex: "map").
+    Sem TTL: as entradas vivem até a próxima escrita que invalide o namespace
+    (Ex: save_full_city_data invalida "map" e apaga a chave da cidade em "city").
+    Com vários workers, cada processo tem o seu: use publish_invalidation para
+    que a escrita invalide todos (via LISTEN/NOTIFY, veja CacheInvalidationListener).
+
+    Leitura que começou antes de uma escrita não pode gravar depois da invalidação
+    (o snapshot antigo ficaria até a PRÓXIMA escrita): pegue generation() antes de ler
+    e passe para set(); se o namespace foi invalidado no meio, o set é descartado.
+    """
+
+    # Teto por namespace (Ex: "search" tem uma chave por termo digitado)
+    MAX_ENTRIES = 10_000
+
+    def __init__(self):
+        self._store: Dict[str, Dict[Hashable, Any]] = {}
+        # Quando cada namespace foi invalidado pela última vez (monotonic)
+        self._invalidated_at: Dict[str, float] = {}
+        self._cleared_at = float("-inf")
+        # Contador de invalidações por namespace (e do cache inteiro)
+        self._generations: Dict[str, int] = {}
+        self._clear_generation = 0
+
+    def get(self, namespace: str, key: Hashable) -> Optional[Any]:
+        return self._store.get(namespace, {}).get(key)
+
+    def generation(self, namespace: str) -> Tuple[int, int]:
+        """Marca tirada ANTES da leitura no banco; muda a cada invalidação do namespace."""
+        return self._generations.get(namespace, 0), self._clear_generation
+
+    def set(self, namespace: str, key: Hashable, value: Any,
+            generation: Optional[Tuple[int, int]] = None) -> None:
+        if generation is not None and generation != self.generation(namespace):
+            logger.debug(f"Cache '{namespace}' invalidado durante a leitura; descartando {key!r}.")
+            return
+        entries = self._store.setdefault(namespace, {})
+        if len(entries) >= self.MAX_ENTRIES and key not in entries:
+            entries.pop(next(iter(entries)))  # Remove a entrada mais antiga
+        entries[key] = value
+
+    def delete(self, namespace: str, key: Hashable) -> None:
+        self._store.get(namespace, {}).pop(key, None)
+        self._invalidated_at[namespace] = time.monotonic()
+        self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def invalidate(self, namespace: str) -> None:
+        self._invalidated_at[namespace] = time.monotonic()
+        self._generations[namespace] = self._generations.get(namespace, 0) + 1
+        if self._store.pop(namespace, None) is not None:
+            logger.info(f"🧹 Cache '{namespace}' invalidado.")
+
+    def clear(self) -> None:
+        self._store.clear()
+        self._cleared_at = time.monotonic()
+        self._clear_generation += 1
+
+    def invalidated_within(self, namespace: str, seconds: float) -> bool:
+        """
+        Houve escrita neste namespace nos últimos `seconds`? Usado para não preencher o
+        cache com leitura da réplica que talvez ainda não tenha aplicado essa escrita.
+        """
+        last = max(self._invalidated_at.get(namespace, float("-inf")), self._cleared_at)
+        return time.monotonic() - last < seconds
+
+    def apply(self, payload: str) -> None:
+        """Aplica uma mensagem de invalidação recebida de outro worker."""
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Mensagem de invalidação inválida: {payload!r}")
+            return
+        if message.get("key") is not None:
+            self.delete(message["namespace"], message["key"])
+        else:
+            self.invalidate(message["namespace"])
+
+# Instância única por processo
+cache = LocalCache()
+
+
+async def publish_invalidation(db: AsyncSession, namespace: str, key: Optional[str] = None) -> None:
+    """
+    Agenda a invalidação em todos os workers. Chame ANTES do commit: o NOTIFY só é
+    entregue se a transação confirmar (rollback => nada é invalidado).
+    O próprio processo também recebe a mensagem; quem escreve ainda invalida o cache
+    local logo após o commit para não depender do ida-e-volta.
+    """
+    payload = json.dumps({"namespace": namespace, "key": key})
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                     {"channel": INVALIDATION_CHANNEL, "payload": payload})
+
+
+class CacheInvalidationListener:
+    """
+    LISTEN numa conexão asyncpg dedicada (fora do pool) e aplica as invalidações no
+    cache local. Se a conexão cair, limpa o cache inteiro (mensagens podem ter sido
+    perdidas) e reconecta.
+    """
+
+    def __init__(self, dsn: str, reconnect_interval: float = 5.0):
+        # asyncpg não entende o prefixo do SQLAlchemy
+        self.dsn = dsn.replace("postgresql+asyncpg://", "postgresql://")
+        self.reconnect_interval = reconnect_interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        cache.apply(payload)
+
+    async def _run(self) -> None:
+        import asyncpg
+
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                await connection.add_listener(INVALIDATION_CHANNEL, self._on_notify)
+                # Escritas feitas enquanto estávamos desconectados não chegaram aqui
+                cache.clear()
+                logger.info(f"📡 Ouvindo invalidações de cache em '{INVALIDATION_CHANNEL}'.")
+                while not connection.is_closed():
+                    await asyncio.sleep(self.reconnect_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Listener de cache desconectado: {e}")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            cache.clear()
+            await asyncio.sleep(self.reconnect_interval)
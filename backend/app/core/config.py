@@ -5,6 +5,12 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "Atibaia Geo-Insights"
     DATABASE_URL: str
 
+    # RÉPLICA DE LEITURA (vazio = leituras também no primário)
+    DATABASE_REPLICA_URL: str = ""
+    REPLICA_MAX_LAG_SECONDS: float = 5.0     # Acima disso as leituras voltam para o primário
+    REPLICA_LAG_CHECK_SECONDS: float = 2.0   # Intervalo entre medições do lag
+    READ_YOUR_WRITES_SECONDS: int = 60       # Validade do cookie de LSN após um import
+
     # NOVAS CONFIGURAÇÕES DE SEGURANÇA
     # Em produção, isso DEVE vir de variáveis de ambiente (.env)
     # Gere uma string aleatória com: openssl rand -hex 32
@@ -12,6 +18,59 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # IBGE (sobrescreva para apontar para o mock em benchmarks/mock_ibge.py)
+    IBGE_API_URL: str = "https://servicodados.ibge.gov.br/api"
+    IBGE_TIMEOUT_SECONDS: float = 10.0          # Leitura (o catálogo e as malhas usam mais)
+    IBGE_CONNECT_TIMEOUT_SECONDS: float = 3.0   # IBGE fora do ar costuma falhar já na conexão
+
+    # CIRCUIT BREAKER (um por API do IBGE: localidades, agregados, malhas)
+    IBGE_BREAKER_FAILURE_RATE: float = 0.5      # Abre com >= 50% de falhas...
+    IBGE_BREAKER_MIN_CALLS: int = 5             # ...em pelo menos 5 chamadas...
+    IBGE_BREAKER_WINDOW: int = 20               # ...entre as 20 últimas
+    IBGE_BREAKER_RESET_SECONDS: float = 30.0    # Tempo aberto antes da chamada de teste
+
+    # REFRESH AGENDADO (Staleness via /periodos do IBGE)
+    REFRESH_BATCH_SIZE: int = 20                 # Cidades reimportadas por lote
+    REFRESH_BATCH_INTERVAL_SECONDS: float = 5.0  # Pausa entre lotes (rate limit)
+    REFRESH_MAX_CITIES: int = 500                # Teto de cidades por execução
+    PERIODS_CACHE_TTL_SECONDS: int = 3600
+
+    # SETORES CENSITÁRIOS (GeoServer WFS do IBGE)
+    IBGE_WFS_URL: str = "https://geoservicos.ibge.gov.br/geoserver/ows"
+    CENSUS_SECTOR_LAYER: str = ""   # Rode probe_ibge.py para descobrir o nome da camada
+    SECTOR_PAGE_SIZE: int = 1000    # Features por GetFeature (memória limitada por página)
+    SECTOR_SORT_BY: str = "CD_SETOR A"  # Ordem estável para a paginação por startIndex
+
+    # SERVIDOR (gunicorn.conf.py lê WEB_CONCURRENCY etc. direto do ambiente)
+    ETL_DRAIN_TIMEOUT_SECONDS: float = 120.0   # Espera por ETLs em andamento no desligamento
+
+    # ADMISSÃO: token bucket por cliente (usuário do JWT ou IP) e por faixa
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_STORE: str = "memory"             # "postgres" = limite único entre workers
+    RATE_LIMIT_READ_PER_SECOND: float = 10.0     # /map, /cities/search, /cities/{code}...
+    RATE_LIMIT_READ_BURST: int = 60              # Autocomplete digitando rápido cabe na rajada
+    RATE_LIMIT_HEAVY_PER_SECOND: float = 0.2     # /export, /analytics/polygon
+    RATE_LIMIT_HEAVY_BURST: int = 5
+    RATE_LIMIT_ETL_PER_SECOND: float = 0.5       # Imports e sync (por usuário)
+    RATE_LIMIT_ETL_BURST: int = 20
+    RATE_LIMIT_USER_MULTIPLIER: float = 5.0      # Logado ganha 5x a taxa do anônimo
+
+    # ADMISSÃO: concorrência (por worker; mantenha a soma abaixo do pool do SQLAlchemy = 15)
+    ETL_MAX_CONCURRENT: int = 2                  # Imports/sync/refresh/setores simultâneos
+    ETL_MAX_QUEUED: int = 20                     # Além disso: 429 na hora
+    ETL_QUEUE_TIMEOUT_SECONDS: float = 30.0      # Espera máxima na fila antes do 429
+    HEAVY_READ_MAX_CONCURRENT: int = 4           # Exports e agregações por polígono
+    HEAVY_READ_MAX_QUEUED: int = 20
+    HEAVY_READ_QUEUE_TIMEOUT_SECONDS: float = 10.0
+
+    # EXPORT (GeoParquet/FlatGeobuf/CSV via cursor no servidor)
+    EXPORT_CHUNK_SIZE: int = 1000   # Linhas por lote do cursor (= row group no Parquet)
+
+    # PROFILING SOB DEMANDA (header X-Profile: 1 com login, ou amostragem)
+    PROFILING_SAMPLE_RATE: float = 0.0          # Fração do tráfego perfilada (0.01 = 1%)
+    PROFILING_BUFFER_SIZE: int = 50             # Perfis guardados em memória (ring buffer)
+    PROFILING_INTERVAL_SECONDS: float = 0.001   # Intervalo de amostragem do pyinstrument
+
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
 settings = Settings()
\ No newline at end of file
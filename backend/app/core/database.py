@@ -1,8 +1,15 @@
 # app/core/database.py
+import asyncio
+import logging
+import re
+import time
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import declarative_base
 from app.core.config import settings
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Dict, Optional
+
+logger = logging.getLogger(__name__)
 
 # Cria o motor assíncrono. echo=True ajuda a ver o SQL gerado no terminal .
 engine = create_async_engine(
@@ -19,13 +26,147 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False
 )
 
+# Réplica de leitura (streaming replication). Sem DATABASE_REPLICA_URL tudo vai para o primário.
+replica_engine = create_async_engine(
+    settings.DATABASE_REPLICA_URL,
+    echo=True,
+    future=True,
+    pool_pre_ping=True  # Réplica reiniciada não deve derrubar a primeira leitura
+) if settings.DATABASE_REPLICA_URL else None
+
+ReplicaSessionLocal = async_sessionmaker(
+    bind=replica_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False
+) if replica_engine else None
+
 # Base para nossos Modelos (tabelas) herdarem
 Base = declarative_base()
 
-# Dependência para ser usada nas rotas do FastAPI
+# Dependência para ser usada nas rotas do FastAPI (ESCRITA e leituras que precisam do primário)
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+
+# --- RÉPLICA: lag e read-your-writes ---
+
+LSN_PATTERN = re.compile(r"^[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}$")
+
+# Fora de recuperação (não é standby) lag e replay_lsn vêm NULL
+REPLICA_STATUS_SQL = text("""
+    SELECT
+        pg_last_wal_replay_lsn()::text AS replay_lsn,
+        CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+             ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+        END AS lag
+""")
+
+def lsn_to_int(lsn: str) -> int:
+    """'16/B374D848' -> posição numérica no WAL (para comparar sem ir ao banco)."""
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+async def current_wal_lsn(db: AsyncSession) -> str:
+    """Posição atual do WAL no primário (chame depois do commit da escrita)."""
+    return (await db.execute(text("SELECT pg_current_wal_lsn()::text"))).scalar()
+
+
+class ReplicaMonitor:
+    """
+    Mede o atraso da réplica a cada REPLICA_LAG_CHECK_SECONDS (sob demanda, na leitura
+    que encontrar a medição vencida) e decide se ela pode atender leituras.
+    Réplica fora do ar ou com lag > REPLICA_MAX_LAG_SECONDS => leituras no primário.
+    """
+
+    def __init__(self):
+        self.lag: Optional[float] = None
+        self.replay_lsn: Optional[str] = None
+        self.healthy = False
+        self.error: Optional[str] = None
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return ReplicaSessionLocal is not None
+
+    @property
+    def staleness_bound(self) -> float:
+        """Atraso máximo que uma leitura na réplica pode ter enquanto ela for usada."""
+        return settings.REPLICA_MAX_LAG_SECONDS + settings.REPLICA_LAG_CHECK_SECONDS
+
+    async def available(self) -> bool:
+        if not self.configured:
+            return False
+        if time.monotonic() - self._checked_at >= settings.REPLICA_LAG_CHECK_SECONDS:
+            async with self._lock:
+                # Outra leitura pode ter medido enquanto esperávamos o lock
+                if time.monotonic() - self._checked_at >= settings.REPLICA_LAG_CHECK_SECONDS:
+                    await self._check()
+        return self.healthy
+
+    async def _check(self) -> None:
+        was_healthy = self.healthy
+        try:
+            async with ReplicaSessionLocal() as session:
+                row = (await session.execute(REPLICA_STATUS_SQL)).one()
+            self.lag = float(row.lag or 0)
+            self.replay_lsn = row.replay_lsn
+            self.error = None
+            self.healthy = self.lag <= settings.REPLICA_MAX_LAG_SECONDS
+        except Exception as e:
+            self.lag = None
+            self.error = type(e).__name__
+            self.healthy = False
+        self._checked_at = time.monotonic()
+
+        if was_healthy and not self.healthy:
+            reason = self.error or f"lag {self.lag:.1f}s"
+            logger.warning(f"🐢 Réplica fora ({reason}): leituras voltam para o primário.")
+        elif self.healthy and not was_healthy:
+            logger.info(f"🟢 Réplica disponível para leituras (lag {self.lag:.1f}s).")
+
+    def mark_unavailable(self, error: Exception) -> None:
+        """Falha ao conectar numa leitura: tira a réplica até a próxima medição."""
+        if self.healthy:
+            logger.warning(f"🐢 Réplica inacessível ({type(error).__name__}): leituras no primário.")
+        self.healthy = False
+        self.error = type(error).__name__
+        self._checked_at = time.monotonic()
+
+    async def has_replayed(self, lsn: str) -> bool:
+        """A réplica já aplicou o WAL até `lsn` (Ex: o commit do import do usuário)?"""
+        if not LSN_PATTERN.match(lsn):
+            return False
+        if self.replay_lsn and lsn_to_int(self.replay_lsn) >= lsn_to_int(lsn):
+            return True  # A última medição já basta, sem ida ao banco
+        try:
+            async with ReplicaSessionLocal() as session:
+                replay_lsn = (await session.execute(
+                    text("SELECT pg_last_wal_replay_lsn()::text")
+                )).scalar()
+        except Exception as e:
+            self.mark_unavailable(e)
+            return False
+        if replay_lsn is None:
+            return True  # Não é standby: mesmo dado do primário
+        self.replay_lsn = replay_lsn
+        return lsn_to_int(replay_lsn) >= lsn_to_int(lsn)
+
+    def snapshot(self) -> Dict:
+        return {
+            "configured": self.configured,
+            "healthy": self.healthy,
+            "lag_seconds": None if self.lag is None else round(self.lag, 3),
+            "replay_lsn": self.replay_lsn,
+            "error": self.error,
+            "max_lag_seconds": settings.REPLICA_MAX_LAG_SECONDS,
+        }
+
+# Instância única por processo
+replica_monitor = ReplicaMonitor()
@@ -1,8 +1,9 @@
 # app/core/init_db.py
 import logging
 from app.core.database import engine, Base
-from app.models.city import City, CityCatalog, District
+from app.models.city import City, CityCatalog, District, CityIndicatorSource, CityHexbin, CityAdjacency, CensusSector, IngestionCheckpoint
 from app.models.user import User
+from app.models.rate_limit import RateLimitBucket
 
 logger = logging.getLogger(__name__)
 
@@ -0,0 +1,59 @@
+# app/core/lifecycle.py
+import asyncio
+import functools
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+class EtlTracker:
+    """
+    Contabiliza ETLs em andamento neste worker (imports, refresh, ingestão de setores)
+    para que o desligamento espere por eles em vez de cortá-los no meio.
+    Em desligamento (draining), novos ETLs são recusados.
+    """
+
+    def __init__(self):
+        self._running: Dict[str, int] = {}
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.draining = False
+
+    @property
+    def running(self) -> Dict[str, int]:
+        return {name: n for name, n in self._running.items() if n}
+
+    @asynccontextmanager
+    async def track(self, name: str):
+        self._running[name] = self._running.get(name, 0) + 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._running[name] -= 1
+            if not self.running:
+                self._idle.set()
+
+    def wrap(self, name: str, func):
+        """Versão rastreada de uma função assíncrona (Ex: para BackgroundTasks)."""
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            async with self.track(name):
+                return await func(*args, **kwargs)
+        return wrapper
+
+    async def drain(self, timeout: float) -> bool:
+        """Para de aceitar ETLs e espera os em andamento. False se estourou o timeout."""
+        self.draining = True
+        if self.running:
+            logger.info(f"⏳ Aguardando ETLs em andamento: {self.running} (até {timeout}s)...")
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Desligando com ETLs ainda em andamento: {self.running}")
+            return False
+
+# Instância única por processo
+etl_tracker = EtlTracker()
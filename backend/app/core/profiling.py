@@ -0,0 +1,202 @@
+# app/core/profiling.py
+import json
+import logging
+import random
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+from app.core.config import settings
+from app.core.security import token_subject
+from pyinstrument import Profiler
+from pyinstrument.renderers import ConsoleRenderer, HTMLRenderer, SpeedscopeRenderer
+
+logger = logging.getLogger(__name__)
+
+# Componentes somados no resumo do perfil: (nome, trecho do caminho do arquivo, função ou None).
+# O primeiro frame que casa "leva" o tempo da subárvore inteira (sem contar duas vezes).
+COMPONENTS: List[Tuple[str, str, Optional[str]]] = [
+    ("repository", "app/repositories/", None),
+    ("ibge", "app/services/ibge/", None),
+    ("serialization", "app/services/topojson_builder", None),
+    ("serialization", "fastapi/routing", "serialize_response"),
+    ("serialization", "fastapi/encoders", None),
+    ("serialization", "starlette/responses", "render"),
+    ("serialization", "json/", None),
+    ("database", "sqlalchemy/", None),
+    ("database", "asyncpg/", None),
+]
+
+# Rotas que nunca são amostradas (o próprio visualizador e o frontend estático)
+SKIP_PREFIXES = ("/admin/profiles", "/view")
+
+
+@dataclass
+class StoredProfile:
+    id: str
+    trigger: str           # "header", "query" ou "sample"
+    method: str
+    path: str
+    status: Optional[int]
+    duration_ms: float
+    created_at: datetime
+    components: Dict[str, float] = field(default_factory=dict)
+    data: Any = None       # pyinstrument Session
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "trigger": self.trigger,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "duration_ms": self.duration_ms,
+            "created_at": self.created_at,
+            "components_ms": self.components,
+        }
+
+    def render(self, fmt: str) -> Tuple[bytes, str, str]:
+        """Retorna (conteúdo, media type, extensão) no formato pedido."""
+        if fmt == "html":
+            return HTMLRenderer().render(self.data).encode(), "text/html", "html"
+        if fmt == "speedscope":
+            return SpeedscopeRenderer().render(self.data).encode(), "application/json", "speedscope.json"
+        if fmt == "text":
+            text = ConsoleRenderer(unicode=True, color=False).render(self.data)
+            return text.encode(), "text/plain; charset=utf-8", "txt"
+        if fmt == "raw":
+            # Reabre com: pyinstrument --load <arquivo>.pyisession
+            return json.dumps(self.data.to_json()).encode(), "application/json", "pyisession"
+        raise ValueError(f"Formato '{fmt}' indisponível")
+
+
+class ProfileStore:
+    """Ring buffer em memória (por processo): os perfis mais antigos saem primeiro."""
+
+    def __init__(self, maxlen: int):
+        self._items: Deque[StoredProfile] = deque(maxlen=maxlen)
+
+    def add(self, profile: StoredProfile) -> None:
+        self._items.append(profile)
+
+    def list(self) -> List[StoredProfile]:
+        return list(reversed(self._items))
+
+    def get(self, profile_id: str) -> Optional[StoredProfile]:
+        return next((p for p in self._items if p.id == profile_id), None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+profile_store = ProfileStore(settings.PROFILING_BUFFER_SIZE)
+
+
+def _component_of(path: str, function: str) -> Optional[str]:
+    path = path.replace("\\", "/")
+    for name, fragment, func in COMPONENTS:
+        if fragment in path and (func is None or func == function):
+            return name
+    return None
+
+
+def _components_from_session(session) -> Dict[str, float]:
+    totals: Dict[str, float] = {}
+
+    def walk(frame):
+        name = _component_of(frame.file_path or "", frame.function or "")
+        if name:
+            totals[name] = totals.get(name, 0.0) + frame.time
+            return
+        for child in frame.children:
+            walk(child)
+
+    root = session.root_frame()
+    if root is not None:
+        walk(root)
+    return {k: round(v * 1000, 2) for k, v in totals.items()}
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI de profiling sob demanda.
+
+    Liga o profiler para a requisição quando:
+      - um usuário autenticado manda o header X-Profile: 1 (ou ?profile=1), ou
+      - ela cai na amostragem PROFILING_SAMPLE_RATE (0.0 a 1.0).
+
+    Usa o pyinstrument (amostragem estatística, com async_mode: o tempo em await
+    aparece na coroutine que esperou), então perfis simultâneos não se misturam.
+    O id do perfil volta no header X-Profile-Id (veja GET /admin/profiles).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trigger = self._trigger(scope)
+        if trigger is None:
+            return await self.app(scope, receive, send)
+
+        profile_id = uuid.uuid4().hex[:12]
+        status: Dict[str, Optional[int]] = {"code": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler = Profiler(interval=settings.PROFILING_INTERVAL_SECONDS, async_mode="enabled")
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = round((time.perf_counter() - start) * 1000, 2)
+            data = profiler.stop()
+            components = _components_from_session(data)
+
+            query = scope.get("query_string", b"").decode()
+            profile_store.add(StoredProfile(
+                id=profile_id,
+                trigger=trigger,
+                method=scope["method"],
+                path=scope["path"] + (f"?{query}" if query else ""),
+                status=status["code"],
+                duration_ms=duration_ms,
+                created_at=datetime.now(timezone.utc),
+                components=components,
+                data=data,
+            ))
+            logger.info(f"🔬 Perfil {profile_id}: {scope['method']} {scope['path']} ({duration_ms} ms)")
+
+    def _trigger(self, scope) -> Optional[str]:
+        path = scope["path"]
+        if path.startswith(SKIP_PREFIXES):
+            return None
+
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile") in (b"1", b"true"):
+            return "header" if self._is_authenticated(headers) else None
+        query = parse_qs(scope.get("query_string", b"").decode())
+        if query.get("profile", [""])[0] in ("1", "true"):
+            return "query" if self._is_authenticated(headers) else None
+
+        if settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return "sample"
+        return None
+
+    @staticmethod
+    def _is_authenticated(headers: Dict[bytes, bytes]) -> bool:
+        """
+        Mesmo JWT das rotas /admin (sem ida ao banco: o middleware roda antes das dependências).
+        Pedidos sem token válido são atendidos normalmente, só não são perfilados.
+        """
+        return token_subject(headers.get(b"authorization", b"").decode()) is not None
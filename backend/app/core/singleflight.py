@@ -0,0 +1,93 @@
+# app/core/singleflight.py
+import asyncio
+import functools
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """
+    Coalescência de chamadas idênticas concorrentes (por processo).
+
+    A primeira chamada de (operação, argumentos) dispara o trabalho; as que chegam
+    enquanto ele está em andamento aguardam o MESMO resultado (ou a mesma exceção),
+    em vez de repetir a consulta / o download. Nada é guardado depois que termina:
+    isto não é cache, só evita trabalho duplicado simultâneo.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Tuple[str, Hashable], asyncio.Task] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    async def do(self, operation: str, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        stats = self._stats.setdefault(operation, {"calls": 0, "executed": 0, "coalesced": 0, "errors": 0})
+        stats["calls"] += 1
+
+        full_key = (operation, key)
+        task = self._inflight.get(full_key)
+        if task is None:
+            stats["executed"] += 1
+            # Task própria: se quem disparou for cancelado, os demais continuam esperando
+            task = asyncio.ensure_future(func())
+            self._inflight[full_key] = task
+            task.add_done_callback(functools.partial(self._done, full_key, operation))
+        else:
+            stats["coalesced"] += 1
+            logger.debug(f"🔗 {operation}{key}: aguardando chamada em andamento.")
+
+        return await asyncio.shield(task)
+
+    def _done(self, full_key, operation: str, task: asyncio.Task) -> None:
+        self._inflight.pop(full_key, None)
+        if not task.cancelled() and task.exception() is not None:
+            self._stats[operation]["errors"] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        in_flight: Dict[str, int] = {}
+        for operation, _ in self._inflight:
+            in_flight[operation] = in_flight.get(operation, 0) + 1
+        return {op: {**s, "in_flight": in_flight.get(op, 0)} for op, s in self._stats.items()}
+
+# Instância única por processo
+singleflight = SingleFlight()
+
+
+def _freeze(value: Any) -> Hashable:
+    """Argumentos -> chave hashable (listas/dicts viram tuplas)."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, set):
+        return tuple(sorted(value))
+    return value
+
+
+def coalesce(operation: str):
+    """
+    Decorator para MÉTODOS assíncronos: chamadas concorrentes com os mesmos argumentos
+    (ignorando self) compartilham uma execução.
+    Se a instância tem sessão de banco (self.db), a execução roda numa sessão PRÓPRIA no
+    mesmo bind, com uma instância nova (type(self)(sessão)): a task compartilhada sobrevive
+    ao cancelamento de quem a disparou, e a sessão dele é fechada pelo get_db nessa hora.
+    Sessões de bancos diferentes (primário x réplica) não se misturam: quem precisa do
+    primário para ler a própria escrita não recebe o resultado de uma leitura na réplica.
+    Quem recebe o resultado não deve alterá-lo (é o mesmo objeto para todos).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            bind = getattr(getattr(self, "db", None), "bind", None)
+            key = (bind, _freeze(args), _freeze(kwargs))
+            if bind is None:
+                return await singleflight.do(operation, key, lambda: func(self, *args, **kwargs))
+
+            async def run():
+                from sqlalchemy.ext.asyncio import AsyncSession
+
+                async with AsyncSession(bind, expire_on_commit=False) as session:
+                    return await func(type(self)(session), *args, **kwargs)
+            return await singleflight.do(operation, key, run)
+        return wrapper
+    return decorator
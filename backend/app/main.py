@@ -1,74 +1,439 @@
 # backend/app/main.py
+import asyncio
+import json
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Response, Depends, HTTPException, Query
+from fastapi import FastAPI, Request, Response, Depends, HTTPException, Query, BackgroundTasks
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Literal, Optional
+from shapely.geometry import shape
 
 # Imports internos
 from app.core.init_db import init_tables # (Se tiver comentado no passo anterior, mantenha comentado)
-from app.core.database import get_db
+from app.core.database import get_db, replica_monitor
 from app.services.ibge.orchestrator import IbgeEtlOrchestrator
-from app.repositories.city_repository import CityRepository
-from app.schemas.geo import FeatureCollection
-from app.api.deps import get_current_user
+from app.repositories.city_repository import CityRepository, HEXBIN_RESOLUTIONS, RANKING_INDICATORS
+from app.schemas.geo import FeatureCollection, PolygonQuery, PolygonAggregate, CityDetail, RankingPage, CityRank
+from app.api.deps import (
+    get_current_user, get_bbox, parse_map_fields, ensure_etl_accepted,
+    get_read_db, get_cached_read_db, choose_read_sessionmaker, remember_write,
+    rate_limit, heavy_read_slot
+)
 from app.models.user import User
 from app.routers import auth
 from app.services.ibge.topology import IbgeTopologyService
+from app.services.ibge.refresh import IbgeRefreshScheduler, run_scheduled_refresh
+from app.services.topojson_builder import build_topojson
+from app.services.ibge.sectors import run_sector_ingestion
+from app.services.ibge.resilience import UpstreamUnavailable, breaker_states
+from app.services.exporter import EXPORT_FORMATS, stream_export
+from app.services.hexbins import hexbin_refresher
+from app.repositories.sector_repository import SectorRepository
+from app.core.config import settings
+from app.core.cache import cache, CacheInvalidationListener
+from app.core.lifecycle import etl_tracker
+from app.core.admission import AdmissionRejected, etl_limiter, admission_status
+from app.core.singleflight import singleflight
+from app.core.profiling import ProfilingMiddleware, profile_store
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # await init_tables() # Mantemos desligado pois usamos Alembic
+    # Invalidação de cache entre workers (LISTEN/NOTIFY)
+    listener = CacheInvalidationListener(settings.DATABASE_URL)
+    listener.start()
     yield
+    # Desligamento gracioso: ETLs em andamento terminam antes do processo sair
+    await etl_tracker.drain(settings.ETL_DRAIN_TIMEOUT_SECONDS)
+    await listener.stop()
 
 app = FastAPI(title="Atibaia Geo-Insights", lifespan=lifespan)
+app.add_middleware(ProfilingMiddleware)
 
 # Autenticação
 app.include_router(auth.router, tags=["auth"])
 
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable_handler(request, exc: UpstreamUnavailable):
+    """IBGE fora do ar e nada gravado para manter (Ex: cidade nova): 503 imediato."""
+    headers = {"Retry-After": str(int(exc.retry_after) + 1)} if exc.retry_after else None
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers=headers)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc: AdmissionRejected):
+    """Limite de taxa do cliente ou fila de ETL/leituras pesadas cheia: 429."""
+    return JSONResponse(status_code=429, content={"detail": exc.reason},
+                        headers={"Retry-After": str(int(exc.retry_after) + 1)})
+
+# Faixas de admissão (token bucket por cliente)
+READ_LIMIT = [Depends(rate_limit("read"))]
+HEAVY_LIMIT = [Depends(rate_limit("heavy")), Depends(heavy_read_slot)]
+ETL_LIMIT = [Depends(rate_limit("etl")), Depends(ensure_etl_accepted)]
+
 # --- ROTAS DE ADMINISTRAÇÃO (ETL) ---
 
-@app.post("/admin/sync-catalog")
+@app.post("/admin/sync-catalog", dependencies=ETL_LIMIT)
 async def sync_catalog(
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user) # Requer Login
 ):
     """Atualiza a lista de 5.570 municípios (Base para o Search)."""
     orchestrator = IbgeEtlOrchestrator(db)
-    return await orchestrator.sync_catalog()
 
-@app.post("/cities/import/{city_code}")
+    async def run():
+        async with etl_tracker.track("sync-catalog"), etl_limiter.slot():
+            return await orchestrator.sync_catalog()
+    # Coalesce ANTES da vaga de ETL: pedidos repetidos não ocupam vagas esperando o mesmo sync
+    result = await singleflight.do("etl.sync_catalog.request", None, run)
+    await remember_write(response, db)
+    return result
+
+@app.post("/cities/import/{city_code}", dependencies=ETL_LIMIT)
 async def import_specific_city(
     city_code: str,
+    response: Response,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user) # Requer Login
 ):
-    """Baixa dados reais do IBGE para uma cidade e coloca no mapa."""
+    """
+    Baixa dados reais do IBGE para uma cidade e coloca no mapa.
+    Com réplica, devolve o LSN do commit (cookie min_lsn / header X-Min-LSN) para que
+    as leituras seguintes deste cliente já vejam a cidade importada.
+    A grade hexagonal é recalculada em background depois da resposta.
+    """
     orchestrator = IbgeEtlOrchestrator(db)
+
+    async def run():
+        async with etl_tracker.track("import"), etl_limiter.slot():
+            return await orchestrator.import_city(city_code)
     try:
-        return await orchestrator.import_city(city_code)
+        # Coalesce ANTES da vaga de ETL: dois pedidos da mesma cidade ocupam UMA vaga
+        result = await singleflight.do("etl.import_city.request", city_code, run)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    if result["changes"]["changed"]:
+        background_tasks.add_task(etl_tracker.wrap("hexbins", hexbin_refresher.request))
+    await remember_write(response, db)
+    return result
+
+@app.post("/admin/refresh", dependencies=ETL_LIMIT)
+async def refresh_stale_cities(
+    background_tasks: BackgroundTasks,
+    max_cities: int = Query(None, ge=1),
+    dry_run: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user) # Requer Login
+):
+    """
+    Reimporta apenas cidades cuja fonte no IBGE publicou período mais novo.
+    dry_run=true só lista as desatualizadas; caso contrário roda em background.
+    """
+    scheduler = IbgeRefreshScheduler(db)
+    if dry_run:
+        return await scheduler.run(max_cities=max_cities, dry_run=True)
+
+    background_tasks.add_task(etl_tracker.wrap("refresh", run_scheduled_refresh), max_cities)
+    return {"status": "scheduled"}
+
+@app.get("/admin/upstream")
+async def upstream_status(current_user: User = Depends(get_current_user)): # Requer Login
+    """Estado dos circuit breakers do IBGE (closed/open/half_open) neste processo."""
+    return breaker_states()
+
+@app.get("/admin/replica")
+async def replica_status(current_user: User = Depends(get_current_user)): # Requer Login
+    """Lag da réplica de leitura e se ela está atendendo leituras neste processo."""
+    await replica_monitor.available()
+    return replica_monitor.snapshot()
+
+@app.get("/admin/admission")
+async def admission_metrics(current_user: User = Depends(get_current_user)): # Requer Login
+    """Vagas/filas de ETL e leituras pesadas e pedidos recusados (429) neste processo."""
+    return admission_status()
+
+@app.get("/admin/singleflight")
+async def singleflight_metrics(current_user: User = Depends(get_current_user)): # Requer Login
+    """Chamadas coalescidas por operação neste processo (calls = executed + coalesced)."""
+    return singleflight.stats()
+
+@app.post("/admin/hexbins/refresh", dependencies=ETL_LIMIT)
+async def refresh_hexbins(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user) # Requer Login
+):
+    """Recalcula a grade hexagonal (Ex: logo após aplicar a migration)."""
+    async with etl_limiter.slot():
+        await CityRepository(db).refresh_hexbins()
+    return {"status": "success"}
+
+@app.post("/admin/sectors/ingest", dependencies=ETL_LIMIT)
+async def ingest_census_sectors(
+    background_tasks: BackgroundTasks,
+    layer: Optional[str] = None,
+    restart: bool = False,
+    current_user: User = Depends(get_current_user) # Requer Login
+):
+    """
+    Ingestão paginada dos setores censitários via WFS (roda em background).
+    Chamar de novo retoma do último checkpoint; restart=true recomeça do zero.
+    """
+    layer = layer or settings.CENSUS_SECTOR_LAYER
+    if not layer:
+        raise HTTPException(status_code=400, detail="Informe a camada WFS (veja probe_ibge.py).")
+    background_tasks.add_task(etl_tracker.wrap("sectors", run_sector_ingestion), layer, restart)
+    return {"status": "scheduled", "job": layer}
+
+@app.get("/admin/sectors/status")
+async def census_sectors_status(
+    layer: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user) # Requer Login
+):
+    """Progresso da ingestão (checkpoint)."""
+    layer = layer or settings.CENSUS_SECTOR_LAYER
+    checkpoint = await SectorRepository(db).get_checkpoint(layer)
+    if not checkpoint:
+        raise HTTPException(status_code=404, detail="Nenhuma ingestão registrada para essa camada.")
+    return {
+        "job": checkpoint.job,
+        "next_index": checkpoint.next_index,
+        "total_written": checkpoint.total_written,
+        "finished": checkpoint.finished,
+        "updated_at": checkpoint.updated_at
+    }
+
+@app.get("/admin/profiles")
+async def list_profiles(current_user: User = Depends(get_current_user)): # Requer Login
+    """Perfis capturados neste processo (mais recentes primeiro), com tempo por componente."""
+    return [p.summary() for p in profile_store.list()]
+
+@app.get("/admin/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    format: Literal["html", "text", "speedscope", "raw"] = "html",
+    current_user: User = Depends(get_current_user) # Requer Login
+):
+    """
+    Baixa um perfil: html (visualizador do pyinstrument), speedscope, text
+    ou raw (.pyisession, reabre com pyinstrument --load).
+    """
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado (pode ter saído do buffer).")
+    try:
+        content, media_type, extension = profile.render(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    disposition = "inline" if format == "html" else "attachment"
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'{disposition}; filename="profile-{profile_id}.{extension}"'}
+    )
+
+@app.delete("/admin/profiles")
+async def clear_profiles(current_user: User = Depends(get_current_user)): # Requer Login
+    """Esvazia o buffer de perfis."""
+    profile_store.clear()
+    return {"status": "success"}
 
 # --- ROTAS PÚBLICAS (LEITURA) ---
 
-@app.get("/cities/search")
+@app.get("/cities/search", dependencies=READ_LIMIT)
 async def search_cities(
     q: str = Query(..., min_length=3),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_cached_read_db("search"))
 ):
-    """Autocomplete: Busca cidades pelo nome no catálogo local."""
+    """Autocomplete: Busca cidades pelo nome no catálogo local (cache até o próximo sync-catalog)."""
+    key = q.lower()
+    results = cache.get("search", key)
+    if results is None:
+        generation = cache.generation("search")
+        repo = CityRepository(db)
+        rows = await repo.list_catalog(search=q)
+        results = [{"code": r.code, "name": r.name, "uf": r.uf} for r in rows]
+        cache.set("search", key, results, generation)
+    return results
+
+@app.get("/cities/{city_code}/neighbors", dependencies=READ_LIMIT)
+async def get_city_neighbors(city_code: str, db: AsyncSession = Depends(get_read_db)):
+    """Municípios vizinhos (grafo de adjacência pré-calculado)."""
+    repo = CityRepository(db)
+    if not await repo.city_exists(city_code):
+        raise HTTPException(status_code=404, detail=f"Cidade {city_code} não importada.")
+    rows = await repo.get_neighbors(city_code)
+    return [{"code": r.code, "name": r.name, "uf": r.uf} for r in rows]
+
+@app.get("/cities/{city_code}/region", dependencies=READ_LIMIT)
+async def get_city_region(
+    city_code: str,
+    k: int = Query(1, ge=1, le=5, description="Número máximo de saltos"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Região contígua: cidades a até k vizinhanças de distância (inclui a própria, hops=0)."""
     repo = CityRepository(db)
-    results = await repo.list_catalog(search=q)
-    return [{"code": r.code, "name": r.name, "uf": r.uf} for r in results]
+    rows = await repo.get_region(city_code, k)
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"Cidade {city_code} não importada.")
+    return [{"code": r.code, "name": r.name, "uf": r.uf, "hops": r.hops} for r in rows]
+
+@app.get("/cities/{city_code}/rank", response_model=CityRank, dependencies=READ_LIMIT)
+async def get_city_rank(
+    city_code: str,
+    indicator: Literal[RANKING_INDICATORS] = "pib_per_capita",
+    scope: Literal["national", "uf"] = "national",
+    min_population: Optional[int] = Query(None, ge=0),
+    max_population: Optional[int] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Onde a cidade fica no indicador: no país ou na UF dela, opcionalmente entre cidades de porte parecido."""
+    rank = await CityRepository(db).get_city_rank(
+        city_code, indicator, scope=scope, min_population=min_population, max_population=max_population
+    )
+    if rank is None:
+        raise HTTPException(status_code=404, detail=f"Cidade {city_code} não importada.")
+    return rank
+
+@app.get("/cities/{city_code}", response_model=CityDetail, dependencies=READ_LIMIT)
+async def get_city_detail(city_code: str, db: AsyncSession = Depends(get_cached_read_db("city"))):
+    """Indicadores completos, períodos de origem e distritos de uma cidade (cache até o próximo import dela)."""
+    detail = cache.get("city", city_code)
+    if detail is None:
+        generation = cache.generation("city")
+        detail = await CityRepository(db).get_city_detail(city_code)
+        if detail is None:
+            raise HTTPException(status_code=404, detail=f"Cidade {city_code} não importada.")
+        cache.set("city", city_code, detail, generation)
+    return detail
+
+@app.get("/rankings", response_model=RankingPage, dependencies=READ_LIMIT)
+async def get_rankings(
+    indicator: Literal[RANKING_INDICATORS] = "pib_per_capita",
+    order: Literal["desc", "asc"] = "desc",
+    uf: Optional[str] = Query(None, min_length=2, max_length=2),
+    min_population: Optional[int] = Query(None, ge=0),
+    max_population: Optional[int] = Query(None, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Ranking das cidades importadas por indicador (Ex: top 20 em pib_per_capita em SP),
+    com filtro por UF e faixa de população. Paginação por cursor (keyset), não OFFSET.
+    """
+    try:
+        return await CityRepository(db).get_ranking(
+            indicator, order=order, uf=uf, min_population=min_population,
+            max_population=max_population, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/map", response_model=FeatureCollection, response_model_exclude_unset=True, dependencies=READ_LIMIT)
+async def get_map_data(
+    format: Literal["geojson", "topojson"] = "geojson",
+    uf: Optional[str] = Query(None, min_length=2, max_length=2),
+    fields: Optional[tuple] = Depends(parse_map_fields),
+    db: AsyncSession = Depends(get_cached_read_db("map"))
+):
+    """
+    Retorna todas as cidades que já foram importadas.
+    fields=name,population: só as propriedades do coroplético (payload enxuto);
+    o restante vem de /cities/{code} quando o polígono é clicado.
+    format=topojson: fronteiras compartilhadas viram arcos únicos (payload ~metade).
+    O TopoJSON é calculado no servidor e fica em cache até o próximo import.
+    """
+    if format == "topojson":
+        key = ("topojson", uf.upper() if uf else None, fields)
+        payload = cache.get("map", key)
+        if payload is None:
+            async def build():
+                # Marca de quem LÊ (não de quem espera): quem entra numa construção iniciada
+                # antes de um import não grava o resultado antigo como se fosse novo
+                generation = cache.generation("map")
+                features = await CityRepository(db).get_all_features(uf=uf, fields=fields)
+                # Construção da topologia é CPU-bound: fora do event loop
+                return generation, await asyncio.to_thread(build_topojson, features)
+            # Vários clientes no cache frio: UMA topologia é construída e compartilhada.
+            # O bind entra na chave (como no coalesce): quem precisa do primário para ver o
+            # próprio import não pega carona numa construção lendo a réplica.
+            generation, payload = await singleflight.do("map.topojson", (db.bind, key), build)
+            cache.set("map", key, payload, generation)
+        return Response(content=payload, media_type="application/json")
 
-@app.get("/map", response_model=FeatureCollection)
-async def get_map_data(db: AsyncSession = Depends(get_db)):
-    """Retorna todas as cidades que já foram importadas."""
     repo = CityRepository(db)
-    features = await repo.get_all_features()
+    features = await repo.get_all_features(uf=uf, fields=fields)
     return {"type": "FeatureCollection", "features": features}
 
+@app.get("/map/districts", dependencies=READ_LIMIT)
+async def get_map_districts(
+    city_code: Optional[str] = None,
+    bbox: Optional[tuple] = Depends(get_bbox),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Camada de distritos (polígonos) de uma cidade ou da área visível."""
+    if not city_code and not bbox:
+        raise HTTPException(status_code=400, detail="Informe city_code ou bbox.")
+    repo = CityRepository(db)
+    features = await repo.get_district_features(city_code=city_code, bbox=bbox)
+    return {"type": "FeatureCollection", "features": features}
+
+@app.get("/map/hexbins", dependencies=READ_LIMIT)
+async def get_map_hexbins(
+    resolution: int = Query(2, description="1 (grossa) a 4 (fina)"),
+    bbox: Optional[tuple] = Depends(get_bbox),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Grade hexagonal pré-calculada para zoom baixo (centenas de células em vez
+    de milhares de polígonos). Somas de população, empresas, pessoal e PIB.
+    """
+    if resolution not in HEXBIN_RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution deve ser um de {sorted(HEXBIN_RESOLUTIONS)}")
+    repo = CityRepository(db)
+    features = await repo.get_hexbin_features(resolution, bbox)
+    return {"type": "FeatureCollection", "features": features}
+
+@app.get("/export", dependencies=HEAVY_LIMIT)
+async def export_cities(
+    request: Request,
+    format: Literal["geoparquet", "flatgeobuf", "csv"] = "geoparquet",
+    layer: Literal["cities", "districts"] = "cities",
+    indicators: bool = True,
+    uf: Optional[str] = Query(None, min_length=2, max_length=2)
+):
+    """
+    Download em massa para análise (notebooks, QGIS): GeoParquet, FlatGeobuf ou CSV (WKT).
+    Transmitido em lotes a partir de um cursor no servidor, sem montar o arquivo em memória.
+    """
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"{layer}{'-' + uf.upper() if uf else ''}.{extension}"
+    session_factory = await choose_read_sessionmaker(request)
+    return StreamingResponse(
+        stream_export(format, layer=layer, indicators=indicators, uf=uf, session_factory=session_factory),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.post("/analytics/polygon", response_model=PolygonAggregate, dependencies=HEAVY_LIMIT)
+async def analyze_polygon(query: PolygonQuery, db: AsyncSession = Depends(get_read_db)):
+    """
+    Agrega população, PIB, empresas e pessoal ocupado dentro de um polígono
+    desenhado pelo usuário. Calculado no PostGIS (sem baixar o /map inteiro).
+    """
+    try:
+        polygon = shape(query.geometry)
+    except Exception:
+        raise HTTPException(status_code=400, detail="GeoJSON inválido")
+    if polygon.geom_type not in ("Polygon", "MultiPolygon") or polygon.is_empty:
+        raise HTTPException(status_code=400, detail="Geometria deve ser Polygon ou MultiPolygon")
+
+    repo = CityRepository(db)
+    return await repo.aggregate_in_polygon(json.dumps(query.geometry), weighted=query.weighted)
+
 @app.get("/probe/districts/{city_code}")
 async def probe_districts(city_code: str, current_user: User = Depends(get_current_user)):
     """
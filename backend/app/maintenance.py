@@ -0,0 +1,131 @@
+# app/maintenance.py
+"""
+Manutenção da ordem física das tabelas de geometria.
+
+    python -m app.maintenance status
+    python -m app.maintenance cluster [--tables cities census_sectors] [--min-correlation 0.9]
+
+Consultas por viewport (&&) leem, pelo GiST, polígonos vizinhos no espaço. Se as
+linhas estão na ordem de chegada (import por cidade, setores página a página do WFS),
+cada vizinho cai numa página diferente do heap. O CLUSTER reescreve a tabela na
+ordem do geohash (ix_<tabela>_geohash, curva Z de um ponto interno): vizinhos
+passam a dividir páginas e o mesmo bbox toca bem menos buffers.
+
+census_sectors é particionada por UF: o CLUSTER roda partição a partição, cada uma
+com lock curto. A ordem se desfaz aos poucos com imports e refresh; agende depois
+do refresh (cron). Partições que ainda estão ordenadas (correlação do geohash acima
+de --min-correlation) são puladas.
+
+CLUSTER segura ACCESS EXCLUSIVE durante a reescrita (leituras esperam): com
+lock_timeout, uma tabela ocupada é pulada em vez de enfileirar as leituras atrás.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List, Optional
+import asyncpg
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tabela -> índice de ordenação (criados nas migrations be7f489db732 e b34aa8fef83f)
+CLUSTER_INDEXES = {
+    "cities": "ix_cities_geohash",
+    "districts": "ix_districts_geohash",
+    "census_sectors": "ix_census_sectors_geohash",
+}
+
+# Folhas do índice (a própria tabela, se não for particionada) com a correlação entre
+# a ordem física e o geohash medida pelo último ANALYZE (pg_stats do índice de expressão)
+LEAVES_SQL = """
+    SELECT i.indrelid::regclass::text AS table_name,
+           t.relid::regclass::text AS index_name,
+           pg_total_relation_size(i.indrelid) AS bytes,
+           (SELECT s.correlation FROM pg_stats s
+             WHERE s.schemaname = current_schema() AND s.tablename = t.relid::regclass::text
+             LIMIT 1) AS correlation
+    FROM pg_partition_tree($1::regclass) t
+    JOIN pg_index i ON i.indexrelid = t.relid
+    WHERE t.isleaf
+    ORDER BY 1
+"""
+
+
+def _dsn() -> str:
+    # asyncpg não entende o prefixo do SQLAlchemy
+    return settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+
+async def _leaves(conn, table: str) -> List[Dict]:
+    return [dict(row) for row in await conn.fetch(LEAVES_SQL, CLUSTER_INDEXES[table])]
+
+
+async def cluster_status(tables: Optional[List[str]] = None) -> Dict:
+    conn = await asyncpg.connect(_dsn())
+    try:
+        return {table: await _leaves(conn, table) for table in tables or CLUSTER_INDEXES}
+    finally:
+        await conn.close()
+
+
+async def cluster_tables(tables: Optional[List[str]] = None, min_correlation: float = 0.9,
+                         lock_timeout: str = "5s") -> Dict:
+    """
+    CLUSTER + ANALYZE em cada folha com |correlação| abaixo de min_correlation
+    (ou sem estatística). Retorna o que foi reordenado, pulado ou falhou por lock.
+    """
+    report = {"clustered": [], "skipped": [], "lock_timeout": []}
+    started = time.monotonic()
+    conn = await asyncpg.connect(_dsn())
+    try:
+        await conn.execute("SELECT set_config('lock_timeout', $1, false)", lock_timeout)
+        for table in tables or CLUSTER_INDEXES:
+            for leaf in await _leaves(conn, table):
+                name = leaf["table_name"]
+                correlation = leaf["correlation"]
+                if correlation is not None and abs(correlation) >= min_correlation:
+                    report["skipped"].append(name)
+                    continue
+
+                leaf_started = time.monotonic()
+                try:
+                    await conn.execute(f"CLUSTER {name} USING {leaf['index_name']}")
+                except asyncpg.exceptions.LockNotAvailableError:
+                    logger.warning(f"⏳ {name} ocupada (lock_timeout {lock_timeout}); fica para a próxima.")
+                    report["lock_timeout"].append(name)
+                    continue
+                # Atualiza a correlação (próxima execução pula) e as estimativas do planner
+                await conn.execute(f"ANALYZE {name}")
+                report["clustered"].append(name)
+                logger.info(f"🧭 {name} reordenada por geohash ({time.monotonic() - leaf_started:.1f}s, "
+                            f"correlação anterior {correlation})")
+    finally:
+        await conn.close()
+
+    report["seconds"] = round(time.monotonic() - started, 1)
+    logger.info(f"✅ CLUSTER: {len(report['clustered'])} reordenadas, {len(report['skipped'])} já ordenadas, "
+                f"{len(report['lock_timeout'])} ocupadas ({report['seconds']}s).")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance", description="Manutenção das tabelas de geometria")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    status_cmd = commands.add_parser("status", help="Tamanho e correlação do geohash por tabela/partição")
+    status_cmd.add_argument("--tables", nargs="+", choices=list(CLUSTER_INDEXES), default=None)
+
+    cluster_cmd = commands.add_parser("cluster", help="Reordena fisicamente por geohash (CLUSTER)")
+    cluster_cmd.add_argument("--tables", nargs="+", choices=list(CLUSTER_INDEXES), default=None)
+    cluster_cmd.add_argument("--min-correlation", type=float, default=0.9,
+                             help="Pula partições com correlação acima disso (> 1 reordena tudo)")
+    cluster_cmd.add_argument("--lock-timeout", default="5s", help="Espera máxima pelo lock de cada tabela")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "status":
+        print(json.dumps(asyncio.run(cluster_status(args.tables)), indent=2))
+    else:
+        print(json.dumps(asyncio.run(cluster_tables(args.tables, args.min_correlation, args.lock_timeout)), indent=2))
@@ -1,11 +1,20 @@
 # backend/app/models/city.py
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, UniqueConstraint, Boolean, Index, DDL, event, func
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from geoalchemy2 import Geometry
 from app.core.database import Base
 
 class City(Base):
     __tablename__ = "cities"
+    # Rankings (/rankings): um índice cobrindo por indicador, varrido em ordem (keyset)
+    # sem tocar a tabela. code desempata; uf/population filtram dentro do índice.
+    __table_args__ = (
+        Index("ix_cities_rank_pib_per_capita", "pib_per_capita", "code", postgresql_include=["uf", "name", "population"]),
+        Index("ix_cities_rank_population", "population", "code", postgresql_include=["uf", "name"]),
+        Index("ix_cities_rank_total_companies", "total_companies", "code", postgresql_include=["uf", "name", "population"]),
+        Index("ix_cities_rank_total_workers", "total_workers", "code", postgresql_include=["uf", "name", "population"]),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String, unique=True, index=True, nullable=False)
@@ -25,6 +34,10 @@ class City(Base):
     
     geom = Column(Geometry("MULTIPOLYGON", srid=4326, spatial_index=True), nullable=True)
 
+    # Change detection: SHA-256 do WKB e dos indicadores (re-import sem mudança não escreve)
+    geom_hash = Column(String(64), nullable=True)
+    data_hash = Column(String(64), nullable=True)
+
     # Relacionamento: Uma cidade tem vários distritos
     districts = relationship("District", back_populates="city", cascade="all, delete-orphan")
 
@@ -38,12 +51,114 @@ class District(Base):
     city_id = Column(Integer, ForeignKey("cities.id"), nullable=False)
     city = relationship("City", back_populates="districts")
     
-    # Por enquanto sem geometria, pois a API V3 não fornece
-    # Futuro: population, geom
+    # Malha vem da API de Malhas v3 (intrarregiao=distrito), um request por município
+    geom = Column(Geometry("MULTIPOLYGON", srid=4326, spatial_index=True), nullable=True)
+    content_hash = Column(String(64), nullable=True)  # SHA-256 de nome + malha
+    # Futuro: population
 
 class CityCatalog(Base):
     __tablename__ = "city_catalog"
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String, unique=True, index=True)
     name = Column(String, index=True)
-    uf = Column(String)
\ No newline at end of file
+    uf = Column(String)
+
+class CityIndicatorSource(Base):
+    """
+    Período de referência do dado gravado e último período publicado pelo IBGE no
+    momento da importação. Uma linha por (cidade, tabela do agregados).
+    O agendador de refresh compara published_period com o /periodos atual.
+    """
+    __tablename__ = "city_indicator_sources"
+    __table_args__ = (UniqueConstraint("city_id", "table_id", name="uq_city_indicator_sources_city_table"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    city_id = Column(Integer, ForeignKey("cities.id", ondelete="CASCADE"), nullable=False, index=True)
+    table_id = Column(String, nullable=False)       # Ex: "4714", "5938", "1685"
+    indicator = Column(String, nullable=False)      # Ex: "population", "pib", "companies"
+    source_period = Column(String, nullable=True)   # Período do dado gravado (Ex: "2021")
+    published_period = Column(String, nullable=True)  # Último publicado na hora do fetch
+    fetched_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class CityHexbin(Base):
+    """
+    Agregação pré-calculada dos indicadores em grade hexagonal (ST_HexagonGrid).
+    Recalculada após imports; servida no lugar dos polígonos em zoom baixo.
+    """
+    __tablename__ = "city_hexbins"
+    __table_args__ = (UniqueConstraint("resolution", "i", "j", name="uq_city_hexbins_cell"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    resolution = Column(Integer, nullable=False, index=True)
+    i = Column(Integer, nullable=False)
+    j = Column(Integer, nullable=False)
+
+    city_count = Column(Integer, default=0)
+    population = Column(Float, nullable=True)
+    total_companies = Column(Float, nullable=True)
+    total_workers = Column(Float, nullable=True)
+    pib_total = Column(Float, nullable=True)
+
+    geom = Column(Geometry("POLYGON", srid=4326, spatial_index=True), nullable=False)
+
+
+class CityAdjacency(Base):
+    """
+    Grafo de vizinhança pré-calculado (municípios que se tocam).
+    Guardado nos dois sentidos para leituras simples: (A, B) e (B, A).
+    """
+    __tablename__ = "city_adjacency"
+
+    city_id = Column(Integer, ForeignKey("cities.id", ondelete="CASCADE"), primary_key=True)
+    neighbor_id = Column(Integer, ForeignKey("cities.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+
+class CensusSector(Base):
+    """
+    Setor censitário 2022 (ingerido do GeoServer WFS do IBGE).
+    Particionada por UF (LIST em uf_code): uma partição census_sectors_<CD_UF> por estado,
+    mais a default. Chaves únicas precisam incluir uf_code.
+    """
+    __tablename__ = "census_sectors"
+    __table_args__ = (
+        Index("ix_census_sectors_code", "code", "uf_code", unique=True),
+        {"postgresql_partition_by": "LIST (uf_code)"},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    code = Column(String, nullable=False)                           # CD_SETOR
+    city_code = Column(String, index=True, nullable=False)          # CD_MUN
+    uf_code = Column(String(2), primary_key=True)                   # CD_UF (chave da partição)
+    properties = Column(JSONB, nullable=True)                       # Atributos crus da camada
+
+    geom = Column(Geometry("MULTIPOLYGON", srid=4326, spatial_index=True), nullable=True)
+
+# CD_UF das 27 UFs (mesma lista da migration b34aa8fef83f)
+UF_CODES = [
+    "11", "12", "13", "14", "15", "16", "17",
+    "21", "22", "23", "24", "25", "26", "27", "28", "29",
+    "31", "32", "33", "35",
+    "41", "42", "43",
+    "50", "51", "52", "53",
+]
+
+# Partições para o create_all (init_db); em produção quem cria é a migration.
+# Um DDL por comando: o asyncpg não aceita vários comandos num statement preparado.
+for _uf in UF_CODES:
+    event.listen(CensusSector.__table__, "after_create", DDL(
+        f"CREATE TABLE census_sectors_{_uf} PARTITION OF census_sectors FOR VALUES IN ('{_uf}')"
+    ))
+event.listen(CensusSector.__table__, "after_create", DDL(
+    "CREATE TABLE census_sectors_default PARTITION OF census_sectors DEFAULT"
+))
+
+class IngestionCheckpoint(Base):
+    """Progresso de ingestões paginadas (permite retomar de onde parou)."""
+    __tablename__ = "ingestion_checkpoints"
+
+    job = Column(String, primary_key=True)          # Ex: nome da camada WFS
+    next_index = Column(Integer, nullable=False, default=0)
+    total_written = Column(Integer, nullable=False, default=0)
+    finished = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,15 @@
+# backend/app/models/rate_limit.py
+from sqlalchemy import Column, String, Float, Boolean, DateTime, func
+from app.core.database import Base
+
+class RateLimitBucket(Base):
+    """
+    Token bucket compartilhado entre workers (RATE_LIMIT_STORE=postgres).
+    Tabela UNLOGGED: perder os saldos num crash só zera os limites.
+    """
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)          # Ex: "read:ip:10.0.0.7", "etl:user:admin"
+    tokens = Column(Float, nullable=False)
+    allowed = Column(Boolean, nullable=False, default=True)  # Resultado da última tentativa
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
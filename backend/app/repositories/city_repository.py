@@ -1,21 +1,173 @@
 # backend/app/repositories/city_repository.py
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, delete
+from sqlalchemy import select, func, delete, update, exists, or_, text, tuple_, literal_column
 from sqlalchemy.dialects.postgresql import insert
-from app.models.city import City, CityCatalog, District
+from sqlalchemy.orm import aliased
+from app.models.city import City, CityCatalog, District, CityIndicatorSource, CityHexbin, CityAdjacency
+from app.core.cache import cache, publish_invalidation
+from app.core.singleflight import coalesce
+from typing import AsyncIterator, Dict, List, Optional
+import base64
 import geopandas as gpd
+import hashlib
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+def content_hash(value) -> str:
+    """SHA-256 estável de bytes (Ex: WKB) ou de estruturas JSON-serializáveis."""
+    if not isinstance(value, bytes):
+        value = json.dumps(value, sort_keys=True, default=str).encode()
+    return hashlib.sha256(value).hexdigest()
+
+def to_multipolygon_ewkb(geom) -> Optional[str]:
+    """Polygon/MultiPolygon (shapely) -> EWKB hex com SRID 4326. None se vazio."""
+    from shapely import set_srid, to_wkb
+    from shapely.geometry import Polygon, MultiPolygon
+
+    if geom is None or geom.is_empty:
+        return None
+    if isinstance(geom, Polygon):
+        geom = MultiPolygon([geom])
+    if not isinstance(geom, MultiPolygon):
+        return None
+    return to_wkb(set_srid(geom, 4326), hex=True, include_srid=True)
+
+# Indicadores incluídos no /export (mesma ordem das colunas do arquivo gerado)
+EXPORT_INDICATORS = (
+    "population", "pib_total", "pib_per_capita", "pib_year",
+    "total_companies", "total_workers", "companies_year",
+)
+
+# Propriedades que o /map aceita em ?fields= e as enviadas quando fields é omitido
+MAP_FIELDS = (
+    "code", "name", "uf", "population", "pib_total", "pib_per_capita", "pib_year",
+    "total_companies", "total_workers", "companies_year",
+)
+MAP_DEFAULT_FIELDS = (
+    "code", "name", "population", "pib_per_capita", "pib_year",
+    "total_companies", "total_workers", "companies_year",
+)
+ZERO_DEFAULT_FIELDS = {"pib_per_capita", "total_companies", "total_workers"}
+
+# Indicadores com índice cobrindo (ix_cities_rank_*) aceitos pelo /rankings
+RANKING_INDICATORS = ("pib_per_capita", "population", "total_companies", "total_workers")
+
+def encode_ranking_cursor(indicator: str, order: str, row: Dict, position: int, rank: int) -> str:
+    """Cursor opaco do keyset: último (valor, code) da página + posição/rank para continuar a contagem."""
+    payload = {"i": indicator, "o": order, "v": row["value"], "c": row["code"], "p": position, "r": rank}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def decode_ranking_cursor(cursor: str, indicator: str, order: str) -> Dict:
+    """ValueError se o cursor for inválido ou de outro ranking."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if payload["i"] != indicator or payload["o"] != order:
+            raise ValueError
+        return payload
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Cursor inválido para este ranking.")
+
+# Resoluções da grade hexagonal: nível -> aresta do hexágono em metros (EPSG:3857)
+HEXBIN_RESOLUTIONS = {1: 200_000, 2: 100_000, 3: 50_000, 4: 25_000}
+
+# Cada cidade cai em UM hexágono (o que contém seu ponto interno). A grade é ancorada
+# na origem do SRS, então ST_HexagonGrid sobre o próprio ponto devolve só as células
+# dele (i, j globais): custo linear no número de cidades, sem gerar a grade do país.
+# DISTINCT ON desempata pontos exatamente na borda entre duas células.
+HEXBIN_REFRESH_SQL = text("""
+    INSERT INTO city_hexbins
+        (resolution, i, j, geom, city_count, population, total_companies, total_workers, pib_total)
+    WITH pts AS (
+        SELECT id, population, total_companies, total_workers, pib_total,
+               ST_Transform(ST_PointOnSurface(geom), 3857) AS p
+        FROM cities
+        WHERE geom IS NOT NULL
+    ),
+    assigned AS (
+        SELECT DISTINCT ON (pts.id) pts.*, h.i, h.j, h.geom AS hex
+        FROM pts
+        CROSS JOIN LATERAL ST_HexagonGrid(:size, pts.p) AS h
+        WHERE ST_Intersects(h.geom, pts.p)
+        ORDER BY pts.id, h.i, h.j
+    )
+    SELECT :resolution, i, j, ST_Transform(hex, 4326), count(*),
+           sum(population), sum(total_companies), sum(total_workers), sum(pib_total)
+    FROM assigned
+    GROUP BY i, j, hex
+""")
+
+# Recalcula só as arestas da cidade recém-gravada; && poda candidatos pelo GiST.
+ADJACENCY_REFRESH_SQL = text("""
+    WITH touching AS (
+        SELECT n.id
+        FROM cities c
+        JOIN cities n ON n.geom && c.geom AND ST_Intersects(n.geom, c.geom) AND n.id <> c.id
+        WHERE c.id = :city_id
+    )
+    INSERT INTO city_adjacency (city_id, neighbor_id)
+    SELECT :city_id, id FROM touching
+    UNION ALL
+    SELECT id, :city_id FROM touching
+    ON CONFLICT DO NOTHING
+""")
+
+# Região contígua: busca em largura de até k saltos sobre o grafo pré-calculado
+REGION_SQL = text("""
+    WITH RECURSIVE region(id, hops) AS (
+        SELECT id, 0 FROM cities WHERE code = :code
+        UNION
+        SELECT a.neighbor_id, r.hops + 1
+        FROM region r
+        JOIN city_adjacency a ON a.city_id = r.id
+        WHERE r.hops < :k
+    )
+    SELECT c.code, c.name, c.uf, min(r.hops) AS hops
+    FROM region r
+    JOIN cities c ON c.id = r.id
+    GROUP BY c.code, c.name, c.uf
+    ORDER BY hops, c.name
+""")
+
+# Razão de áreas calculada no próprio SRID 4326: erro desprezível na escala de um
+# município e evita o custo do cast para geography.
+POLYGON_AGGREGATE_SQL = text("""
+    WITH area AS (
+        SELECT ST_MakeValid(ST_SetSRID(ST_GeomFromGeoJSON(:geojson), 4326)) AS g
+    ),
+    hits AS (
+        SELECT c.population, c.pib_total, c.total_companies, c.total_workers,
+               CASE
+                   WHEN NOT :weighted THEN 1.0
+                   WHEN ST_CoveredBy(c.geom, area.g) THEN 1.0
+                   ELSE ST_Area(ST_Intersection(c.geom, area.g)) / NULLIF(ST_Area(c.geom), 0)
+               END AS ratio
+        FROM cities c, area
+        WHERE c.geom && area.g
+          AND ST_Intersects(c.geom, area.g)
+    )
+    SELECT count(*) AS city_count,
+           sum(population * ratio) AS population,
+           sum(pib_total * ratio) AS pib_total,
+           sum(total_companies * ratio) AS total_companies,
+           sum(total_workers * ratio) AS total_workers
+    FROM hits
+""")
+
 class CityRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def save_full_city_data(self, gdf: gpd.GeoDataFrame, data: dict, districts: list):
-        """Salva Cidade Completa + Lista de Distritos."""
-        if gdf.empty: return
+    async def save_full_city_data(self, gdf: gpd.GeoDataFrame, data: dict, districts: list,
+                                  source_periods: Optional[Dict[str, Dict[str, Optional[str]]]] = None):
+        """
+        Salva Cidade Completa + Lista de Distritos, escrevendo só o que mudou.
+        source_periods: {table_id: {"source_period": período do dado gravado,
+                                    "published_period": último publicado no momento do fetch}}.
+        Retorna relatório do que de fato mudou (cidade, malha, indicadores, distritos).
+        """
+        if gdf.empty: return None
 
         row = gdf.iloc[0]
         
@@ -36,55 +188,237 @@ class CityRepository:
         geom = row["geometry"]
         if isinstance(geom, Polygon):
             geom = MultiPolygon([geom])
-        wkt = geom.wkt 
-
-        # Upsert
-        stmt = insert(City).values(
-            code=city_code,
-            name=city_name,
-            uf=row.get("SIGLA_UF", "BR"),
-            geom=wkt,
-            population=data["population"],
-            pib_total=data["pib_total"],
-            pib_per_capita=data["pib_per_capita"],
-            pib_year=data["pib_year"],
-            total_companies=data["total_companies"],
-            total_workers=data["total_workers"],
-            companies_year=data["companies_year"]
-        ).on_conflict_do_update(
-            index_elements=['code'],
-            set_={
-                "name": city_name,
-                "geom": wkt,
-                "population": data["population"],
-                "pib_total": data["pib_total"],
-                "pib_per_capita": data["pib_per_capita"],
-                "pib_year": data["pib_year"],
-                "total_companies": data["total_companies"],
-                "total_workers": data["total_workers"],
-                "companies_year": data["companies_year"]
-            }
+        # Sem geometria (Malhas fora do ar): mantém a malha já gravada
+        wkt = geom.wkt if geom is not None else None
+
+        values = {
+            "name": city_name,
+            "uf": row.get("SIGLA_UF", "BR"),
+            "population": data["population"],
+            "pib_total": data["pib_total"],
+            "pib_per_capita": data["pib_per_capita"],
+            "pib_year": data["pib_year"],
+            "total_companies": data["total_companies"],
+            "total_workers": data["total_workers"],
+            "companies_year": data["companies_year"]
+        }
+        geom_hash = content_hash(geom.wkb) if geom is not None else None
+        data_hash = content_hash(values)
+
+        changes = {
+            "city": "unchanged",
+            "geometry_changed": False,
+            "indicators_changed": False,
+            "districts": {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        }
+
+        # Serializa imports concorrentes da MESMA cidade entre workers/processos
+        # (lock de transação: liberado no commit/rollback)
+        await self.db.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"city:{city_code}"}
         )
+
+        # Change detection: compara hashes antes de escrever (evita WAL/bloat em re-imports)
+        current = (await self.db.execute(
+            select(City.id, City.geom_hash, City.data_hash).where(City.code == city_code)
+        )).first()
+
+        if current is None:
+            # Upsert atômico: outro import da mesma cidade pode ter inserido entre o SELECT e aqui
+            stmt = insert(City).values(
+                code=city_code, geom=wkt, geom_hash=geom_hash, data_hash=data_hash, **values
+            )
+            set_ = {"data_hash": stmt.excluded.data_hash, **{k: stmt.excluded[k] for k in values}}
+            if geom_hash is not None:
+                set_.update(geom=stmt.excluded.geom, geom_hash=stmt.excluded.geom_hash)
+            # xmax = 0: a linha foi inserida agora (senão o ON CONFLICT atualizou a do outro import)
+            result = (await self.db.execute(
+                stmt.on_conflict_do_update(index_elements=["code"], set_=set_)
+                .returning(City.id, literal_column("xmax = 0").label("inserted"))
+            )).one()
+            city_id = result.id
+            changes.update(city="inserted" if result.inserted else "updated",
+                           geometry_changed=True, indicators_changed=True)
+        else:
+            city_id = current.id
+            set_ = {}
+            if geom_hash is not None and current.geom_hash != geom_hash:
+                set_.update(geom=wkt, geom_hash=geom_hash)
+                changes["geometry_changed"] = True
+            if current.data_hash != data_hash:
+                set_.update(data_hash=data_hash, **values)
+                changes["indicators_changed"] = True
+            if set_:
+                await self.db.execute(update(City).where(City.id == city_id).values(**set_))
+                changes["city"] = "updated"
         
-        result = await self.db.execute(stmt.returning(City.id))
-        city_id = result.scalar()
-        
-        # Atualizar Distritos
+        # Atualizar Distritos (por diff: só grava o que mudou)
         if districts and city_id:
-            await self.db.execute(delete(District).where(District.city_id == city_id))
-            districts_to_insert = []
-            for d in districts:
-                districts_to_insert.append({
-                    "code": str(d["id"]),
-                    "name": d["nome"],
-                    "city_id": city_id
-                })
-            if districts_to_insert:
-                await self.db.execute(insert(District), districts_to_insert)
+            changes["districts"] = await self._sync_districts(city_id, districts)
+
+        # Vizinhança: só as arestas desta cidade (incremental) e só se a malha mudou
+        if city_id and changes["geometry_changed"]:
+            await self._refresh_adjacency(city_id)
+
+        # Registrar períodos de origem (base para o refresh agendado)
+        if source_periods and city_id:
+            await self._save_source_periods(city_id, source_periods)
+        
+        d = changes["districts"]
+        changes["changed"] = changes["city"] != "unchanged" or bool(d["inserted"] or d["updated"] or d["deleted"])
+
+        # Invalidação nos outros workers: NOTIFY na mesma transação (só sai se o commit passar)
+        await publish_invalidation(self.db, "city", city_code) # Detalhe inclui os períodos de origem, sempre regravados
+        if changes["changed"]:
+            await publish_invalidation(self.db, "map") # TopoJSON/payloads derivados ficam obsoletos
         
         await self.db.commit()
-        logger.info(f"✅ Dados salvos com sucesso.")
+        cache.delete("city", city_code)
+
+        if changes["changed"]:
+            cache.invalidate("map")
+            logger.info(f"✅ Dados salvos com sucesso.")
+        else:
+            logger.info(f"⏭️ {city_name}: nada mudou, nenhuma escrita.")
+        return changes
+
+    async def _sync_districts(self, city_id: int, districts: list) -> Dict[str, int]:
+        """Upsert/delete de distritos por diff de hash (nome + malha)."""
+        stats = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+
+        result = await self.db.execute(
+            select(District.code, District.content_hash).where(District.city_id == city_id)
+        )
+        existing = {r.code: r.content_hash for r in result.all()}
+
+        to_write = []
+        incoming = set()
+        for d in districts:
+            code = str(d["id"])
+            incoming.add(code)
+            ewkb = to_multipolygon_ewkb(d.get("geom"))
+            digest = content_hash([d["nome"], ewkb])
+
+            if code not in existing:
+                stats["inserted"] += 1
+            elif existing[code] != digest:
+                stats["updated"] += 1
+            else:
+                stats["unchanged"] += 1
+                continue
+            to_write.append({
+                "code": code, "name": d["nome"], "city_id": city_id, "geom": ewkb, "content_hash": digest
+            })
+
+        if to_write:
+            stmt = insert(District)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["code"],
+                set_={
+                    "name": stmt.excluded.name,
+                    "city_id": stmt.excluded.city_id,
+                    "geom": stmt.excluded.geom,
+                    "content_hash": stmt.excluded.content_hash
+                }
+            )
+            await self.db.execute(stmt, to_write)
+
+        gone = set(existing) - incoming
+        if gone:
+            await self.db.execute(
+                delete(District).where(District.city_id == city_id, District.code.in_(gone))
+            )
+            stats["deleted"] = len(gone)
+
+        return stats
         
+    async def _refresh_adjacency(self, city_id: int):
+        """Apaga e recalcula as arestas (nos dois sentidos) de UMA cidade."""
+        await self.db.execute(
+            delete(CityAdjacency).where(
+                or_(CityAdjacency.city_id == city_id, CityAdjacency.neighbor_id == city_id)
+            )
+        )
+        await self.db.execute(ADJACENCY_REFRESH_SQL, {"city_id": city_id})
+
+    async def _save_source_periods(self, city_id: int, source_periods: Dict[str, Dict[str, Optional[str]]]):
+        """Upsert de (cidade, tabela) -> períodos (do dado e publicado), com timestamp do fetch."""
+        from app.services.ibge.periods import IbgePeriodsService
+
+        rows = [
+            {
+                "city_id": city_id,
+                "table_id": table_id,
+                "indicator": IbgePeriodsService.TABLES.get(table_id, table_id),
+                "source_period": periods["source_period"],
+                "published_period": periods["published_period"]
+            }
+            for table_id, periods in source_periods.items()
+        ]
+        stmt = insert(CityIndicatorSource).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_city_indicator_sources_city_table",
+            set_={
+                "source_period": stmt.excluded.source_period,
+                "published_period": stmt.excluded.published_period,
+                "fetched_at": func.now()
+            }
+        )
+        await self.db.execute(stmt)
+
+    async def get_stored_city(self, city_code: str) -> Optional[Dict]:
+        """
+        Valores já gravados de uma cidade (nome, UF e indicadores), usados pelo import
+        quando o IBGE está fora. Cidade nunca importada: cai para o catálogo (só nome/UF).
+        """
+        row = (await self.db.execute(
+            select(City.name, City.uf, *[getattr(City, f) for f in EXPORT_INDICATORS])
+            .where(City.code == city_code)
+        )).mappings().first()
+        if row is not None:
+            return {**row, "imported": True}
+
+        row = (await self.db.execute(
+            select(CityCatalog.name, CityCatalog.uf).where(CityCatalog.code == city_code)
+        )).mappings().first()
+        return {**row, "imported": False} if row is not None else None
+
+    async def list_stale_city_codes(self, latest_periods: Dict[str, str], limit: int) -> List[str]:
+        """
+        Cidades buscadas antes do último período publicado em ALGUMA tabela. Compara o
+        período publicado no momento do fetch (não o do dado): cidade sem valor no ano
+        novo não volta para a fila a cada execução.
+        Cidades sem registro (importadas antes do agendador) também contam como desatualizadas.
+        """
+        conditions = []
+        for table_id, period in latest_periods.items():
+            if not period:
+                continue  # Sem metadado dessa tabela nesta rodada: não dá para julgar
+            up_to_date = exists().where(
+                CityIndicatorSource.city_id == City.id,
+                CityIndicatorSource.table_id == table_id,
+                CityIndicatorSource.published_period == period
+            )
+            conditions.append(~up_to_date)
+
+        if not conditions:
+            return []
+
+        # Os mais antigos primeiro: cidades nunca registradas e depois por fetched_at
+        oldest_fetch = (
+            select(func.min(CityIndicatorSource.fetched_at))
+            .where(CityIndicatorSource.city_id == City.id)
+            .scalar_subquery()
+        )
+        stmt = (
+            select(City.code)
+            .where(or_(*conditions))
+            .order_by(oldest_fetch.asc().nulls_first(), City.code)
+            .limit(limit)
+        )
+        result = await self.db.execute(stmt)
+        return list(result.scalars().all())
+
     async def update_catalog(self, cities_list: list):
         """
         Atualiza o catálogo completo de cidades (Autocomplete).
@@ -103,36 +437,338 @@ class CityRepository:
             insert(CityCatalog),
             cities_list
         )
+        await publish_invalidation(self.db, "search") # Autocomplete em cache nos workers
         await self.db.commit()
+        cache.invalidate("search")
 
-    async def get_all_features(self):
-        """Retorna GeoJSON com TODOS os dados para o mapa."""
+    @coalesce("repo.get_all_features")
+    async def get_all_features(self, uf: Optional[str] = None, fields: Optional[List[str]] = None):
+        """
+        Retorna GeoJSON das cidades para o mapa (opcionalmente de uma UF).
+        fields: só essas propriedades (além de code), Ex: ["name", "population"]
+        para o coroplético; o resto vem de /cities/{code} ao clicar.
+        """
+        fields = [f for f in (fields or MAP_DEFAULT_FIELDS) if f != "code"]
         stmt = select(
-            City.code, City.name, City.population, 
-            City.pib_per_capita, City.pib_year,
-            City.total_companies, City.total_workers, City.companies_year,
+            City.code, *[getattr(City, f) for f in fields],
             func.ST_AsGeoJSON(City.geom).label("geojson")
         )
+        if uf:
+            stmt = stmt.where(City.uf == uf.upper())
         result = await self.db.execute(stmt)
         
         features = []
-        for row in result.all():
+        for row in result.mappings().all():
+            properties = {"code": row["code"]}
+            for f in fields:
+                # Indicadores ausentes viram 0 (o frontend soma/formata sem checar null)
+                value = row[f]
+                properties[f] = 0 if value is None and f in ZERO_DEFAULT_FIELDS else value
             features.append({
+                "type": "Feature",
+                "geometry": json.loads(row["geojson"]),
+                "properties": properties
+            })
+        return features
+
+    @coalesce("repo.get_city_detail")
+    async def get_city_detail(self, city_code: str) -> Optional[Dict]:
+        """
+        Ficha completa de UMA cidade (indicadores, períodos de origem e distritos),
+        carregada quando o polígono é clicado. Busca pelo índice único de code.
+        """
+        city = (await self.db.execute(
+            select(City.id, City.code, City.name, City.uf, *[getattr(City, f) for f in EXPORT_INDICATORS])
+            .where(City.code == city_code)
+        )).mappings().first()
+        if city is None:
+            return None
+
+        districts = await self.db.execute(
+            select(District.code, District.name, District.geom.isnot(None).label("has_geometry"))
+            .where(District.city_id == city["id"])
+            .order_by(District.code)
+        )
+        sources = await self.db.execute(
+            select(CityIndicatorSource.indicator, CityIndicatorSource.table_id,
+                   CityIndicatorSource.source_period, CityIndicatorSource.fetched_at)
+            .where(CityIndicatorSource.city_id == city["id"])
+        )
+
+        detail = {k: v for k, v in city.items() if k != "id"}
+        detail["sources"] = [dict(r) for r in sources.mappings().all()]
+        detail["districts"] = [dict(r) for r in districts.mappings().all()]
+        return detail
+
+    async def refresh_hexbins(self):
+        """
+        Recalcula a grade hexagonal de TODAS as resoluções (full refresh, numa transação).
+        Barato: um ponto por cidade, não os polígonos completos, e linear no nº de cidades.
+        Imports não chamam isto no request: veja services/hexbins.py.
+        """
+        logger.info("⬡ Recalculando agregação hexagonal...")
+        # Um rebuild por vez entre workers (dois DELETE + INSERT simultâneos colidiriam no índice único)
+        await self.db.execute(text("SELECT pg_advisory_xact_lock(hashtext('city_hexbins'))"))
+        await self.db.execute(delete(CityHexbin))
+        for resolution, size in HEXBIN_RESOLUTIONS.items():
+            await self.db.execute(HEXBIN_REFRESH_SQL, {"resolution": resolution, "size": float(size)})
+        await self.db.commit()
+
+    @coalesce("repo.get_hexbin_features")
+    async def get_hexbin_features(self, resolution: int, bbox: Optional[tuple] = None):
+        """Retorna as células de uma resolução como Features GeoJSON (filtro por bbox)."""
+        stmt = select(
+            CityHexbin.i, CityHexbin.j, CityHexbin.city_count,
+            CityHexbin.population, CityHexbin.total_companies,
+            CityHexbin.total_workers, CityHexbin.pib_total,
+            func.ST_AsGeoJSON(CityHexbin.geom).label("geojson")
+        ).where(CityHexbin.resolution == resolution)
+
+        if bbox:
+            # && usa o índice GiST da geometria
+            envelope = func.ST_MakeEnvelope(*bbox, 4326)
+            stmt = stmt.where(CityHexbin.geom.op("&&")(envelope))
+
+        result = await self.db.execute(stmt)
+        return [
+            {
                 "type": "Feature",
                 "geometry": json.loads(row.geojson),
                 "properties": {
-                    "code": row.code,
-                    "name": row.name, # Isso resolve o "undefined" no tooltip
-                    "population": row.population,
-                    "pib_per_capita": row.pib_per_capita or 0,
-                    "pib_year": row.pib_year,
+                    "id": f"{resolution}:{row.i}:{row.j}",
+                    "city_count": row.city_count,
+                    "population": row.population or 0,
                     "total_companies": row.total_companies or 0,
                     "total_workers": row.total_workers or 0,
-                    "companies_year": row.companies_year
+                    "pib_total": row.pib_total or 0
                 }
+            }
+            for row in result.all()
+        ]
+
+    async def aggregate_in_polygon(self, geojson: str, weighted: bool = True) -> dict:
+        """
+        Soma os indicadores das cidades que intersectam um polígono arbitrário.
+        weighted=True rateia cada cidade pela razão área(interseção)/área(cidade);
+        cidades inteiramente cobertas pulam o ST_Intersection (razão = 1).
+        O filtro && poda os candidatos pelo índice GiST antes de qualquer teste exato.
+        """
+        result = await self.db.execute(POLYGON_AGGREGATE_SQL, {"geojson": geojson, "weighted": weighted})
+        row = result.one()
+        return {
+            "city_count": row.city_count,
+            "weighted": weighted,
+            "population": row.population or 0,
+            "pib_total": row.pib_total or 0,
+            "total_companies": row.total_companies or 0,
+            "total_workers": row.total_workers or 0
+        }
+
+    async def city_exists(self, city_code: str) -> bool:
+        result = await self.db.execute(select(exists().where(City.code == city_code)))
+        return bool(result.scalar())
+
+    async def get_neighbors(self, city_code: str):
+        """Vizinhos diretos lidos do grafo pré-calculado (sem join espacial)."""
+        neighbor = aliased(City)
+        stmt = (
+            select(neighbor.code, neighbor.name, neighbor.uf)
+            .select_from(City)
+            .join(CityAdjacency, CityAdjacency.city_id == City.id)
+            .join(neighbor, neighbor.id == CityAdjacency.neighbor_id)
+            .where(City.code == city_code)
+            .order_by(neighbor.name)
+        )
+        result = await self.db.execute(stmt)
+        return result.all()
+
+    async def get_region(self, city_code: str, k: int):
+        """Cidades a até k saltos de distância no grafo de vizinhança."""
+        result = await self.db.execute(REGION_SQL, {"code": city_code, "k": k})
+        return result.all()
+
+    @coalesce("repo.get_district_features")
+    async def get_district_features(self, city_code: Optional[str] = None, bbox: Optional[tuple] = None):
+        """Retorna GeoJSON dos distritos com malha (de uma cidade e/ou de um bbox)."""
+        stmt = (
+            select(
+                District.code, District.name, City.code.label("city_code"),
+                func.ST_AsGeoJSON(District.geom).label("geojson")
+            )
+            .join(City, City.id == District.city_id)
+            .where(District.geom.isnot(None))
+        )
+        if city_code:
+            stmt = stmt.where(City.code == city_code)
+        if bbox:
+            stmt = stmt.where(District.geom.op("&&")(func.ST_MakeEnvelope(*bbox, 4326)))
+
+        result = await self.db.execute(stmt)
+        return [
+            {
+                "type": "Feature",
+                "geometry": json.loads(row.geojson),
+                "properties": {"code": row.code, "name": row.name, "city_code": row.city_code}
+            }
+            for row in result.all()
+        ]
+
+    async def stream_export_rows(
+        self,
+        layer: str = "cities",
+        indicators: bool = True,
+        uf: Optional[str] = None,
+        geometry_format: str = "wkb",
+        chunk_size: int = 1000
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Lê a camada com cursor do lado do servidor (yield_per) e entrega lotes de
+        chunk_size linhas: só um lote fica em memória por vez, qualquer que seja o tamanho.
+        geometry_format: "wkb" (bytes, para GeoParquet/FlatGeobuf) ou "wkt" (CSV).
+        """
+        geom_fn = func.ST_AsBinary if geometry_format == "wkb" else func.ST_AsText
+
+        if layer == "districts":
+            stmt = (
+                select(
+                    District.code, District.name, City.code.label("city_code"), City.uf,
+                    geom_fn(District.geom).label("geometry")
+                )
+                .join(City, City.id == District.city_id)
+                .order_by(District.id)
+            )
+        else:
+            columns = [City.code, City.name, City.uf]
+            if indicators:
+                columns += [getattr(City, name) for name in EXPORT_INDICATORS]
+            stmt = select(*columns, geom_fn(City.geom).label("geometry")).order_by(City.id)
+
+        if uf:
+            stmt = stmt.where(City.uf == uf.upper())
+
+        result = await self.db.stream(stmt.execution_options(yield_per=chunk_size))
+        async for partition in result.mappings().partitions(chunk_size):
+            yield [dict(row) for row in partition]
+
+    @staticmethod
+    def _ranking_filters(value, uf: Optional[str], min_population: Optional[int], max_population: Optional[int]):
+        filters = [value.isnot(None)]
+        if uf:
+            filters.append(City.uf == uf.upper())
+        if min_population is not None:
+            filters.append(City.population >= min_population)
+        if max_population is not None:
+            filters.append(City.population <= max_population)
+        return filters
+
+    async def get_ranking(
+        self,
+        indicator: str,
+        order: str = "desc",
+        uf: Optional[str] = None,
+        min_population: Optional[int] = None,
+        max_population: Optional[int] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        """
+        Ranking de cidades por um indicador (Ex: top 20 em pib_per_capita em SP).
+
+        Keyset em vez de OFFSET: cada página lê só `limit` entradas do índice
+        ix_cities_rank_<indicador> a partir do último (valor, code) visto, em index-only
+        scan (uf/population vêm do INCLUDE). O rank() roda só sobre a página e é somado
+        à posição trazida no cursor; empates que atravessam a página herdam o rank anterior.
+        """
+        after = decode_ranking_cursor(cursor, indicator, order) if cursor else None
+        value = getattr(City, indicator)
+        descending = order == "desc"
+
+        # (valor, code) na mesma direção: a comparação de linha vira um range do índice
+        ordering = [value.desc(), City.code.desc()] if descending else [value.asc(), City.code.asc()]
+        page_stmt = (
+            select(City.code, City.name, City.uf, City.population, value.label("value"))
+            .where(*self._ranking_filters(value, uf, min_population, max_population))
+            .order_by(*ordering)
+            .limit(limit)
+        )
+        if after:
+            key, last = tuple_(value, City.code), tuple_(after["v"], after["c"])
+            page_stmt = page_stmt.where(key < last if descending else key > last)
+
+        page = page_stmt.subquery()
+        page_order = page.c.value.desc() if descending else page.c.value.asc()
+        stmt = select(
+            page,
+            func.rank().over(order_by=page_order).label("page_rank"),
+            func.row_number().over(order_by=[page_order, page.c.code.desc() if descending else page.c.code.asc()])
+                .label("page_position")
+        ).order_by(text("page_position"))
+
+        rows = (await self.db.execute(stmt)).mappings().all()
+
+        offset = after["p"] if after else 0
+        items = []
+        for row in rows:
+            if after and row["value"] == after["v"]:
+                rank = after["r"]  # Empate com o último da página anterior
+            else:
+                rank = offset + row["page_rank"]
+            items.append({
+                "rank": rank,
+                "code": row["code"],
+                "name": row["name"],
+                "uf": row["uf"],
+                "population": row["population"],
+                "value": row["value"],
             })
-        return features
-        
+
+        next_cursor = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_cursor = encode_ranking_cursor(indicator, order, last, offset + last["page_position"], items[-1]["rank"])
+        return {"indicator": indicator, "order": order, "items": items, "next_cursor": next_cursor}
+
+    async def get_city_rank(
+        self,
+        city_code: str,
+        indicator: str,
+        scope: str = "national",
+        min_population: Optional[int] = None,
+        max_population: Optional[int] = None
+    ) -> Optional[Dict]:
+        """
+        Posição de UMA cidade (1 = maior valor) no país ou na UF dela, opcionalmente entre
+        cidades de porte parecido. Duas contagens por range no índice cobrindo.
+        """
+        value = getattr(City, indicator)
+        city = (await self.db.execute(
+            select(City.code, City.name, City.uf, City.population, value.label("value"))
+            .where(City.code == city_code)
+        )).mappings().first()
+        if city is None:
+            return None
+
+        filters = self._ranking_filters(value, city["uf"] if scope == "uf" else None, min_population, max_population)
+        total = (await self.db.execute(select(func.count()).select_from(City).where(*filters))).scalar()
+
+        rank = None
+        if city["value"] is not None:
+            above = (await self.db.execute(
+                select(func.count()).select_from(City).where(*filters, value > city["value"])
+            )).scalar()
+            rank = above + 1
+
+        return {
+            **city,
+            "indicator": indicator,
+            "scope": scope,
+            "rank": rank,
+            "total": total,
+            # Fração das cidades do recorte que ficam abaixo desta
+            "percentile": round(100.0 * (total - rank) / total, 1) if rank and total else None,
+        }
+
+    @coalesce("repo.list_catalog")
     async def list_catalog(self, search: str = None):
         """Busca simples no catálogo para o frontend."""
         stmt = select(CityCatalog.code, CityCatalog.name, CityCatalog.uf)
@@ -0,0 +1,63 @@
+# backend/app/repositories/sector_repository.py
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from app.models.city import CensusSector, IngestionCheckpoint
+from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SectorRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_checkpoint(self, job: str) -> Optional[IngestionCheckpoint]:
+        result = await self.db.execute(select(IngestionCheckpoint).where(IngestionCheckpoint.job == job))
+        return result.scalars().first()
+
+    async def reset_checkpoint(self, job: str):
+        """Recomeça a ingestão do zero (os setores já gravados são sobrescritos via upsert)."""
+        await self._upsert_checkpoint(job, next_index=0, written=0, finished=False, reset=True)
+        await self.db.commit()
+
+    async def save_page(self, job: str, rows: List[dict], next_index: int, finished: bool):
+        """
+        Grava UMA página de setores + avança o checkpoint na MESMA transação.
+        Se o processo cair, a retomada começa exatamente na página seguinte.
+        """
+        if rows:
+            stmt = insert(CensusSector)
+            stmt = stmt.on_conflict_do_update(
+                # Tabela particionada: o índice único inclui a chave da partição
+                index_elements=["code", "uf_code"],
+                set_={
+                    "city_code": stmt.excluded.city_code,
+                    "properties": stmt.excluded.properties,
+                    "geom": stmt.excluded.geom
+                }
+            )
+            # executemany: o SQLAlchemy agrupa em INSERTs multi-VALUES
+            await self.db.execute(stmt, rows)
+
+        await self._upsert_checkpoint(job, next_index=next_index, written=len(rows), finished=finished)
+        await self.db.commit()
+
+    async def _upsert_checkpoint(self, job: str, next_index: int, written: int, finished: bool,
+                                 reset: bool = False):
+        total = written if reset else IngestionCheckpoint.total_written + written
+        stmt = insert(IngestionCheckpoint).values(
+            job=job,
+            next_index=next_index,
+            total_written=written,
+            finished=finished
+        ).on_conflict_do_update(
+            index_elements=["job"],
+            set_={
+                "next_index": next_index,
+                "total_written": total,
+                "finished": finished,
+                "updated_at": func.now()
+            }
+        )
+        await self.db.execute(stmt)
@@ -1,11 +1,13 @@
 # app/schemas/geo.py
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from pydantic import BaseModel, ConfigDict
+from typing import List, Dict, Any, Optional
 
 class FeatureProperties(BaseModel):
-    """Atributos não espaciais do setor."""
+    """Atributos não espaciais do setor (o /map escolhe quais via ?fields=)."""
+    model_config = ConfigDict(extra="allow")
+
     code: str
-    population: int
+    population: Optional[int] = None
     # Futuro: renda, densidade, nome_bairro...
 
 class Feature(BaseModel):
@@ -17,4 +19,72 @@ class Feature(BaseModel):
 class FeatureCollection(BaseModel):
     """Estrutura Raiz do GeoJSON."""
     type: str = "FeatureCollection"
-    features: List[Feature]
\ No newline at end of file
+    features: List[Feature]
+
+class PolygonQuery(BaseModel):
+    """Polígono desenhado pelo usuário (GeoJSON Polygon/MultiPolygon em EPSG:4326)."""
+    geometry: Dict[str, Any]
+    weighted: bool = True  # Rateio pela fração de área de cada cidade dentro do polígono
+
+class PolygonAggregate(BaseModel):
+    """Indicadores agregados sobre as cidades que intersectam o polígono."""
+    city_count: int
+    weighted: bool
+    population: float
+    pib_total: float
+    total_companies: float
+    total_workers: float
+
+class DistrictSummary(BaseModel):
+    code: str
+    name: str
+    has_geometry: bool
+
+class IndicatorSource(BaseModel):
+    indicator: str
+    table_id: str
+    source_period: Optional[str] = None
+    fetched_at: Any
+
+class CityDetail(BaseModel):
+    """Ficha completa de uma cidade (carregada ao clicar no polígono)."""
+    code: str
+    name: str
+    uf: str
+    population: Optional[int] = None
+    pib_total: Optional[float] = None
+    pib_per_capita: Optional[float] = None
+    pib_year: Optional[int] = None
+    total_companies: Optional[int] = None
+    total_workers: Optional[int] = None
+    companies_year: Optional[int] = None
+    sources: List[IndicatorSource]
+    districts: List[DistrictSummary]
+
+class RankingEntry(BaseModel):
+    rank: int
+    code: str
+    name: str
+    uf: str
+    population: Optional[int] = None
+    value: float
+
+class RankingPage(BaseModel):
+    """Uma página do ranking; next_cursor=None na última."""
+    indicator: str
+    order: str
+    items: List[RankingEntry]
+    next_cursor: Optional[str] = None
+
+class CityRank(BaseModel):
+    """Posição de uma cidade num indicador (1 = maior valor do recorte)."""
+    code: str
+    name: str
+    uf: str
+    population: Optional[int] = None
+    indicator: str
+    value: Optional[float] = None
+    scope: str
+    rank: Optional[int] = None
+    total: int
+    percentile: Optional[float] = None
@@ -0,0 +1,208 @@
+# backend/app/services/exporter.py
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import tempfile
+from typing import AsyncIterator, Dict, List, Optional
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.core.config import settings
+from app.repositories.city_repository import CityRepository, EXPORT_INDICATORS
+
+logger = logging.getLogger(__name__)
+
+# Formato -> (media type, extensão)
+EXPORT_FORMATS = {
+    "geoparquet": ("application/vnd.apache.parquet", "parquet"),
+    "flatgeobuf": ("application/flatgeobuf", "fgb"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+# Tipos Arrow das colunas conhecidas (as demais viram string)
+ARROW_TYPES = {
+    "population": pa.int64(),
+    "pib_total": pa.float64(),
+    "pib_per_capita": pa.float64(),
+    "pib_year": pa.int32(),
+    "total_companies": pa.int64(),
+    "total_workers": pa.int64(),
+    "companies_year": pa.int32(),
+    "geometry": pa.binary(),
+}
+
+FILE_CHUNK_BYTES = 64 * 1024
+
+
+def export_columns(layer: str, indicators: bool) -> List[str]:
+    if layer == "districts":
+        return ["code", "name", "city_code", "uf", "geometry"]
+    return ["code", "name", "uf"] + (list(EXPORT_INDICATORS) if indicators else []) + ["geometry"]
+
+
+def arrow_schema(columns: List[str], geoparquet: bool = False) -> pa.Schema:
+    schema = pa.schema([(c, ARROW_TYPES.get(c, pa.string())) for c in columns])
+    if geoparquet:
+        # Metadados GeoParquet 1.0: geometria em WKB, lon/lat (CRS padrão OGC:CRS84)
+        geo = {
+            "version": "1.0.0",
+            "primary_column": "geometry",
+            "columns": {"geometry": {"encoding": "WKB", "geometry_types": ["MultiPolygon"]}},
+        }
+        schema = schema.with_metadata({b"geo": json.dumps(geo).encode()})
+    return schema
+
+
+def to_record_batch(rows: List[Dict], schema: pa.Schema) -> pa.RecordBatch:
+    return pa.record_batch(
+        [pa.array([row[f.name] for row in rows], type=f.type) for f in schema],
+        schema=schema
+    )
+
+
+class _DrainableSink(io.RawIOBase):
+    """Destino do ParquetWriter que acumula bytes até serem drenados para a resposta."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer.extend(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+async def stream_csv(chunks: AsyncIterator[List[Dict]], columns: List[str]) -> AsyncIterator[bytes]:
+    """CSV com geometria em WKT. Um lote do cursor => um pedaço da resposta."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    async for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def stream_geoparquet(chunks: AsyncIterator[List[Dict]], columns: List[str]) -> AsyncIterator[bytes]:
+    """GeoParquet: cada lote do cursor vira um row group, enviado assim que é escrito."""
+    schema = arrow_schema(columns, geoparquet=True)
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for rows in chunks:
+            writer.write_batch(to_record_batch(rows, schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()  # Escreve o footer (metadados dos row groups)
+    yield sink.drain()
+
+
+async def stream_flatgeobuf(chunks: AsyncIterator[List[Dict]], columns: List[str], layer: str) -> AsyncIterator[bytes]:
+    """
+    FlatGeobuf via GDAL (pyogrio.write_arrow). O driver não escreve em stream, então
+    os lotes do cursor alimentam o GDAL (em thread) por uma fila limitada e vão para
+    um arquivo temporário em disco, transmitido em seguida. A memória continua
+    limitada a poucos lotes; só o primeiro byte demora mais que nos outros formatos.
+    """
+    import pyogrio
+
+    schema = arrow_schema(columns)
+    batches: "queue.Queue[Optional[pa.RecordBatch]]" = queue.Queue(maxsize=2)
+
+    def batch_iter():
+        while (batch := batches.get()) is not None:
+            yield batch
+
+    fd, path = tempfile.mkstemp(suffix=".fgb")
+    os.close(fd)
+    try:
+        writer = asyncio.create_task(asyncio.to_thread(
+            pyogrio.write_arrow,
+            pa.RecordBatchReader.from_batches(schema, batch_iter()),
+            path,
+            layer=layer,
+            driver="FlatGeobuf",
+            geometry_name="geometry",
+            geometry_type="MultiPolygon",
+            crs="EPSG:4326",
+            layer_options={"SPATIAL_INDEX": "NO"},  # Índice exigiria todas as features antes de escrever
+        ))
+
+        async def feed(batch: Optional[pa.RecordBatch]) -> bool:
+            # put_nowait + espera assíncrona: nunca bloqueia se o GDAL parar de consumir
+            while not writer.done():
+                try:
+                    batches.put_nowait(batch)
+                    return True
+                except queue.Full:
+                    await asyncio.sleep(0.01)
+            return False  # GDAL falhou: o erro sobe no await abaixo
+
+        try:
+            async for rows in chunks:
+                if not await feed(to_record_batch(rows, schema)):
+                    break
+        finally:
+            await feed(None)
+        await writer
+
+        with open(path, "rb") as f:
+            while data := f.read(FILE_CHUNK_BYTES):
+                yield data
+    finally:
+        os.unlink(path)
+
+
+async def stream_export(
+    format: str,
+    layer: str = "cities",
+    indicators: bool = True,
+    uf: Optional[str] = None,
+    session_factory: Optional[async_sessionmaker] = None
+) -> AsyncIterator[bytes]:
+    """
+    Ponto de entrada do /export. Abre a própria sessão: a resposta continua sendo
+    transmitida depois que a rota retorna, então a sessão da dependência não serve.
+    session_factory: réplica escolhida pela rota (padrão: primário).
+    """
+    from app.core.database import AsyncSessionLocal
+
+    columns = export_columns(layer, indicators)
+    async with (session_factory or AsyncSessionLocal)() as session:
+        chunks = CityRepository(session).stream_export_rows(
+            layer=layer,
+            indicators=indicators,
+            uf=uf,
+            geometry_format="wkt" if format == "csv" else "wkb",
+            chunk_size=settings.EXPORT_CHUNK_SIZE
+        )
+        logger.info(f"📦 Exportando {layer} em {format}...")
+        if format == "csv":
+            stream = stream_csv(chunks, columns)
+        elif format == "geoparquet":
+            stream = stream_geoparquet(chunks, columns)
+        else:
+            stream = stream_flatgeobuf(chunks, columns, layer)
+        async for data in stream:
+            yield data
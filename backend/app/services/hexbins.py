@@ -0,0 +1,43 @@
+# app/services/hexbins.py
+import logging
+from app.core.admission import etl_limiter, PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+class HexbinRefresher:
+    """
+    Recalcula a grade hexagonal fora do request de import.
+    Pedidos que chegam durante uma execução viram UMA execução seguinte (que já enxerga
+    todos os imports commitados até ali): uma rajada de imports custa no máximo 2 rebuilds.
+    """
+
+    def __init__(self):
+        self._pending = False
+        self._running = False
+
+    async def request(self) -> None:
+        self._pending = True
+        if self._running:
+            return  # A execução em andamento roda de novo ao terminar
+        self._running = True
+        try:
+            while self._pending:
+                self._pending = False
+                await self._rebuild()
+        finally:
+            self._running = False
+
+    async def _rebuild(self) -> None:
+        from app.core.database import AsyncSessionLocal
+        from app.repositories.city_repository import CityRepository
+
+        try:
+            async with etl_limiter.slot(PRIORITY_BACKGROUND, background=True):
+                async with AsyncSessionLocal() as session:
+                    await CityRepository(session).refresh_hexbins()
+        except Exception as e:
+            # A grade antiga continua servindo; o próximo import (ou /admin/hexbins/refresh) tenta de novo
+            logger.error(f"Erro ao recalcular hexbins: {e}")
+
+# Instância única por processo
+hexbin_refresher = HexbinRefresher()
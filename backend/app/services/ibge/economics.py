@@ -1,86 +1,80 @@
 # backend/app/services/ibge/economics.py
-import httpx
 import logging
+from app.core.config import settings
+import pandas as pd
 from typing import Dict, Tuple, Any
+from app.services.ibge.parser import parse_agregados, latest_valid, wide_by_period
+from app.services.ibge.periods import IbgePeriodsService
+from app.services.ibge.resilience import ibge_get
+from app.core.singleflight import coalesce
 
 logger = logging.getLogger(__name__)
 
 class IbgeEconomicsService:
-    BASE_URL = "https://servicodados.ibge.gov.br/api/v3/agregados"
+    BASE_URL = f"{settings.IBGE_API_URL}/v3/agregados"
 
+    @coalesce("ibge.fetch_pib")
     async def fetch_pib(self, city_code: str) -> Tuple[float, str]:
         """
         Busca PIB Total (Tabela 5938).
         Retorna: (Valor em Mil Reais, Ano de Referência)
-        Janela: 2020 a 2025.
+        Janela: os 6 últimos anos publicados (o PIB sai com ~2 anos de defasagem).
+        Levanta UpstreamUnavailable se o IBGE estiver fora.
         """
-        # Solicita os últimos 6 anos possíveis
-        url = f"{self.BASE_URL}/5938/periodos/2025|2024|2023|2022|2021|2020/variaveis/37?localidades=N6[{city_code}]"
+        periods = await IbgePeriodsService().recent_periods("5938", 6)
+        url = f"{self.BASE_URL}/5938/periodos/{periods}/variaveis/37?localidades=N6[{city_code}]"
         
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            try:
-                resp = await client.get(url)
-                if resp.status_code != 200: return 0.0, ""
-                
-                data = resp.json()
-                if not data: return 0.0, ""
+        resp = await ibge_get("agregados", url, timeout=15.0)
+        try:
+            if resp.status_code != 200: return 0.0, ""
+            
+            frame = parse_agregados(resp.json())
 
-                series = data[0]["resultados"][0]["series"][0]["serie"]
-                
-                # Ordena decrescente para pegar o ano mais recente com valor válido
-                for ano in sorted(series.keys(), reverse=True):
-                    val = series[ano]
-                    if val and val not in ["-", "...", "X"]:
-                        return float(val), ano
-                
-                return 0.0, ""
-            except Exception as e:
-                logger.error(f"Erro PIB: {e}")
+            # Ano mais recente com valor válido (sentinelas já viram NaN no parser)
+            latest = latest_valid(frame, "37")
+            if city_code not in latest.index:
                 return 0.0, ""
+            return float(latest.at[city_code, "value"]), latest.at[city_code, "period"]
+        except Exception as e:
+            logger.error(f"Erro PIB: {e}")
+            return 0.0, ""
 
+    @coalesce("ibge.fetch_companies_stats")
     async def fetch_companies_stats(self, city_code: str) -> Dict[str, int]:
         """
         Busca dados do CEMPRE (Tabela 1685).
-        Varredura: 2025 -> 2019.
+        Varredura: os 7 últimos anos publicados, do mais recente ao mais antigo.
         Retorna: {total_companies, total_workers, year}
+        Levanta UpstreamUnavailable se o IBGE estiver fora.
         """
+        periods = await IbgePeriodsService().recent_periods("1685", 7)
         # Variáveis: 153 (Unidades locais), 154 (Pessoal ocupado)
-        url = f"{self.BASE_URL}/1685/periodos/2025|2024|2023|2022|2021|2020|2019/variaveis/153|154?localidades=N6[{city_code}]&classificacao=12762[0]" 
+        url = f"{self.BASE_URL}/1685/periodos/{periods}/variaveis/153|154?localidades=N6[{city_code}]&classificacao=12762[0]" 
         
         stats = {"total_companies": 0, "total_workers": 0, "year": 0}
         
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            try:
-                resp = await client.get(url)
-                if resp.status_code != 200: return stats
-                
-                data = resp.json()
-                # O IBGE retorna uma lista com 2 objetos (um para cada variável)
-                # Precisamos achar um ano comum ou o mais recente de cada.
-                
-                # Mapa auxiliar: { '2021': {'153': 100, '154': 500}, '2020': ... }
-                years_data = {}
-
-                for item in data:
-                    var_id = str(item["id"])
-                    series = item["resultados"][0]["series"][0]["serie"]
-                    
-                    for ano, val in series.items():
-                        if val and val not in ["-", "...", "X"]:
-                            if ano not in years_data: years_data[ano] = {}
-                            years_data[ano][var_id] = int(val)
+        resp = await ibge_get("agregados", url, timeout=15.0)
+        try:
+            if resp.status_code != 200: return stats
+            
+            # O IBGE retorna uma lista com 2 objetos (um para cada variável).
+            # Pivotamos para (localidade, ano) x variável e pegamos o ano mais recente
+            # que tenha empresas (153); pessoal ocupado (154) vem do MESMO ano.
+            wide = wide_by_period(parse_agregados(resp.json()))
+            if "153" not in wide.columns or city_code not in wide.index.get_level_values(0):
+                return stats
 
-                # Agora pega o ano mais recente que tenha AMBOS os dados (ou pelo menos empresas)
-                for ano in sorted(years_data.keys(), reverse=True):
-                    vals = years_data[ano]
-                    # Se tiver empresas (153), usamos esse ano
-                    if "153" in vals:
-                        stats["total_companies"] = vals.get("153", 0)
-                        stats["total_workers"] = vals.get("154", 0)
-                        stats["year"] = int(ano)
-                        break
-                
+            city = wide.loc[city_code]
+            city = city[city["153"].notna()].sort_index(ascending=False)
+            if city.empty:
                 return stats
-            except Exception as e:
-                logger.error(f"Erro CEMPRE: {e}")
-                return stats
\ No newline at end of file
+
+            ano, vals = city.index[0], city.iloc[0]
+            workers = vals.get("154")
+            stats["total_companies"] = int(vals["153"])
+            stats["total_workers"] = 0 if pd.isna(workers) else int(workers)
+            stats["year"] = int(ano)
+            return stats
+        except Exception as e:
+            logger.error(f"Erro CEMPRE: {e}")
+            return stats
\ No newline at end of file
@@ -1,19 +1,23 @@
 # backend/app/services/ibge/geometry.py
-import httpx
 import geopandas as gpd
 from io import BytesIO
 import logging
+from app.core.config import settings
+from app.services.ibge.resilience import ibge_get
+from app.core.singleflight import coalesce
 
 logger = logging.getLogger(__name__)
 
 class IbgeGeometryService:
     # API Malhas v3 (Municípios) - Fonte Oficial e Estável
-    BASE_URL = "https://servicodados.ibge.gov.br/api/v3/malhas/municipios"
+    BASE_URL = f"{settings.IBGE_API_URL}/v3/malhas/municipios"
 
+    @coalesce("ibge.fetch_city_geom")
     async def fetch_city_geom(self, city_code: str) -> gpd.GeoDataFrame:
         """
         Baixa a geometria de UM município específico.
         Ex: city_code = 3504107 (Atibaia)
+        Levanta UpstreamUnavailable se o IBGE estiver fora.
         """
         url = f"{self.BASE_URL}/{city_code}"
         params = {
@@ -21,32 +25,69 @@ class IbgeGeometryService:
             "qualidade": "minima" # Leve para web
         }
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            logger.info(f"🌍 Baixando malha para {city_code}...")
-            response = await client.get(url, params=params)
-            
-            if response.status_code != 200:
-                logger.error(f"Erro IBGE Malhas: {response.status_code}")
-                return gpd.GeoDataFrame()
-
-            try:
-                gdf = gpd.read_file(BytesIO(response.content))
-            except Exception as e:
-                logger.error(f"Erro ao ler GeoJSON: {e}")
-                return gpd.GeoDataFrame()
-            
-            if gdf.empty:
-                return gdf
+        logger.info(f"🌍 Baixando malha para {city_code}...")
+        response = await ibge_get("malhas", url, params=params, timeout=30.0)
+        
+        if response.status_code != 200:
+            logger.error(f"Erro IBGE Malhas: {response.status_code}")
+            return gpd.GeoDataFrame()
 
-            # Padronização de CRS (IBGE usa SIRGAS 2000, Web usa WGS84)
-            if gdf.crs != "EPSG:4326":
-                gdf = gdf.to_crs("EPSG:4326")
-            
-            # Correção Topológica
-            gdf["geometry"] = gdf["geometry"].buffer(0)
+        try:
+            gdf = gpd.read_file(BytesIO(response.content))
+        except Exception as e:
+            logger.error(f"Erro ao ler GeoJSON: {e}")
+            return gpd.GeoDataFrame()
+        
+        if gdf.empty:
+            return gdf
+
+        # Padronização de CRS (IBGE usa SIRGAS 2000, Web usa WGS84)
+        if gdf.crs != "EPSG:4326":
+            gdf = gdf.to_crs("EPSG:4326")
+        
+        # Correção Topológica
+        gdf["geometry"] = gdf["geometry"].buffer(0)
+        
+        # Garante coluna de código para o merge posterior
+        # A API de malhas as vezes não traz o código na properties, então forçamos.
+        gdf["code"] = str(city_code)
             
-            # Garante coluna de código para o merge posterior
-            # A API de malhas as vezes não traz o código na properties, então forçamos.
-            gdf["code"] = str(city_code)
-                
-            return gdf
\ No newline at end of file
+        return gdf
+
+    @coalesce("ibge.fetch_district_geoms")
+    async def fetch_district_geoms(self, city_code: str) -> gpd.GeoDataFrame:
+        """
+        Baixa a malha de TODOS os distritos de um município num único request
+        (intrarregiao=distrito), em vez de um request por distrito.
+        Retorna GeoDataFrame com coluna "code" = código do distrito (codarea).
+        Levanta UpstreamUnavailable se o IBGE estiver fora.
+        """
+        url = f"{self.BASE_URL}/{city_code}"
+        params = {
+            "formato": "application/vnd.geo+json",
+            "qualidade": "minima",
+            "intrarregiao": "distrito"
+        }
+
+        logger.info(f"🗺️ Baixando malha de distritos para {city_code}...")
+        response = await ibge_get("malhas", url, params=params, timeout=30.0)
+
+        if response.status_code != 200:
+            logger.error(f"Erro IBGE Malhas (Distritos): {response.status_code}")
+            return gpd.GeoDataFrame()
+
+        try:
+            gdf = gpd.read_file(BytesIO(response.content))
+        except Exception as e:
+            logger.error(f"Erro ao ler GeoJSON de distritos: {e}")
+            return gpd.GeoDataFrame()
+
+        if gdf.empty or "codarea" not in gdf.columns:
+            return gpd.GeoDataFrame()
+
+        if gdf.crs != "EPSG:4326":
+            gdf = gdf.to_crs("EPSG:4326")
+        gdf["geometry"] = gdf["geometry"].buffer(0)
+        gdf["code"] = gdf["codarea"].astype(str)
+
+        return gdf[["code", "geometry"]]
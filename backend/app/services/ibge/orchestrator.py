@@ -1,11 +1,16 @@
 # backend/app/services/ibge/orchestrator.py
 import logging
+import geopandas as gpd
+from typing import Awaitable, List
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.ibge.geometry import IbgeGeometryService
 from app.services.ibge.demographics import IbgeDemographicsService
 from app.repositories.city_repository import CityRepository
 from app.services.ibge.economics import IbgeEconomicsService 
 from app.services.ibge.topology import IbgeTopologyService
+from app.services.ibge.periods import IbgePeriodsService
+from app.services.ibge.resilience import UpstreamUnavailable
+from app.core.singleflight import coalesce
 
 logger = logging.getLogger(__name__)
 
@@ -16,8 +21,10 @@ class IbgeEtlOrchestrator:
         self.demo_service = IbgeDemographicsService()
         self.eco_service = IbgeEconomicsService() 
         self.topo_service = IbgeTopologyService() 
+        self.periods_service = IbgePeriodsService()
         self.repo = CityRepository(db)
 
+    @coalesce("etl.sync_catalog")
     async def sync_catalog(self):
         """
         Baixa a lista de TODOS os municípios do Brasil e salva no banco.
@@ -32,16 +39,47 @@ class IbgeEtlOrchestrator:
         await self.repo.update_catalog(cities_list)
         return {"status": "success", "total": len(cities_list)}
 
+    async def _fetch_or_keep(self, label: str, fetch: Awaitable, stale: List[str], can_keep: bool):
+        """
+        Executa o fetch; se o IBGE estiver fora (timeout/5xx/circuito aberto), devolve None
+        e marca `label` como stale para manter o valor já gravado, em vez de escrever zero.
+        Sem valor gravado para manter (can_keep=False), o erro sobe.
+        """
+        try:
+            return await fetch
+        except UpstreamUnavailable as e:
+            if not can_keep:
+                raise
+            logger.warning(f"⚠️ {e}. Mantendo '{label}' já gravado.")
+            stale.append(label)
+            return None
+
+    @coalesce("etl.import_city")
     async def import_city(self, city_code: str):
         logger.info(f"🚀 Iniciando ETL Profundo para {city_code}...")
+
+        # Valores já gravados: fallback se alguma API do IBGE estiver fora
+        stored = await self.repo.get_stored_city(city_code)
+        imported = bool(stored and stored["imported"])
+        stale: List[str] = []
         
         # 1. Dados Básicos
-        gdf = await self.geo_service.fetch_city_geom(city_code)
-        details = await self.demo_service.fetch_city_details(city_code)
+        gdf = await self._fetch_or_keep("geometry", self.geo_service.fetch_city_geom(city_code), stale, imported)
+        details = await self._fetch_or_keep("details", self.demo_service.fetch_city_details(city_code), stale, stored is not None)
+        if details is None:
+            details = {"name": stored["name"], "uf": stored["uf"]}
         city_name = details["name"]
         
-        population = await self.demo_service.fetch_city_population(city_code)
+        population = await self._fetch_or_keep("population", self.demo_service.fetch_city_population(city_code), stale, imported)
+        if population is None:
+            population = (stored["population"] or 0, "")
+        population, population_period = population
         
+        if gdf is not None:
+            gdf = gdf.copy()  # Resultado do fetch é compartilhado (single-flight): não alterar o original
+        if gdf is None:
+            # Malha indisponível: linha sem geometria => o repositório preserva a gravada
+            gdf = gpd.GeoDataFrame({"code": [city_code]}, geometry=[None], crs="EPSG:4326")
         if gdf.empty:
             raise ValueError(f"Cidade {city_code} não encontrada.")
 
@@ -51,8 +89,18 @@ class IbgeEtlOrchestrator:
 
         # 2. Dados Econômicos (Desempacota a tupla valor, ano)
         logger.info("💰 Buscando indicadores econômicos...")
-        pib_total, pib_year = await self.eco_service.fetch_pib(city_code)
-        company_stats = await self.eco_service.fetch_companies_stats(city_code)
+        pib = await self._fetch_or_keep("pib", self.eco_service.fetch_pib(city_code), stale, imported)
+        if pib is None:
+            pib = (stored["pib_total"] or 0.0, str(stored["pib_year"] or ""))
+        pib_total, pib_year = pib
+
+        company_stats = await self._fetch_or_keep("companies", self.eco_service.fetch_companies_stats(city_code), stale, imported)
+        if company_stats is None:
+            company_stats = {
+                "total_companies": stored["total_companies"] or 0,
+                "total_workers": stored["total_workers"] or 0,
+                "year": stored["companies_year"] or 0
+            }
         
         # Log para debug
         logger.info(f"Dados encontrados: PIB ({pib_year}): {pib_total}, Empresas ({company_stats['year']}): {company_stats['total_companies']}")
@@ -60,10 +108,31 @@ class IbgeEtlOrchestrator:
         # Cálculo de Derivados
         pib_per_capita = (pib_total * 1000) / population if population > 0 else 0
         
-        # 3. Topologia
-        districts_list = await self.topo_service.fetch_districts(city_code)
+        # 3. Topologia (lista de distritos + malha de todos num request só).
+        # Se qualquer parte falhar, não sincroniza distritos (evita apagar malhas gravadas).
+        districts_list = await self._fetch_or_keep("districts", self.topo_service.fetch_districts(city_code), stale, True)
+        if districts_list:
+            districts_list = [dict(d) for d in districts_list]  # Idem: cópia antes de anexar a malha
+            district_geoms = await self._fetch_or_keep("districts", self.geo_service.fetch_district_geoms(city_code), stale, True)
+            if district_geoms is None:
+                districts_list = None
+            else:
+                geoms_by_code = dict(zip(district_geoms.get("code", []), district_geoms.get("geometry", [])))
+                for d in districts_list:
+                    d["geom"] = geoms_by_code.get(str(d["id"]))
         
-        # 4. Persistência
+        # 4. Períodos: o do dado que veio na resposta e o último publicado pela tabela
+        # (cacheado em memória: custo ~zero por import). Indicador mantido do banco
+        # NÃO registra nada (o refresh tenta de novo depois).
+        data_periods = {"4714": population_period, "5938": pib_year, "1685": str(company_stats["year"] or "")}
+        published = await self.periods_service.fetch_latest_periods()
+        source_periods = {
+            t: {"source_period": data_periods[t] or None, "published_period": published.get(t)}
+            for t, indicator in self.periods_service.TABLES.items()
+            if indicator not in stale
+        }
+
+        # 5. Persistência
         city_data = {
             "population": population,
             "pib_total": pib_total,
@@ -74,7 +143,16 @@ class IbgeEtlOrchestrator:
             "companies_year": company_stats["year"]
         }
         
-        await self.repo.save_full_city_data(gdf, city_data, districts_list)
+        # Agregados derivados (grade hexagonal) ficam com o chamador: o endpoint agenda em
+        # background e o refresh em lote recalcula uma vez no fim.
+        changes = await self.repo.save_full_city_data(gdf, city_data, districts_list or [], source_periods)
         
         # Retorna metadados extras para o Frontend (Via resposta do Import)
-        return {"status": "success", "city": gdf["NM_MUN"].iloc[0], "data": city_data}
\ No newline at end of file
+        # stale: partes que o IBGE não entregou e foram mantidas do banco
+        return {
+            "status": "stale" if stale else "success",
+            "city": gdf["NM_MUN"].iloc[0],
+            "data": city_data,
+            "changes": changes,
+            "stale": sorted(set(stale))
+        }
@@ -0,0 +1,119 @@
+# backend/app/services/ibge/parser.py
+import numpy as np
+import pandas as pd
+from typing import Any, List
+
+# Símbolos especiais do SIDRA/Agregados:
+#   "-"   zero absoluto (não resultante de arredondamento)
+#   ".."  não se aplica
+#   "..." dado não disponível
+#   "X"   dado omitido (sigilo)
+# O ETL sempre tratou todos como "sem valor"; mantemos isso (NaN) e guardamos o símbolo.
+SENTINELS = np.array(["-", "..", "...", "X"], dtype=object)
+
+COLUMNS = ["variable", "category", "locality", "locality_name", "period", "raw", "value", "sentinel"]
+
+
+def parse_agregados(payload: List[dict]) -> pd.DataFrame:
+    """
+    Converte QUALQUER resposta do Agregados v3 em um DataFrame colunar (formato longo).
+    Uma linha por (variável × classificação × localidade × período).
+
+    Estrutura de entrada:
+    [{'id': '93', 'resultados': [{'classificacoes': [...],
+        'series': [{'localidade': {'id': '3504107', 'nome': 'Atibaia - SP'},
+                    'serie': {'2022': '158647'}}]}]}]
+    """
+    if not payload:
+        return pd.DataFrame({c: pd.Series(dtype="float64" if c == "value" else object) for c in COLUMNS})
+
+    # Passo único: metadados no nível da série (uma entrada por localidade) e
+    # valores no nível da célula; depois np.repeat expande os metadados sem laço Python.
+    series_var: List[str] = []
+    series_cat: List[str] = []
+    series_loc: List[str] = []
+    series_name: List[Any] = []
+    counts: List[int] = []
+    periods: List[str] = []
+    raws: List[Any] = []
+
+    for item in payload:
+        var_id = str(item.get("id"))
+        for resultado in item.get("resultados") or []:
+            category = _category_key(resultado.get("classificacoes"))
+            for serie in resultado.get("series") or []:
+                values = serie.get("serie") or {}
+                if not values:
+                    continue
+                loc = serie.get("localidade") or {}
+                series_var.append(var_id)
+                series_cat.append(category)
+                series_loc.append(str(loc.get("id")))
+                series_name.append(loc.get("nome"))
+                counts.append(len(values))
+                periods.extend(values.keys())
+                raws.extend(values.values())
+
+    repeats = np.asarray(counts, dtype=np.int64)
+    raw = np.array(raws, dtype=object)
+
+    # Vetorizado: sentinelas (e nulos) viram "nan" e o array inteiro é convertido de uma vez
+    is_sentinel = np.isin(raw, SENTINELS)
+    missing = is_sentinel | pd.isna(raw)
+    try:
+        value = np.where(missing, "nan", raw).astype("float64")
+    except ValueError:
+        # Símbolo desconhecido no meio dos dados: caminho lento, mas tolerante
+        value = pd.to_numeric(pd.Series(np.where(missing, None, raw)), errors="coerce").to_numpy(dtype="float64")
+
+    sentinel_codes = np.full(len(raw), -1, dtype=np.int8)
+    hits = np.flatnonzero(is_sentinel)
+    sentinel_codes[hits] = pd.Index(SENTINELS).get_indexer(raw[hits])
+
+    return pd.DataFrame({
+        "variable": _repeat_categorical(series_var, repeats),
+        "category": _repeat_categorical(series_cat, repeats),
+        "locality": np.repeat(np.array(series_loc, dtype=object), repeats),
+        "locality_name": np.repeat(np.array(series_name, dtype=object), repeats),
+        "period": np.array(periods, dtype=object),
+        "raw": raw,
+        "value": value,
+        "sentinel": pd.Categorical.from_codes(sentinel_codes, categories=SENTINELS),
+    })
+
+
+def latest_valid(frame: pd.DataFrame, variable: str) -> pd.DataFrame:
+    """
+    Para cada localidade, o período mais recente com valor válido da variável.
+    Retorna DataFrame indexado por localidade com colunas [period, value].
+    """
+    subset = frame[(frame["variable"] == str(variable)) & frame["value"].notna()]
+    subset = subset.sort_values("period", ascending=False, kind="stable")
+    return subset.drop_duplicates("locality")[["locality", "period", "value"]].set_index("locality")
+
+
+def wide_by_period(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pivota para formato largo: índice (localidade, período), uma coluna por variável.
+    Útil quando várias variáveis precisam vir do MESMO ano (Ex: CEMPRE 153/154).
+    """
+    valid = frame[frame["value"].notna()]
+    return valid.pivot_table(
+        index=["locality", "period"], columns="variable", values="value", aggfunc="first", observed=True
+    )
+
+
+def _repeat_categorical(values: List[str], repeats: np.ndarray) -> pd.Categorical:
+    """Categoriza no nível da série (poucas entradas) e expande só os códigos inteiros."""
+    small = pd.Categorical(values)
+    return pd.Categorical.from_codes(np.repeat(small.codes, repeats), categories=small.categories)
+
+
+def _category_key(classificacoes) -> str:
+    """Ex: [{'id': '12762', 'categoria': {'0': 'Total'}}] -> '12762:0'."""
+    if not classificacoes:
+        return ""
+    return "|".join(
+        f"{c.get('id')}:{','.join(str(k) for k in (c.get('categoria') or {}))}"
+        for c in classificacoes
+    )
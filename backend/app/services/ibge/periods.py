@@ -0,0 +1,103 @@
+# backend/app/services/ibge/periods.py
+import asyncio
+import time
+import httpx
+import logging
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.services.ibge.resilience import get_breaker, UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+class IbgePeriodsService:
+    """
+    Consulta barata de metadados: quais períodos cada tabela do Agregados v3 já publicou.
+    Um GET em /periodos custa poucos bytes, contra seis downloads de um import completo.
+    """
+    BASE_URL = f"{settings.IBGE_API_URL}/v3/agregados"
+
+    # Tabelas usadas pelo ETL -> indicador que elas alimentam
+    TABLES = {
+        "4714": "population",  # Censo 2022 - População
+        "5938": "pib",         # PIB dos Municípios
+        "1685": "companies",   # CEMPRE
+    }
+
+    # Cache em memória compartilhado entre instâncias: {table_id: (timestamp, [periodos])}
+    _cache: Dict[str, tuple] = {}
+
+    async def fetch_periods(self, table_id: str, client: Optional[httpx.AsyncClient] = None) -> Optional[List[str]]:
+        """
+        Períodos publicados pela tabela, do mais antigo ao mais recente (Ex: ["2020", "2021"]).
+        Retorna None se o IBGE não responder (o chamador decide o que fazer).
+        """
+        cached = self._cache.get(table_id)
+        if cached and time.monotonic() - cached[0] < settings.PERIODS_CACHE_TTL_SECONDS:
+            return cached[1]
+
+        url = f"{self.BASE_URL}/{table_id}/periodos"
+        breaker = get_breaker("agregados")  # Mesmo circuito das consultas de dados
+        try:
+            breaker.before_call()
+            try:
+                if client is None:
+                    async with httpx.AsyncClient(timeout=10.0) as own_client:
+                        resp = await own_client.get(url)
+                else:
+                    resp = await client.get(url)
+            except asyncio.CancelledError:
+                breaker.abandon_call()  # Libera o teste do half_open (veja ibge_get)
+                raise
+            except httpx.HTTPError:
+                raise
+            except BaseException:
+                breaker.record_failure()
+                raise
+            if resp.status_code >= 500 or resp.status_code == 429:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if resp.status_code != 200:
+                logger.warning(f"Erro API Períodos ({table_id}): {resp.status_code}")
+                return None
+
+            # Estrutura: [{'id': '2020', 'literals': ['2020'], 'modificacao': '...'}, ...]
+            ids = [str(p["id"]) for p in resp.json() if p.get("id")]
+        except UpstreamUnavailable as e:
+            logger.warning(str(e))
+            return None
+        except httpx.HTTPError as e:
+            breaker.record_failure()
+            logger.error(f"Erro Períodos ({table_id}): {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Erro Períodos ({table_id}): {e}")
+            return None
+
+        if not ids:
+            return None
+
+        # Os ids são numéricos (AAAA ou AAAAMM); ordena por valor inteiro
+        periods = sorted(ids, key=lambda p: int(p) if p.isdigit() else -1)
+        self._cache[table_id] = (time.monotonic(), periods)
+        return periods
+
+    async def fetch_latest_period(self, table_id: str, client: Optional[httpx.AsyncClient] = None) -> Optional[str]:
+        """Período mais recente publicado pela tabela (Ex: "2021"), ou None."""
+        periods = await self.fetch_periods(table_id, client)
+        return periods[-1] if periods else None
+
+    async def recent_periods(self, table_id: str, count: int) -> str:
+        """
+        Segmento de período para a URL do Agregados com os `count` mais recentes publicados
+        (Ex: "2021|2020|2019"). Sem metadado, usa "-count" (últimos N, sintaxe da própria API).
+        """
+        periods = await self.fetch_periods(table_id)
+        if not periods:
+            return f"-{count}"
+        return "|".join(reversed(periods[-count:]))
+
+    async def fetch_latest_periods(self) -> Dict[str, Optional[str]]:
+        """Período mais recente de TODAS as tabelas do ETL (3 requisições, uma conexão)."""
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            return {t: await self.fetch_latest_period(t, client) for t in self.TABLES}
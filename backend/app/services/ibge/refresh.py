@@ -0,0 +1,99 @@
+# backend/app/services/ibge/refresh.py
+import asyncio
+import logging
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.admission import etl_limiter, PRIORITY_BACKGROUND
+from app.core.config import settings
+from app.repositories.city_repository import CityRepository
+from app.services.ibge.orchestrator import IbgeEtlOrchestrator
+from app.services.ibge.periods import IbgePeriodsService
+from app.services.ibge.resilience import breaker_states
+
+logger = logging.getLogger(__name__)
+
+class IbgeRefreshScheduler:
+    """
+    Refresh incremental: só reimporta cidades cuja fonte publicou um período novo.
+    Custo por execução: 3 requisições de /periodos + 6 por cidade desatualizada.
+    """
+
+    def __init__(self, db: AsyncSession, batch_size: Optional[int] = None,
+                 batch_interval: Optional[float] = None):
+        self.db = db
+        self.repo = CityRepository(db)
+        self.periods_service = IbgePeriodsService()
+        self.orchestrator = IbgeEtlOrchestrator(db)
+        self.batch_size = batch_size or settings.REFRESH_BATCH_SIZE
+        self.batch_interval = settings.REFRESH_BATCH_INTERVAL_SECONDS if batch_interval is None else batch_interval
+
+    async def find_stale(self, max_cities: Optional[int] = None):
+        """Retorna (períodos mais recentes, códigos de cidades desatualizadas)."""
+        latest = await self.periods_service.fetch_latest_periods()
+        logger.info(f"📅 Períodos publicados: {latest}")
+        stale = await self.repo.list_stale_city_codes(latest, limit=max_cities or settings.REFRESH_MAX_CITIES)
+        return latest, stale
+
+    async def run(self, max_cities: Optional[int] = None, dry_run: bool = False):
+        """
+        Executa o refresh em lotes limitados.
+        Entre lotes, pausa batch_interval segundos para não martelar o IBGE.
+        """
+        latest, stale = await self.find_stale(max_cities)
+        report = {"latest_periods": latest, "stale": len(stale), "refreshed": [], "changed": [],
+                  "kept_stale": [], "failed": []}
+
+        if dry_run or not stale:
+            report["cities"] = stale
+            return report
+
+        logger.info(f"🔁 Refresh de {len(stale)} cidades em lotes de {self.batch_size}...")
+        for start in range(0, len(stale), self.batch_size):
+            if start > 0:
+                await asyncio.sleep(self.batch_interval)
+
+            for city_code in stale[start:start + self.batch_size]:
+                try:
+                    # Uma vaga de ETL por cidade: imports pedidos por usuários passam na frente
+                    async with etl_limiter.slot(PRIORITY_BACKGROUND, background=True):
+                        result = await self.orchestrator.import_city(city_code)
+                    if result["stale"]:
+                        # IBGE parcialmente fora: valores antigos mantidos, período não avançou
+                        report["kept_stale"].append(city_code)
+                    else:
+                        report["refreshed"].append(city_code)
+                    if result["changes"]["changed"]:
+                        report["changed"].append(city_code)
+                except Exception as e:
+                    # Uma cidade com erro não derruba o lote
+                    await self.db.rollback()
+                    logger.error(f"Erro no refresh de {city_code}: {e}")
+                    report["failed"].append(city_code)
+
+            # Circuito aberto: o resto do lote só manteria valores antigos. Próxima execução retoma.
+            open_circuits = [name for name, b in breaker_states().items() if b["state"] != "closed"]
+            if open_circuits:
+                logger.warning(f"⛔ Refresh interrompido: IBGE indisponível ({', '.join(open_circuits)}).")
+                report["aborted"] = f"IBGE indisponível: {', '.join(open_circuits)}"
+                break
+
+        if report["changed"]:
+            await self.repo.refresh_hexbins()
+
+        logger.info(f"✅ Refresh concluído: {len(report['refreshed'])} ok, {len(report['kept_stale'])} stale, "
+                    f"{len(report['failed'])} falhas.")
+        return report
+
+
+async def run_scheduled_refresh(max_cities: Optional[int] = None):
+    """Ponto de entrada para tarefas em background / cron (sessão própria)."""
+    from app.core.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        return await IbgeRefreshScheduler(session).run(max_cities=max_cities)
+
+
+if __name__ == "__main__":
+    # Uso noturno via cron: python -m app.services.ibge.refresh
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(run_scheduled_refresh()))
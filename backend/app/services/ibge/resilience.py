@@ -0,0 +1,150 @@
+# backend/app/services/ibge/resilience.py
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, Optional
+import httpx
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class UpstreamUnavailable(Exception):
+    """
+    O IBGE não respondeu (timeout, conexão, 5xx/429) ou o circuito do endpoint está aberto.
+    Diferente de "sem dado": quem chama deve manter o valor já gravado, não escrever zero.
+    """
+
+    def __init__(self, endpoint: str, reason: str, retry_after: Optional[float] = None):
+        super().__init__(f"IBGE {endpoint} indisponível: {reason}")
+        self.endpoint = endpoint
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por endpoint do IBGE (closed -> open -> half_open -> closed).
+
+    - closed: chamadas passam; guarda o resultado das últimas `window` chamadas.
+    - open: taxa de erro >= failure_rate (com pelo menos min_calls) => falha na hora,
+      sem abrir conexão, por reset_timeout segundos.
+    - half_open: passado o reset_timeout, UMA chamada de teste passa; sucesso fecha,
+      falha reabre. Teste que some sem resultado (cancelado) é liberado por
+      abandon_call(); como rede de segurança, expira depois de reset_timeout.
+    """
+
+    def __init__(self, name: str, failure_rate: float, min_calls: int, window: int, reset_timeout: float):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._outcomes = deque(maxlen=window)  # True = falha
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+
+    @property
+    def retry_after(self) -> float:
+        if self.state == "closed":
+            return 0.0
+        return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def before_call(self) -> None:
+        """Levanta UpstreamUnavailable se a chamada não deve nem ser tentada."""
+        if self.state == "open" and self.retry_after == 0:
+            self.state = "half_open"
+            self._probe_in_flight = False
+        if self._probe_in_flight and time.monotonic() - self._probe_started >= self.reset_timeout:
+            logger.warning(f"⚠️ Chamada de teste do circuito '{self.name}' sem resultado; liberando.")
+            self._probe_in_flight = False
+        if self.state == "open" or (self.state == "half_open" and self._probe_in_flight):
+            raise UpstreamUnavailable(self.name, "circuito aberto", retry_after=self.retry_after or 1.0)
+        if self.state == "half_open":
+            self._probe_in_flight = True
+            self._probe_started = time.monotonic()
+
+    def abandon_call(self) -> None:
+        """Chamada interrompida sem resultado (Ex: cancelada): libera o teste do half_open."""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        if self.state == "half_open":
+            logger.info(f"🟢 Circuito IBGE '{self.name}' fechado.")
+            self._outcomes.clear()
+        self.state = "closed"
+        self._probe_in_flight = False
+        self._outcomes.append(False)
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self._outcomes.append(True)
+        failures = sum(self._outcomes)
+        tripped = len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate
+        if self.state == "half_open" or (self.state == "closed" and tripped):
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            logger.warning(f"🔴 Circuito IBGE '{self.name}' aberto por {self.reset_timeout}s "
+                           f"({failures}/{len(self._outcomes)} falhas recentes).")
+
+    def snapshot(self) -> Dict:
+        return {
+            "state": self.state,
+            "recent_calls": len(self._outcomes),
+            "recent_failures": sum(self._outcomes),
+            "retry_after": round(self.retry_after, 1),
+        }
+
+
+# Um circuito por API do IBGE (Ex: Malhas fora do ar não bloqueia Agregados)
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    if endpoint not in _breakers:
+        _breakers[endpoint] = CircuitBreaker(
+            endpoint,
+            failure_rate=settings.IBGE_BREAKER_FAILURE_RATE,
+            min_calls=settings.IBGE_BREAKER_MIN_CALLS,
+            window=settings.IBGE_BREAKER_WINDOW,
+            reset_timeout=settings.IBGE_BREAKER_RESET_SECONDS,
+        )
+    return _breakers[endpoint]
+
+def breaker_states() -> Dict[str, Dict]:
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
+
+
+async def ibge_get(endpoint: str, url: str, params: Optional[dict] = None,
+                   timeout: Optional[float] = None) -> httpx.Response:
+    """
+    GET no IBGE protegido pelo circuito do endpoint ("localidades", "agregados", "malhas").
+    Timeouts, erros de conexão e 5xx/429 contam como falha e levantam UpstreamUnavailable.
+    Outras respostas (inclusive 4xx) são devolvidas para o chamador tratar.
+    """
+    breaker = get_breaker(endpoint)
+    breaker.before_call()
+
+    client_timeout = httpx.Timeout(timeout or settings.IBGE_TIMEOUT_SECONDS,
+                                   connect=settings.IBGE_CONNECT_TIMEOUT_SECONDS)
+    try:
+        async with httpx.AsyncClient(timeout=client_timeout) as client:
+            response = await client.get(url, params=params)
+    except httpx.HTTPError as e:
+        breaker.record_failure()
+        raise UpstreamUnavailable(endpoint, type(e).__name__, retry_after=breaker.retry_after or None)
+    except asyncio.CancelledError:
+        # Cliente desconectou / single-flight cancelado: não é falha do IBGE, mas o
+        # teste do half_open precisa ser liberado (senão o circuito fica preso)
+        breaker.abandon_call()
+        raise
+    except BaseException:
+        breaker.record_failure()
+        raise
+
+    if response.status_code >= 500 or response.status_code == 429:
+        breaker.record_failure()
+        raise UpstreamUnavailable(endpoint, f"HTTP {response.status_code}", retry_after=breaker.retry_after or None)
+
+    breaker.record_success()
+    return response
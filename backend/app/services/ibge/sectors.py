@@ -0,0 +1,147 @@
+# backend/app/services/ibge/sectors.py
+import httpx
+import ijson
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from shapely import set_srid, to_wkb
+from shapely.geometry import shape, Polygon, MultiPolygon
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.admission import etl_limiter, PRIORITY_BACKGROUND
+from app.core.config import settings
+from app.repositories.sector_repository import SectorRepository
+
+logger = logging.getLogger(__name__)
+
+class _AsyncByteReader:
+    """Adapta response.aiter_bytes() para a interface read() que o ijson espera."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks
+
+    async def read(self, n: int = -1) -> bytes:
+        if n == 0:
+            return b""  # ijson sonda o tipo com read(0)
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return b""
+
+
+class IbgeSectorService:
+    """
+    Ingestão dos setores censitários 2022 via WFS (GeoServer do IBGE).
+    Pagina com startIndex/count e faz parsing em streaming de cada página:
+    só uma página de setores fica em memória por vez.
+    """
+
+    def __init__(self, db: AsyncSession, wfs_url: Optional[str] = None, page_size: Optional[int] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.repo = SectorRepository(db)
+        self.wfs_url = wfs_url or settings.IBGE_WFS_URL
+        self.page_size = page_size or settings.SECTOR_PAGE_SIZE
+        self.transport = transport  # Ex: httpx.MockTransport servindo páginas de fixture
+
+    async def iter_pages(self, layer: str, start_index: int = 0) -> AsyncIterator[Tuple[int, List[Dict], bool]]:
+        """
+        Gera (próximo startIndex, linhas da página, terminou?) até a camada acabar.
+        Uma página menor que page_size indica o fim.
+        sortBy fixa a ordem: sem ele o GeoServer não garante a mesma ordem entre
+        requisições e o startIndex pode pular ou repetir setores entre páginas.
+        """
+        async with httpx.AsyncClient(timeout=120.0, transport=self.transport) as client:
+            while True:
+                params = {
+                    "service": "WFS",
+                    "version": "2.0.0",
+                    "request": "GetFeature",
+                    "typeNames": layer,
+                    "outputFormat": "application/json",
+                    "srsName": "EPSG:4326",
+                    "sortBy": settings.SECTOR_SORT_BY,
+                    "startIndex": start_index,
+                    "count": self.page_size
+                }
+                logger.info(f"🧱 WFS {layer}: página a partir de {start_index}...")
+
+                rows, received = [], 0
+                async with client.stream("GET", self.wfs_url, params=params) as response:
+                    if response.status_code != 200:
+                        raise ValueError(f"Erro WFS: {response.status_code}")
+
+                    reader = _AsyncByteReader(self._chunks(response))
+                    async for feature in ijson.items(reader, "features.item", use_float=True):
+                        received += 1
+                        row = self._to_row(feature)
+                        if row:
+                            rows.append(row)
+
+                start_index += received
+                finished = received < self.page_size
+                yield start_index, rows, finished
+                if finished:
+                    return
+
+    async def ingest(self, layer: str, restart: bool = False) -> Dict:
+        """
+        Roda (ou retoma) a ingestão da camada. O checkpoint é gravado junto com
+        cada página, então uma queda no meio perde no máximo a página corrente.
+        """
+        job = layer
+        if restart:
+            await self.repo.reset_checkpoint(job)
+
+        checkpoint = await self.repo.get_checkpoint(job)
+        if checkpoint and checkpoint.finished:
+            return {"job": job, "status": "already_finished", "total_written": checkpoint.total_written}
+
+        start_index = checkpoint.next_index if checkpoint else 0
+        if start_index:
+            logger.info(f"⏯️ Retomando {job} a partir de {start_index}...")
+
+        async for next_index, rows, finished in self.iter_pages(layer, start_index):
+            await self.repo.save_page(job, rows, next_index, finished)
+
+        checkpoint = await self.repo.get_checkpoint(job)
+        logger.info(f"✅ Setores ingeridos: {checkpoint.total_written}")
+        return {"job": job, "status": "finished", "total_written": checkpoint.total_written}
+
+    @staticmethod
+    async def _chunks(response: httpx.Response):
+        async for chunk in response.aiter_bytes():
+            if chunk:
+                yield chunk
+
+    @staticmethod
+    def _to_row(feature: Dict) -> Optional[Dict]:
+        """Feature GeoJSON -> linha de census_sectors (geometria como EWKB hex)."""
+        props = feature.get("properties") or {}
+        code = props.get("CD_SETOR") or props.get("cd_setor")
+        if not code or not feature.get("geometry"):
+            return None
+
+        code = str(code)
+        geom = shape(feature["geometry"])
+        if isinstance(geom, Polygon):
+            geom = MultiPolygon([geom])
+        if not isinstance(geom, MultiPolygon):
+            return None
+
+        return {
+            "code": code,
+            "city_code": str(props.get("CD_MUN") or props.get("cd_mun") or code[:7]),
+            "uf_code": str(props.get("CD_UF") or props.get("cd_uf") or code[:2]),
+            "properties": props,
+            # ST_GeomFromEWKT aceita EWKB hex: mais compacto que WKT no fio
+            "geom": to_wkb(set_srid(geom, 4326), hex=True, include_srid=True)
+        }
+
+
+async def run_sector_ingestion(layer: str, restart: bool = False):
+    """
+    Ponto de entrada para tarefas em background (sessão própria).
+    Ocupa uma vaga de ETL durante toda a ingestão (é um único stream do WFS).
+    """
+    from app.core.database import AsyncSessionLocal
+
+    async with etl_limiter.slot(PRIORITY_BACKGROUND, background=True), AsyncSessionLocal() as session:
+        return await IbgeSectorService(session).ingest(layer, restart=restart)
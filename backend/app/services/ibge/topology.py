@@ -1,7 +1,11 @@
 # backend/app/services/ibge/topology.py
 import httpx
 import logging
+from app.core.config import settings
 from typing import Dict, Any, List # Adicionado List
+from app.services.ibge.geometry import IbgeGeometryService
+from app.services.ibge.resilience import ibge_get
+from app.core.singleflight import coalesce
 
 logger = logging.getLogger(__name__)
 
@@ -12,27 +16,28 @@ class IbgeTopologyService:
     2. Diagnóstico: Sonda capacidades da API (probe_hierarchy).
     """
     
-    LOCALIDADES_URL = "https://servicodados.ibge.gov.br/api/v1/localidades"
-    MALHAS_URL = "https://servicodados.ibge.gov.br/api/v3/malhas"
+    LOCALIDADES_URL = f"{settings.IBGE_API_URL}/v1/localidades"
+    MALHAS_URL = f"{settings.IBGE_API_URL}/v3/malhas"
 
     # --- MÉTODO NOVO (USADO PELO ORCHESTRATOR) ---
+    @coalesce("ibge.fetch_districts")
     async def fetch_districts(self, city_code: str) -> List[Dict]:
         """
         Retorna lista limpa de distritos para salvar no Banco de Dados.
         Uso: Orchestrator -> Repository
+        Levanta UpstreamUnavailable se o IBGE estiver fora ([] = município sem distritos).
         """
         url = f"{self.LOCALIDADES_URL}/municipios/{city_code}/distritos"
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            try:
-                response = await client.get(url)
-                if response.status_code == 200:
-                    # Retorna a lista pura: [{'id': '...', 'nome': '...'}]
-                    return response.json()
-                return []
-            except Exception as e:
-                logger.error(f"Erro Topologia (Distritos): {e}")
-                return []
+        response = await ibge_get("localidades", url)
+        try:
+            if response.status_code == 200:
+                # Retorna a lista pura: [{'id': '...', 'nome': '...'}]
+                return response.json()
+            return []
+        except Exception as e:
+            logger.error(f"Erro Topologia (Distritos): {e}")
+            return []
 
     # --- MÉTODO ANTIGO (DIAGNÓSTICO / PROBE) ---
     async def probe_hierarchy(self, city_code: str) -> Dict[str, Any]:
@@ -59,16 +64,11 @@ class IbgeTopologyService:
             districts = resp_dist.json()
             report["districts_count"] = len(districts)
 
-            # 2. Teste de Geometria (Visual)
+            # 2. Teste de Geometria (Visual): malha de todos os distritos num request só
             if districts:
-                first_dist_id = districts[0]["id"]
-                url_geom = f"{self.MALHAS_URL}/distritos/{first_dist_id}"
-                try:
-                    resp_geom = await client.get(url_geom, params={"formato": "application/vnd.geo+json"})
-                    if resp_geom.status_code == 200 and resp_geom.content:
-                        report["has_district_geometry"] = True
-                except Exception:
-                    pass
+                geoms = await IbgeGeometryService().fetch_district_geoms(city_code)
+                report["districts_with_geometry"] = len(geoms)
+                report["has_district_geometry"] = not geoms.empty
 
             report["details"] = districts
             return report
\ No newline at end of file
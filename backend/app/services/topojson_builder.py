@@ -0,0 +1,31 @@
+# backend/app/services/topojson_builder.py
+import logging
+from typing import List
+import geopandas as gpd
+import topojson
+
+logger = logging.getLogger(__name__)
+
+# Grade de quantização (1e5 => ~1 m de precisão em escala estadual)
+DEFAULT_QUANTIZATION = 1e5
+
+
+def build_topojson(features: List[dict], quantization: float = DEFAULT_QUANTIZATION) -> str:
+    """
+    Converte Features GeoJSON em TopoJSON quantizado.
+    Fronteiras compartilhadas entre municípios vizinhos viram UM arco referenciado
+    pelos dois lados, em vez de coordenadas duplicadas.
+    """
+    if not features:
+        return '{"type":"Topology","objects":{"cities":{"type":"GeometryCollection","geometries":[]}},"arcs":[]}'
+
+    gdf = gpd.GeoDataFrame.from_features(features, crs="EPSG:4326")
+    logger.info(f"🧩 Construindo topologia para {len(gdf)} cidades...")
+
+    topo = topojson.Topology(
+        gdf,
+        prequantize=quantization,
+        topology=True,
+        object_name="cities"
+    )
+    return topo.to_json()
@@ -0,0 +1,350 @@
+# app/snapshot.py
+"""
+Snapshot dos dados geográficos para subir um ambiente novo sem falar com o IBGE.
+
+    python -m app.snapshot export snapshot.tar [--sectors]
+    python -m app.snapshot import snapshot.tar [--replace]
+    python -m app.snapshot info snapshot.tar
+
+O arquivo é um tar com manifest.json (versão do formato, revisão do Alembic,
+colunas, linhas e SHA-256 por tabela) e uma tabela por membro em COPY texto
+comprimido com zstd. Geometrias vão como WKB (EWKB hex, saída nativa do PostGIS).
+
+O import roda numa única transação: derruba índices secundários e FKs das tabelas,
+carrega tudo via COPY, recria índices (uma passada de ordenação em vez de
+inserção linha a linha) e FKs (uma validação por tabela), acerta as sequences
+e avisa os workers para limparem o cache. Rode depois do `alembic upgrade head`.
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+import pyarrow as pa
+from app.core.cache import INVALIDATION_CHANNEL
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Ordem de carga respeita as FKs (cities antes de quem aponta para ela)
+CORE_TABLES = [
+    "city_catalog",
+    "cities",
+    "districts",
+    "city_indicator_sources",
+    "city_adjacency",
+    "city_hexbins",
+]
+# Opcionais (--sectors): centenas de milhares de polígonos
+SECTOR_TABLES = ["census_sectors", "ingestion_checkpoints"]
+
+# Caches que dependem das tabelas restauradas
+INVALIDATED_NAMESPACES = ["map", "city", "search"]
+
+READ_CHUNK_BYTES = 1024 * 1024
+
+DEFERRABLE_INDEXES_SQL = """
+    SELECT i.indexrelid::regclass::text AS name, pg_get_indexdef(i.indexrelid) AS definition
+    FROM pg_index i
+    WHERE i.indrelid = $1::regclass
+      AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+"""
+
+# Marcas de CLUSTER ON (tabela ou partição -> índice raiz, ex: ix_cities_geohash): o DROP
+# INDEX as apaga e o pg_get_indexdef não as carrega
+CLUSTERED_INDEXES_SQL = """
+    SELECT i.indrelid::regclass::text AS table_name,
+           pg_partition_root(i.indexrelid)::regclass::text AS root_index
+    FROM pg_partition_tree($1::regclass) t
+    JOIN pg_index i ON i.indrelid = t.relid
+    WHERE i.indisclustered
+"""
+
+# Índice recriado que cobre a tabela/partição (nas partições o nome é gerado)
+LEAF_INDEX_SQL = """
+    SELECT t.relid::regclass::text
+    FROM pg_partition_tree($1::regclass) t
+    JOIN pg_index i ON i.indexrelid = t.relid
+    WHERE i.indrelid = $2::regclass
+"""
+
+FOREIGN_KEYS_SQL = """
+    SELECT conrelid::regclass::text AS table_name, conname, pg_get_constraintdef(oid) AS definition
+    FROM pg_constraint
+    WHERE contype = 'f' AND conrelid::regclass::text = ANY($1::text[])
+"""
+
+
+def _dsn() -> str:
+    # asyncpg não entende o prefixo do SQLAlchemy
+    return settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+
+async def _table_columns(conn, table: str) -> List[str]:
+    rows = await conn.fetch(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = $1 ORDER BY ordinal_position",
+        table
+    )
+    return [r["column_name"] for r in rows]
+
+async def _alembic_revision(conn) -> str:
+    try:
+        return await conn.fetchval("SELECT version_num FROM alembic_version")
+    except Exception:
+        return None
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# --- EXPORT ---
+
+async def export_snapshot(path: str, include_sectors: bool = False) -> Dict:
+    """Gera o snapshot a partir do banco configurado (leitura consistente entre tabelas)."""
+    import asyncpg
+
+    tables = CORE_TABLES + (SECTOR_TABLES if include_sectors else [])
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "compression": "zstd",
+        "copy_format": "text",
+        "tables": [],
+    }
+
+    conn = await asyncpg.connect(_dsn())
+    workdir = tempfile.mkdtemp(prefix="snapshot-")
+    try:
+        manifest["alembic_revision"] = await _alembic_revision(conn)
+        # REPEATABLE READ: todas as tabelas vêm do mesmo instante (sem import pela metade)
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            for table in tables:
+                started = time.monotonic()
+                columns = await _table_columns(conn, table)
+                member = f"{table}.tsv.zst"
+                member_path = os.path.join(workdir, member)
+
+                stream = pa.CompressedOutputStream(member_path, "zstd")
+
+                async def write(chunk: bytes, stream=stream):
+                    stream.write(chunk)
+
+                try:
+                    # COPY (SELECT ...): COPY direto de tabela particionada (census_sectors) não é aceito
+                    column_list = ", ".join(f'"{c}"' for c in columns)
+                    query = f"SELECT {column_list} FROM {table}"
+                    status = await conn.copy_from_query(query, output=write, format="text")
+                finally:
+                    stream.close()
+
+                rows = int(status.split()[-1])
+                manifest["tables"].append({
+                    "name": table,
+                    "member": member,
+                    "columns": columns,
+                    "rows": rows,
+                    "bytes": os.path.getsize(member_path),
+                    "sha256": _sha256(member_path),
+                })
+                logger.info(f"📤 {table}: {rows} linhas ({time.monotonic() - started:.1f}s)")
+
+        manifest_path = os.path.join(workdir, "manifest.json")
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        # manifest primeiro: `info` lê só o começo do arquivo
+        with tarfile.open(path, "w") as tar:
+            tar.add(manifest_path, arcname="manifest.json")
+            for entry in manifest["tables"]:
+                tar.add(os.path.join(workdir, entry["member"]), arcname=entry["member"])
+    finally:
+        await conn.close()
+        for name in os.listdir(workdir):
+            os.unlink(os.path.join(workdir, name))
+        os.rmdir(workdir)
+
+    logger.info(f"✅ Snapshot gravado em {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    return manifest
+
+
+# --- IMPORT ---
+
+def read_manifest(tar: tarfile.TarFile) -> Dict:
+    manifest = json.load(tar.extractfile("manifest.json"))
+    version = manifest.get("format_version")
+    if version != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Formato de snapshot {version} não suportado (esperado {SNAPSHOT_FORMAT_VERSION}).")
+    return manifest
+
+class _HashingReader(io.RawIOBase):
+    """Lê o membro comprimido calculando o SHA-256 (conferido antes do commit)."""
+
+    def __init__(self, raw, digest):
+        self._raw = raw
+        self._digest = digest
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._raw.read(len(buffer))
+        self._digest.update(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+async def _member_chunks(tar: tarfile.TarFile, entry: Dict, digest):
+    """Descomprime o membro em pedaços (alimenta o COPY sem carregar a tabela em memória)."""
+    raw = _HashingReader(tar.extractfile(entry["member"]), digest)
+    stream = pa.CompressedInputStream(pa.PythonFile(raw, mode="r"), "zstd")
+    while chunk := stream.read(READ_CHUNK_BYTES):
+        yield chunk
+    # Garante que o hash cobre o membro inteiro
+    while raw.read(READ_CHUNK_BYTES):
+        pass
+
+async def import_snapshot(path: str, replace: bool = False) -> Dict:
+    """
+    Restaura o snapshot no banco configurado. Recusa tabelas com dados, a não ser
+    com replace=True (TRUNCATE antes). Tudo ou nada: qualquer erro desfaz a carga.
+    """
+    import asyncpg
+
+    report = {"tables": {}}
+    with tarfile.open(path, "r") as tar:
+        manifest = read_manifest(tar)
+        entries = manifest["tables"]
+        tables = [e["name"] for e in entries]
+
+        conn = await asyncpg.connect(_dsn())
+        try:
+            revision = await _alembic_revision(conn)
+            if revision != manifest.get("alembic_revision"):
+                logger.warning(f"⚠️ Snapshot da revisão {manifest.get('alembic_revision')}, banco em {revision}: "
+                               f"seguindo porque as colunas são compatíveis.")
+
+            for entry in entries:
+                target = await _table_columns(conn, entry["name"])
+                missing = [c for c in entry["columns"] if c not in target]
+                if not target or missing:
+                    raise ValueError(f"Tabela {entry['name']} incompatível (faltam {missing or 'todas'}). "
+                                     f"Rode `alembic upgrade head` antes do import.")
+
+            started = time.monotonic()
+            async with conn.transaction():
+                non_empty = [t for t in tables if await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM {t})")]
+                if non_empty and not replace:
+                    raise ValueError(f"Tabelas com dados: {', '.join(non_empty)}. Use --replace para sobrescrever.")
+                if non_empty:
+                    await conn.execute(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE")
+
+                await conn.execute("SET LOCAL maintenance_work_mem = '512MB'")
+
+                # Adia FKs e índices secundários: recriados uma vez, depois da carga
+                foreign_keys = await conn.fetch(FOREIGN_KEYS_SQL, tables)
+                for fk in foreign_keys:
+                    await conn.execute(f'ALTER TABLE {fk["table_name"]} DROP CONSTRAINT "{fk["conname"]}"')
+                indexes, clustered = [], []
+                for table in tables:
+                    clustered += await conn.fetch(CLUSTERED_INDEXES_SQL, table)
+                    for index in await conn.fetch(DEFERRABLE_INDEXES_SQL, table):
+                        indexes.append(index)
+                        await conn.execute(f"DROP INDEX {index['name']}")
+
+                for entry in entries:
+                    table_started = time.monotonic()
+                    digest = hashlib.sha256()
+                    status = await conn.copy_to_table(
+                        entry["name"],
+                        source=_member_chunks(tar, entry, digest),
+                        columns=entry["columns"],
+                        format="text"
+                    )
+                    if digest.hexdigest() != entry["sha256"]:
+                        raise ValueError(f"Checksum de {entry['name']} não confere (arquivo corrompido).")
+                    rows = int(status.split()[-1])
+                    report["tables"][entry["name"]] = rows
+                    logger.info(f"📥 {entry['name']}: {rows} linhas ({time.monotonic() - table_started:.1f}s)")
+
+                index_started = time.monotonic()
+                for index in indexes:
+                    # Índice de tabela particionada vem como "ON ONLY" (não criaria nas partições)
+                    await conn.execute(index["definition"].replace(" ON ONLY ", " ON ", 1))
+                dropped = {index["name"] for index in indexes}
+                for mark in clustered:
+                    if mark["root_index"] not in dropped:
+                        continue
+                    leaf_index = await conn.fetchval(LEAF_INDEX_SQL, mark["root_index"], mark["table_name"])
+                    await conn.execute(f"ALTER TABLE {mark['table_name']} CLUSTER ON {leaf_index}")
+                for fk in foreign_keys:
+                    await conn.execute(
+                        f'ALTER TABLE {fk["table_name"]} ADD CONSTRAINT "{fk["conname"]}" {fk["definition"]}'
+                    )
+                logger.info(f"🗂️ {len(indexes)} índices e {len(foreign_keys)} FKs recriados "
+                            f"({time.monotonic() - index_started:.1f}s)")
+
+                # Ids vieram do snapshot: a próxima inserção não pode colidir
+                for table in tables:
+                    if "id" in await _table_columns(conn, table):
+                        await conn.execute(
+                            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                            f"COALESCE(MAX(id), 0) + 1, false) FROM {table}"
+                        )
+
+                # Entregue no commit: workers no ar descartam /map, /cities e search antigos
+                for namespace in INVALIDATED_NAMESPACES:
+                    await conn.execute("SELECT pg_notify($1, $2)", INVALIDATION_CHANNEL,
+                                       json.dumps({"namespace": namespace, "key": None}))
+
+            # Estatísticas do planner (fora da transação: tabelas acabaram de mudar inteiras)
+            for table in tables:
+                await conn.execute(f"ANALYZE {table}")
+        finally:
+            await conn.close()
+
+    report["seconds"] = round(time.monotonic() - started, 1)
+    logger.info(f"✅ Snapshot restaurado em {report['seconds']}s.")
+    return report
+
+
+def snapshot_info(path: str) -> Dict:
+    with tarfile.open(path, "r") as tar:
+        return read_manifest(tar)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m app.snapshot", description="Snapshot dos dados geográficos")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="Gera o snapshot a partir do banco")
+    export_cmd.add_argument("path")
+    export_cmd.add_argument("--sectors", action="store_true", help="Inclui os setores censitários")
+
+    import_cmd = commands.add_parser("import", help="Restaura o snapshot no banco (após alembic upgrade head)")
+    import_cmd.add_argument("path")
+    import_cmd.add_argument("--replace", action="store_true", help="Apaga os dados atuais dessas tabelas")
+
+    info_cmd = commands.add_parser("info", help="Mostra o manifest do snapshot")
+    info_cmd.add_argument("path")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "export":
+        asyncio.run(export_snapshot(args.path, include_sectors=args.sectors))
+    elif args.command == "import":
+        print(json.dumps(asyncio.run(import_snapshot(args.path, replace=args.replace)), indent=2))
+    else:
+        print(json.dumps(snapshot_info(args.path), indent=2))
@@ -0,0 +1,65 @@
+# backend/benchmarks/bench_agregados_parser.py
+"""
+Benchmark do parser do Agregados v3 com payload sintético de escala nacional.
+Uso (a partir de backend/): python -m benchmarks.bench_agregados_parser
+"""
+import argparse
+import random
+import time
+from app.services.ibge.parser import parse_agregados, latest_valid, wide_by_period
+
+SENTINELS = ["-", "...", "X", ".."]
+
+
+def make_payload(localities: int, variables: int, periods: int, sentinel_ratio: float = 0.05, seed: int = 42):
+    """Gera payload no formato do Agregados v3: variáveis × localidades × períodos."""
+    rng = random.Random(seed)
+    years = [str(2025 - i) for i in range(periods)]
+    payload = []
+    for v in range(variables):
+        series = []
+        for loc in range(localities):
+            serie = {}
+            for year in years:
+                if rng.random() < sentinel_ratio:
+                    serie[year] = rng.choice(SENTINELS)
+                else:
+                    serie[year] = str(rng.randint(0, 5_000_000))
+            series.append({
+                "localidade": {"id": str(1100015 + loc), "nivel": {"id": "N6"}, "nome": f"Cidade {loc}"},
+                "serie": serie
+            })
+        payload.append({
+            "id": str(153 + v),
+            "variavel": f"Variável {v}",
+            "resultados": [{"classificacoes": [{"id": "12762", "categoria": {"0": "Total"}}], "series": series}]
+        })
+    return payload
+
+
+def run(localities: int, variables: int, periods: int, repeat: int):
+    payload = make_payload(localities, variables, periods)
+    cells = localities * variables * periods
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frame = parse_agregados(payload)
+        latest_valid(frame, "153")
+        wide_by_period(frame)
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    print(f"Payload: {localities} localidades × {variables} variáveis × {periods} períodos = {cells:,} células")
+    print(f"Melhor de {repeat}: {best * 1000:.1f} ms ({cells / best:,.0f} células/s)")
+    return {"cells": cells, "best_seconds": best, "timings": timings}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--localities", type=int, default=5570)
+    parser.add_argument("--variables", type=int, default=2)
+    parser.add_argument("--periods", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.localities, args.variables, args.periods, args.repeat)
@@ -0,0 +1,146 @@
+# backend/benchmarks/bench_viewport_buffers.py
+"""
+Buffers lidos por consulta de viewport (bbox &&) nas tabelas de geometria, direto no
+banco via EXPLAIN (ANALYZE, BUFFERS). Mede o efeito da ordem física: rode antes e
+depois do `python -m app.maintenance cluster` e compare.
+
+Os centros dos viewports são sorteados por md5(code): o mesmo conjunto em qualquer
+ordem física da tabela, então duas execuções são comparáveis.
+
+Uso (a partir de backend/, com DATABASE_URL):
+    python -m benchmarks.bench_viewport_buffers --output results/antes.json
+    python -m app.maintenance cluster
+    python -m benchmarks.bench_viewport_buffers --output results/depois.json
+    python -m benchmarks.bench_viewport_buffers compare results/antes.json results/depois.json
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+import asyncpg
+import numpy as np
+
+from app.core.config import settings
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+TABLES = ["cities", "districts", "census_sectors"]
+
+# Zoom -> lado do viewport em graus (estado, região metropolitana, bairro)
+ZOOMS = {"z6": 4.0, "z9": 0.5, "z12": 0.06}
+
+CENTERS_SQL = """
+    SELECT ST_X(p) AS x, ST_Y(p) AS y
+    FROM (SELECT ST_PointOnSurface(geom) AS p, code FROM {table} WHERE geom IS NOT NULL) s
+    ORDER BY md5(code || $1::text)
+    LIMIT $2
+"""
+
+# geom no SELECT: a consulta do mapa lê o heap (e o TOAST), não só o índice
+VIEWPORT_SQL = """
+    EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)
+    SELECT id, geom FROM {table} WHERE geom && ST_MakeEnvelope($1, $2, $3, $4, 4326)
+"""
+
+
+def _dsn() -> str:
+    return settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+
+
+async def run_table(conn, table: str, queries: int, seed: int) -> Dict:
+    centers = await conn.fetch(CENTERS_SQL.format(table=table), str(seed), queries)
+    if not centers:
+        print(f"  {table:<15} vazia, pulando")
+        return {}
+
+    result = {"bytes": await conn.fetchval("SELECT pg_total_relation_size($1::regclass)", table)}
+    for zoom, size in ZOOMS.items():
+        blocks, rows, millis = [], [], []
+        for c in centers:
+            half = size / 2
+            plan = json.loads(await conn.fetchval(
+                VIEWPORT_SQL.format(table=table), c["x"] - half, c["y"] - half, c["x"] + half, c["y"] + half
+            ))[0]
+            # O nó raiz acumula os buffers dos filhos (índice, heap e, em particionada, Append)
+            root = plan["Plan"]
+            blocks.append(root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0))
+            rows.append(root["Actual Rows"])
+            millis.append(plan["Execution Time"])
+
+        rows_total = sum(rows)
+        result[zoom] = {
+            "queries": len(centers),
+            "mean_blocks": round(float(np.mean(blocks)), 1),
+            "p99_blocks": round(float(np.percentile(blocks, 99)), 1),
+            "mean_rows": round(float(np.mean(rows)), 1),
+            "blocks_per_row": round(sum(blocks) / rows_total, 3) if rows_total else None,
+            "mean_ms": round(float(np.mean(millis)), 2),
+        }
+        print(f"  {table:<15} {zoom:<4} {result[zoom]['mean_blocks']:>10} blocos/consulta  "
+              f"{result[zoom]['blocks_per_row']!s:>8} blocos/linha  {result[zoom]['mean_ms']:>8} ms")
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+async def main(args) -> Path:
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "queries": args.queries,
+        "seed": args.seed,
+        "tables": {},
+    }
+    conn = await asyncpg.connect(_dsn())
+    try:
+        print(f"🗺️ Buffers por viewport @ {report['commit']}")
+        for table in args.tables:
+            report["tables"][table] = await run_table(conn, table, args.queries, args.seed)
+    finally:
+        await conn.close()
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    out = Path(args.output) if args.output else RESULTS_DIR / f"viewport-{report['commit']}-{int(time.time())}.json"
+    out.write_text(json.dumps(report, indent=2))
+    print(f"💾 Resultados em {out}")
+    return out
+
+
+def compare(base_path: str, head_path: str):
+    """Compara blocos por consulta entre dois arquivos (Ex: antes e depois do CLUSTER)."""
+    base = json.loads(Path(base_path).read_text())
+    head = json.loads(Path(head_path).read_text())
+    print(f"{'tabela':<15} {'zoom':<5} {'métrica':<14} {'base':>10} {'head':>10} {'Δ%':>8}")
+    for table in TABLES:
+        a_table, b_table = base["tables"].get(table) or {}, head["tables"].get(table) or {}
+        for zoom in ZOOMS:
+            if zoom not in a_table or zoom not in b_table:
+                continue
+            for metric in ("mean_blocks", "blocks_per_row", "mean_ms"):
+                a, b = a_table[zoom][metric], b_table[zoom][metric]
+                delta = (b - a) / a * 100 if a and b is not None else float("nan")
+                print(f"{table:<15} {zoom:<5} {metric:<14} {a!s:>10} {b!s:>10} {delta:>+7.1f}%")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        compare(*sys.argv[2:4])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", nargs="+", choices=TABLES, default=TABLES)
+    parser.add_argument("--queries", type=int, default=200, help="Viewports por tabela e zoom")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,187 @@
+# backend/benchmarks/mock_ibge.py
+"""
+Mock local das APIs do IBGE usadas em services/ibge (Localidades v1, Agregados v3,
+Malhas v3 e o GeoServer WFS), servido a partir do dataset sintético.
+
+Uso (a partir de backend/):
+    MOCK_IBGE_LATENCY_MS=80 MOCK_IBGE_ERROR_RATE=0.02 uvicorn benchmarks.mock_ibge:app --port 9000
+    IBGE_API_URL=http://localhost:9000/api IBGE_WFS_URL=http://localhost:9000/geoserver/ows uvicorn app.main:app
+
+Latência e taxa de erro também podem ser trocadas em tempo de execução via POST /_config.
+"""
+import asyncio
+import os
+import random
+from typing import Optional
+
+import shapely
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+from shapely.geometry import box, mapping
+
+from benchmarks.synthetic import cities_by_code, generate_cities
+
+CONFIG = {
+    "latency_ms": float(os.getenv("MOCK_IBGE_LATENCY_MS", "50")),
+    "jitter_ms": float(os.getenv("MOCK_IBGE_JITTER_MS", "20")),
+    "error_rate": float(os.getenv("MOCK_IBGE_ERROR_RATE", "0")),
+    "cities": int(os.getenv("MOCK_IBGE_CITIES", "5570")),
+    "sectors": int(os.getenv("MOCK_IBGE_SECTORS", "20000")),
+}
+
+# Períodos publicados por tabela (o refresh agendado compara com isso)
+PERIODS = {
+    "4714": ["2022"],
+    "5938": [str(y) for y in range(2010, 2022)],
+    "1685": [str(y) for y in range(2006, 2023)],
+}
+
+app = FastAPI(title="Mock IBGE")
+
+
+@app.middleware("http")
+async def latency_and_errors(request: Request, call_next):
+    """Simula a rede do IBGE: atraso com jitter e falhas 503 aleatórias."""
+    if request.url.path.startswith("/_config"):
+        return await call_next(request)
+    delay = CONFIG["latency_ms"] + random.uniform(-CONFIG["jitter_ms"], CONFIG["jitter_ms"])
+    await asyncio.sleep(max(delay, 0) / 1000)
+    if random.random() < CONFIG["error_rate"]:
+        return JSONResponse({"erro": "Serviço indisponível (mock)"}, status_code=503)
+    return await call_next(request)
+
+
+@app.get("/_config")
+async def get_config():
+    return CONFIG
+
+
+@app.post("/_config")
+async def set_config(latency_ms: Optional[float] = None, jitter_ms: Optional[float] = None,
+                     error_rate: Optional[float] = None):
+    for key, value in (("latency_ms", latency_ms), ("jitter_ms", jitter_ms), ("error_rate", error_rate)):
+        if value is not None:
+            CONFIG[key] = value
+    return CONFIG
+
+
+def _city(code: str):
+    city = cities_by_code(CONFIG["cities"]).get(code)
+    if city is None:
+        raise HTTPException(status_code=404, detail="Município não encontrado")
+    return city
+
+
+def _localidade_payload(city):
+    return {
+        "id": int(city.code),
+        "nome": city.name,
+        "microrregiao": {"mesorregiao": {"UF": {"sigla": city.uf}}},
+    }
+
+
+# --- LOCALIDADES v1 ---
+
+@app.get("/api/v1/localidades/municipios")
+async def municipios():
+    return [_localidade_payload(c) for c in generate_cities(CONFIG["cities"])]
+
+
+@app.get("/api/v1/localidades/municipios/{code}")
+async def municipio(code: str):
+    return _localidade_payload(_city(code))
+
+
+@app.get("/api/v1/localidades/municipios/{code}/distritos")
+async def distritos(code: str):
+    return _city(code).districts
+
+
+# --- AGREGADOS v3 ---
+
+@app.get("/api/v3/agregados/{table}/periodos")
+async def periodos(table: str):
+    return [{"id": p, "literals": [p], "modificacao": "01/01/2024"} for p in PERIODS.get(table, [])]
+
+
+@app.get("/api/v3/agregados/{table}/periodos/{periods}/variaveis/{variables}")
+async def agregados(table: str, periods: str, variables: str, localidades: str):
+    # localidades=N6[3504107] ou N6[3504107,3550308]
+    codes = localidades[localidades.index("[") + 1:localidades.rindex("]")].split(",")
+    published = PERIODS.get(table, [])
+    if periods.startswith("-"):
+        asked = published[-int(periods[1:]):]  # "-6" = últimos 6 publicados
+    else:
+        asked = [p for p in periods.split("|") if p in published]
+    latest = max((int(p) for p in asked), default=0)
+
+    payload = []
+    for var in variables.split("|"):
+        series = []
+        for code in codes:
+            city = cities_by_code(CONFIG["cities"]).get(code)
+            if city is None:
+                continue
+            base = {
+                "93": city.population, "37": city.pib_total,
+                "153": city.total_companies, "154": city.total_workers,
+            }.get(var, 0)
+            series.append({
+                "localidade": {"id": city.code, "nivel": {"id": "N6"}, "nome": f"{city.name} - {city.uf}"},
+                # Séries levemente crescentes até o último período publicado
+                "serie": {p: str(round(base * (1 - 0.02 * (latest - int(p))), 2)) for p in asked},
+            })
+        payload.append({"id": var, "resultados": [{"classificacoes": [], "series": series}]})
+    return payload
+
+
+# --- MALHAS v3 ---
+
+@app.get("/api/v3/malhas/municipios/{code}")
+async def malha(code: str, intrarregiao: Optional[str] = None):
+    city = _city(code)
+    if intrarregiao != "distrito":
+        return {"type": "FeatureCollection", "features": [
+            {"type": "Feature", "properties": {"codarea": city.code}, "geometry": mapping(city.geom)}
+        ]}
+
+    # Distritos: faixas verticais do polígono do município
+    min_x, min_y, max_x, max_y = city.geom.bounds
+    step = (max_x - min_x) / max(len(city.districts), 1)
+    features = []
+    for i, district in enumerate(city.districts):
+        strip = box(min_x + i * step, min_y, min_x + (i + 1) * step, max_y)
+        part = city.geom.intersection(strip)
+        if not part.is_empty:
+            features.append({"type": "Feature", "properties": {"codarea": district["id"]}, "geometry": mapping(part)})
+    return {"type": "FeatureCollection", "features": features}
+
+
+# --- GEOSERVER WFS (setores censitários) ---
+
+@app.get("/geoserver/ows")
+async def wfs(request: Request):
+    params = {k.lower(): v for k, v in request.query_params.items()}
+    if params.get("request", "").lower() != "getfeature":
+        raise HTTPException(status_code=400, detail="Mock só implementa GetFeature")
+
+    start = int(params.get("startindex", 0))
+    count = int(params.get("count", 1000))
+    cities = generate_cities(CONFIG["cities"])
+
+    features = []
+    for i in range(start, min(start + count, CONFIG["sectors"])):
+        city = cities[i % len(cities)]
+        x, y = shapely.get_coordinates(city.geom.representative_point())[0]
+        offset = (i // len(cities)) * 0.002
+        features.append({
+            "type": "Feature",
+            "properties": {"CD_SETOR": f"{city.code}{i:08d}", "CD_MUN": city.code, "CD_UF": city.code[:2]},
+            "geometry": mapping(box(x + offset, y, x + offset + 0.002, y + 0.002)),
+        })
+    return {
+        "type": "FeatureCollection",
+        "numberMatched": CONFIG["sectors"],
+        "numberReturned": len(features),
+        "features": features,
+    }
@@ -0,0 +1,182 @@
+# backend/benchmarks/run.py
+"""
+Benchmarks de carga contra uma API em execução (idealmente com o dataset sintético
+carregado e IBGE_API_URL apontando para benchmarks/mock_ibge.py).
+
+Mede vazão (req/s), p50, p99 e erros por cenário e grava JSON em
+benchmarks/results/<commit>-<timestamp>.json para comparar entre commits.
+
+Suba a API SEM o limite de taxa por cliente (todo o tráfego sai de um IP só e mediria
+apenas o limitador): RATE_LIMIT_ENABLED=false uvicorn app.main:app. Respostas 429 são
+contadas à parte (rate_limited) e fazem a execução terminar com erro.
+
+Uso (a partir de backend/):
+    python -m benchmarks.run --base-url http://localhost:8000 --username admin --password admin
+    python -m benchmarks.run --scenarios map search --requests 500 --concurrency 32
+    python -m benchmarks.run compare results/a.json results/b.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from benchmarks.synthetic import generate_cities
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Cenário -> (método, gerador de path, exige login?)
+SCENARIOS: Dict[str, Tuple[str, Callable[[random.Random, List[str]], str], bool]] = {
+    "map": ("GET", lambda rng, codes: "/map", False),
+    # Autocomplete: prefixos como os digitados no frontend (cada um casa até 10 nomes)
+    "search": ("GET", lambda rng, codes: f"/cities/search?q=Sint%C3%A9tico%20{rng.randint(0, 556):03d}", False),
+    "import": ("POST", lambda rng, codes: f"/cities/import/{rng.choice(codes)}", True),
+    "sync-catalog": ("POST", lambda rng, codes: "/admin/sync-catalog", True),
+}
+
+# Quantidade padrão de requisições por cenário (ETL é muito mais caro que leitura)
+DEFAULT_REQUESTS = {"map": 200, "search": 2000, "import": 100, "sync-catalog": 10}
+
+
+async def _login(client: httpx.AsyncClient, username: str, password: str) -> Dict[str, str]:
+    resp = await client.post("/token", data={"username": username, "password": password})
+    resp.raise_for_status()
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, requests: int, concurrency: int,
+                       headers: Optional[Dict[str, str]], codes: List[str], seed: int = 42) -> Dict:
+    method, make_path, _ = SCENARIOS[name]
+    rng = random.Random(seed)
+    paths = [make_path(rng, codes) for _ in range(requests)]
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    rate_limited = 0
+    response_bytes = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+
+    async def worker():
+        nonlocal response_bytes, rate_limited
+        while True:
+            try:
+                path = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                resp = await client.request(method, path, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                response_bytes += len(resp.content)
+                if resp.status_code == 429:
+                    rate_limited += 1
+                elif resp.status_code >= 400:
+                    errors[str(resp.status_code)] = errors.get(str(resp.status_code), 0) + 1
+            except httpx.HTTPError as e:
+                latencies.append(time.perf_counter() - start)
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall_start
+
+    lat_ms = np.array(latencies) * 1000
+    result = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(requests / wall, 2) if wall else None,
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(lat_ms, 99)), 2),
+        "mean_ms": round(float(lat_ms.mean()), 2),
+        "max_ms": round(float(lat_ms.max()), 2),
+        "avg_response_bytes": int(response_bytes / requests) if requests else 0,
+        "errors": errors,
+        "rate_limited": rate_limited,
+    }
+    print(f"  {name:<14} {result['throughput_rps']:>9} req/s  p50 {result['p50_ms']:>9} ms  "
+          f"p99 {result['p99_ms']:>9} ms  erros {sum(errors.values())}  429 {rate_limited}")
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+async def main(args) -> Path:
+    codes = [c.code for c in generate_cities(args.cities)]
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "base_url": args.base_url,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "scenarios": {},
+    }
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        headers = None
+        if any(SCENARIOS[s][2] for s in args.scenarios):
+            headers = await _login(client, args.username, args.password)
+
+        print(f"📈 Benchmarks @ {report['commit']} ({args.base_url})")
+        for name in args.scenarios:
+            requests = args.requests or DEFAULT_REQUESTS[name]
+            report["scenarios"][name] = await run_scenario(
+                client, name, requests, args.concurrency, headers if SCENARIOS[name][2] else None, codes
+            )
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    out = Path(args.output) if args.output else RESULTS_DIR / f"{report['commit']}-{int(time.time())}.json"
+    out.write_text(json.dumps(report, indent=2))
+    print(f"💾 Resultados em {out}")
+
+    limited = {name: r["rate_limited"] for name, r in report["scenarios"].items() if r["rate_limited"]}
+    if limited:
+        # Números medidos contra o limitador não medem a API: não servem para comparar
+        sys.exit(f"❌ {sum(limited.values())} respostas 429 ({limited}); suba a API com RATE_LIMIT_ENABLED=false.")
+    return out
+
+
+def compare(base_path: str, head_path: str):
+    """Compara dois arquivos de resultado (Ex: main vs. branch) cenário a cenário."""
+    base = json.loads(Path(base_path).read_text())
+    head = json.loads(Path(head_path).read_text())
+    print(f"{'cenário':<14} {'métrica':<15} {base['commit']:>12} {head['commit']:>12} {'Δ%':>8}")
+    for name in sorted(set(base["scenarios"]) & set(head["scenarios"])):
+        for metric in ("throughput_rps", "p50_ms", "p99_ms"):
+            a, b = base["scenarios"][name][metric], head["scenarios"][name][metric]
+            delta = (b - a) / a * 100 if a else float("nan")
+            print(f"{name:<14} {metric:<15} {a:>12} {b:>12} {delta:>+7.1f}%")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        compare(*sys.argv[2:4])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=["map", "search", "import", "sync-catalog"])
+    parser.add_argument("--requests", type=int, default=None, help="Sobrescreve o padrão por cenário")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--cities", type=int, default=5570, help="Tamanho do dataset sintético (códigos de import)")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--output", default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,145 @@
+# backend/benchmarks/synthetic.py
+"""
+Dataset sintético de municípios (padrão: 5.570, como o Brasil).
+Polígonos vêm de uma tesselação de Voronoi: vizinhos compartilham fronteiras
+exatas (como na malha do IBGE), e cada aresta é densificada para chegar a
+algumas centenas de vértices por município.
+
+Uso (a partir de backend/):
+    python -m benchmarks.synthetic seed --cities 5570   # grava direto no PostGIS
+"""
+import argparse
+import asyncio
+import random
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List
+
+import numpy as np
+import shapely
+from shapely.geometry import MultiPolygon, box
+
+# Bounding box aproximado do Brasil (lon/lat)
+BRAZIL_BBOX = (-73.9, -33.7, -34.8, 5.2)
+
+# Código IBGE da UF -> sigla
+UFS = {
+    "11": "RO", "12": "AC", "13": "AM", "14": "RR", "15": "PA", "16": "AP", "17": "TO",
+    "21": "MA", "22": "PI", "23": "CE", "24": "RN", "25": "PB", "26": "PE", "27": "AL",
+    "28": "SE", "29": "BA", "31": "MG", "32": "ES", "33": "RJ", "35": "SP", "41": "PR",
+    "42": "SC", "43": "RS", "50": "MS", "51": "MT", "52": "GO", "53": "DF",
+}
+
+
+@dataclass
+class SyntheticCity:
+    code: str
+    name: str
+    uf: str
+    geom: MultiPolygon
+    population: int
+    pib_total: float
+    total_companies: int
+    total_workers: int
+    districts: List[Dict] = field(default_factory=list)
+
+
+@lru_cache(maxsize=4)
+def generate_cities(n: int = 5570, vertex_spacing: float = 0.01, seed: int = 42) -> List[SyntheticCity]:
+    """
+    Gera n municípios determinísticos (mesmo seed => mesmo dataset).
+    vertex_spacing (graus) controla a complexidade: 0.01 => ~100-400 vértices por polígono.
+    """
+    rng = np.random.default_rng(seed)
+    min_x, min_y, max_x, max_y = BRAZIL_BBOX
+    points = shapely.points(np.column_stack([
+        rng.uniform(min_x, max_x, n),
+        rng.uniform(min_y, max_y, n),
+    ]))
+    extent = box(*BRAZIL_BBOX)
+
+    cells = shapely.get_parts(shapely.voronoi_polygons(shapely.multipoints(points), extend_to=extent))
+    cells = shapely.intersection(cells, extent)
+    # Voronoi não preserva a ordem dos pontos: reordena pela célula que contém cada ponto
+    tree = shapely.STRtree(cells)
+    order = tree.query(points, predicate="within")[1]
+    cells = shapely.segmentize(cells[order], vertex_spacing)
+
+    # UFs contíguas: grade 9 x 3 sobre o bbox (recortes por UF parecem "estados" de verdade)
+    uf_codes = sorted(UFS)
+    coords = shapely.get_coordinates(points)
+    cols = np.minimum(((coords[:, 0] - min_x) / (max_x - min_x) * 9).astype(int), 8)
+    rows = np.minimum(((coords[:, 1] - min_y) / (max_y - min_y) * 3).astype(int), 2)
+
+    py_rng = random.Random(seed)
+    cities = []
+    for i, cell in enumerate(cells):
+        uf_code = uf_codes[rows[i] * 9 + cols[i]]
+        code = f"{uf_code}{i:05d}"
+        population = int(rng.lognormal(9.5, 1.2))
+        cities.append(SyntheticCity(
+            code=code,
+            name=f"Município Sintético {i:04d}",
+            uf=UFS[uf_code],
+            geom=cell if isinstance(cell, MultiPolygon) else MultiPolygon([cell]),
+            population=population,
+            pib_total=round(population * py_rng.uniform(15, 60), 2),
+            total_companies=max(1, population // py_rng.randint(15, 40)),
+            total_workers=max(1, population // py_rng.randint(3, 8)),
+            districts=[
+                {"id": f"{code}{d:02d}", "nome": f"Distrito {d} de {i:04d}"}
+                for d in range(5, 5 + py_rng.randint(1, 4) * 5, 5)
+            ],
+        ))
+    return cities
+
+
+def cities_by_code(n: int = 5570) -> Dict[str, SyntheticCity]:
+    return {c.code: c for c in generate_cities(n)}
+
+
+async def seed_database(n: int):
+    """Carga em massa direto nas tabelas (sem passar pelo ETL), para benchmarks de leitura."""
+    from sqlalchemy import delete
+    from sqlalchemy.dialects.postgresql import insert
+    from app.core.database import AsyncSessionLocal
+    from app.models.city import City, CityCatalog
+    from app.repositories.city_repository import CityRepository, to_multipolygon_ewkb
+
+    cities = generate_cities(n)
+    async with AsyncSessionLocal() as session:
+        await session.execute(delete(CityCatalog))
+        await session.execute(insert(CityCatalog), [
+            {"code": c.code, "name": c.name, "uf": c.uf} for c in cities
+        ])
+        for start in range(0, len(cities), 500):
+            chunk = cities[start:start + 500]
+            stmt = insert(City).on_conflict_do_nothing(index_elements=["code"])
+            await session.execute(stmt, [
+                {
+                    "code": c.code, "name": c.name, "uf": c.uf,
+                    "geom": to_multipolygon_ewkb(c.geom),
+                    "population": c.population, "pib_total": c.pib_total,
+                    "pib_per_capita": c.pib_total * 1000 / c.population,
+                    "pib_year": 2021, "total_companies": c.total_companies,
+                    "total_workers": c.total_workers, "companies_year": 2022,
+                }
+                for c in chunk
+            ])
+        await session.commit()
+        await CityRepository(session).refresh_hexbins()
+    print(f"✅ {len(cities)} cidades sintéticas gravadas.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["seed", "stats"])
+    parser.add_argument("--cities", type=int, default=5570)
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        asyncio.run(seed_database(args.cities))
+    else:
+        sample = generate_cities(args.cities)
+        vertices = [shapely.get_num_coordinates(c.geom) for c in sample]
+        print(f"{len(sample)} cidades | vértices/polígono: média {np.mean(vertices):.0f}, p99 {np.percentile(vertices, 99):.0f}")
@@ -0,0 +1,43 @@
+# backend/gunicorn.conf.py
+"""
+Modo produção: vários workers uvicorn sob o gunicorn.
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Cada worker tem seus próprios caches em memória; a coerência entre eles vem do
+LISTEN/NOTIFY (app/core/cache.py). Variáveis de ambiente:
+    WEB_CONCURRENCY          número de workers (padrão: núcleos da máquina)
+    GUNICORN_PRELOAD         1 = importa o app no master antes do fork (padrão: 1)
+    ETL_DRAIN_TIMEOUT_SECONDS  quanto o desligamento espera por ETLs em andamento
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Preload: geopandas/pyarrow/shapely são importados uma vez e compartilhados (copy-on-write).
+# Seguro aqui porque nada abre conexão no import: engine e caches só conectam sob demanda,
+# e o listener de invalidação sobe no lifespan de cada worker.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# SIGTERM: o worker para de aceitar conexões, termina as requisições em andamento
+# (inclusive BackgroundTasks de ETL) e espera os ETLs no lifespan. Só depois disso
+# o gunicorn mata à força.
+graceful_timeout = int(float(os.getenv("ETL_DRAIN_TIMEOUT_SECONDS", "120"))) + 30
+timeout = 120
+keepalive = 5
+
+# Recicla workers periodicamente (fragmentação de memória após topologias/exports grandes)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = 500
+
+accesslog = "-"
+
+
+def post_fork(server, worker):
+    """Descarta conexões herdadas do master (preload) sem fechá-las no processo pai."""
+    from app.core.database import engine, replica_engine
+    engine.sync_engine.dispose(close=False)
+    if replica_engine is not None:
+        replica_engine.sync_engine.dispose(close=False)
@@ -0,0 +1,6 @@
+#!/bin/bash
+# Executado pelo entrypoint do Postgres na criação do volume (docker-entrypoint-initdb.d).
+# Volume já existente: rode o echo abaixo dentro do container do db e faça
+#   psql -U postgres -c "SELECT pg_reload_conf()"
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
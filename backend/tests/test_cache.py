@@ -0,0 +1,34 @@
+# backend/tests/test_cache.py
+from app.core.cache import LocalCache
+
+
+def test_set_after_invalidation_is_discarded():
+    cache = LocalCache()
+    generation = cache.generation("map")
+    cache.invalidate("map")  # Import commitou durante a leitura
+    cache.set("map", "k", "antes do import", generation)
+    assert cache.get("map", "k") is None
+
+    cache.set("map", "k", "depois do import", cache.generation("map"))
+    assert cache.get("map", "k") == "depois do import"
+
+
+def test_key_delete_and_clear_also_discard():
+    cache = LocalCache()
+    generation = cache.generation("city")
+    cache.delete("city", "3504107")
+    cache.set("city", "3550308", {}, generation)
+    assert cache.get("city", "3550308") is None
+
+    generation = cache.generation("search")
+    cache.clear()  # Listener reconectou: mensagens podem ter sido perdidas
+    cache.set("search", "ati", [], generation)
+    assert cache.get("search", "ati") is None
+
+
+def test_other_namespace_does_not_interfere():
+    cache = LocalCache()
+    generation = cache.generation("search")
+    cache.invalidate("map")
+    cache.set("search", "ati", ["Atibaia"], generation)
+    assert cache.get("search", "ati") == ["Atibaia"]
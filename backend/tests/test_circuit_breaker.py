@@ -0,0 +1,53 @@
+# backend/tests/test_circuit_breaker.py
+"""A chamada de teste do half_open nunca pode ficar presa (circuito rejeitando para sempre)."""
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.ibge import resilience
+from app.services.ibge.resilience import CircuitBreaker, UpstreamUnavailable, ibge_get
+
+
+@pytest.fixture
+def half_open(monkeypatch):
+    """Circuito 'test' aberto com reset já vencido: a próxima chamada é o teste."""
+    breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=1, window=5, reset_timeout=30.0)
+    breaker.record_failure()
+    breaker._opened_at -= 31.0
+    monkeypatch.setitem(resilience._breakers, "test", breaker)
+    return breaker
+
+
+def fail_get_with(monkeypatch, exc):
+    async def get(self, url, params=None):
+        raise exc
+    monkeypatch.setattr(httpx.AsyncClient, "get", get)
+
+
+def test_cancelled_probe_is_released(monkeypatch, half_open):
+    fail_get_with(monkeypatch, asyncio.CancelledError())
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(ibge_get("test", "http://ibge.test/x"))
+
+    assert half_open.state == "half_open"
+    half_open.before_call()  # Novo teste liberado, sem UpstreamUnavailable
+
+
+def test_unexpected_error_on_probe_reopens(monkeypatch, half_open):
+    fail_get_with(monkeypatch, RuntimeError("boom"))
+    with pytest.raises(RuntimeError):
+        asyncio.run(ibge_get("test", "http://ibge.test/x"))
+
+    assert half_open.state == "open"
+    assert not half_open._probe_in_flight
+
+
+def test_probe_without_outcome_expires(half_open):
+    half_open.before_call()
+    with pytest.raises(UpstreamUnavailable):
+        half_open.before_call()  # Teste em andamento: os demais esperam
+
+    half_open._probe_started -= 31.0
+    half_open.before_call()
+    assert half_open._probe_in_flight
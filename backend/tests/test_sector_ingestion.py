@@ -0,0 +1,158 @@
+# backend/tests/test_sector_ingestion.py
+"""
+Ingestão de setores contra um WFS local (httpx.MockTransport servindo páginas de
+fixture) e um repositório em memória com a mesma semântica do SectorRepository:
+página e checkpoint gravados juntos.
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.ibge.sectors import IbgeSectorService
+
+LAYER = "CGMAT:qg_2022_670_setores"
+
+
+def make_features(total: int):
+    # Códigos fora de ordem de propósito: só o sortBy garante a ordem das páginas
+    codes = sorted((f"35041070500{i:04d}" for i in range(total)), key=lambda c: c[::-1])
+    return [
+        {
+            "type": "Feature",
+            "properties": {"CD_SETOR": code, "CD_MUN": code[:7], "CD_UF": code[:2]},
+            "geometry": {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [0, 0]]]},
+        }
+        for code in codes
+    ]
+
+
+class FakeWfs:
+    """GetFeature com startIndex/count/sortBy; fail_at = startIndex que responde 503 uma vez."""
+
+    def __init__(self, total: int, fail_at=None):
+        self.features = make_features(total)
+        self.fail_at = fail_at
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        assert params["request"] == "GetFeature"
+        assert params["typeNames"] == LAYER
+        start, count = int(params["startIndex"]), int(params["count"])
+        self.requests.append((start, params.get("sortBy")))
+        if start == self.fail_at:
+            self.fail_at = None
+            return httpx.Response(503, text="GeoServer indisponível")
+
+        ordered = self.features
+        if params.get("sortBy", "").split()[0] == "CD_SETOR":
+            ordered = sorted(ordered, key=lambda f: f["properties"]["CD_SETOR"])
+        page = ordered[start:start + count]
+        body = {"type": "FeatureCollection", "numberMatched": len(ordered),
+                "numberReturned": len(page), "features": page}
+        return httpx.Response(200, content=json.dumps(body).encode())
+
+
+class MemorySectorRepository:
+    """Mesma interface do SectorRepository; cada save_page é atômico (página + checkpoint)."""
+
+    def __init__(self):
+        self.sectors = {}
+        self.checkpoints = {}
+        self.pages = 0
+
+    async def get_checkpoint(self, job):
+        return self.checkpoints.get(job)
+
+    async def reset_checkpoint(self, job):
+        self.checkpoints[job] = SimpleNamespace(next_index=0, total_written=0, finished=False)
+
+    async def save_page(self, job, rows, next_index, finished):
+        for row in rows:
+            self.sectors[(row["code"], row["uf_code"])] = row
+        previous = self.checkpoints.get(job)
+        total = (previous.total_written if previous else 0) + len(rows)
+        self.checkpoints[job] = SimpleNamespace(next_index=next_index, total_written=total, finished=finished)
+        self.pages += 1
+
+
+def make_service(wfs: FakeWfs, repo: MemorySectorRepository, page_size: int = 10) -> IbgeSectorService:
+    service = IbgeSectorService(db=None, wfs_url="http://wfs.test/geoserver/ows", page_size=page_size,
+                                transport=httpx.MockTransport(wfs))
+    service.repo = repo
+    return service
+
+
+def test_pages_until_short_page():
+    wfs, repo = FakeWfs(total=25), MemorySectorRepository()
+    result = asyncio.run(make_service(wfs, repo).ingest(LAYER))
+
+    assert result == {"job": LAYER, "status": "finished", "total_written": 25}
+    assert [start for start, _ in wfs.requests] == [0, 10, 20]
+    assert all(sort_by == settings.SECTOR_SORT_BY for _, sort_by in wfs.requests)
+    assert len(repo.sectors) == 25
+    assert repo.checkpoints[LAYER].finished
+
+
+def test_exact_multiple_ends_on_empty_page():
+    wfs, repo = FakeWfs(total=20), MemorySectorRepository()
+    result = asyncio.run(make_service(wfs, repo).ingest(LAYER))
+
+    assert result["total_written"] == 20
+    assert [start for start, _ in wfs.requests] == [0, 10, 20]
+    assert repo.checkpoints[LAYER].next_index == 20
+
+
+def test_sorted_pages_cover_every_feature_once():
+    wfs = FakeWfs(total=37)
+    service = make_service(wfs, MemorySectorRepository(), page_size=8)
+
+    async def collect():
+        return [row["code"] for _, rows, _ in [p async for p in service.iter_pages(LAYER)] for row in rows]
+
+    codes = asyncio.run(collect())
+    assert codes == sorted(f["properties"]["CD_SETOR"] for f in wfs.features)
+
+
+def test_resumes_from_checkpoint_after_failure():
+    wfs, repo = FakeWfs(total=25, fail_at=20), MemorySectorRepository()
+    service = make_service(wfs, repo)
+
+    with pytest.raises(ValueError):
+        asyncio.run(service.ingest(LAYER))
+    # Duas páginas gravadas com o checkpoint; a terceira falhou antes de gravar
+    assert repo.checkpoints[LAYER].next_index == 20
+    assert repo.checkpoints[LAYER].total_written == 20
+    assert not repo.checkpoints[LAYER].finished
+
+    result = asyncio.run(service.ingest(LAYER))
+    assert result["total_written"] == 25
+    # A retomada começa na página que falhou, sem rebaixar as anteriores
+    assert [start for start, _ in wfs.requests] == [0, 10, 20, 20]
+    assert len(repo.sectors) == 25
+
+
+def test_finished_job_is_not_downloaded_again():
+    wfs, repo = FakeWfs(total=15), MemorySectorRepository()
+    service = make_service(wfs, repo)
+    asyncio.run(service.ingest(LAYER))
+    requests = len(wfs.requests)
+
+    result = asyncio.run(service.ingest(LAYER))
+    assert result == {"job": LAYER, "status": "already_finished", "total_written": 15}
+    assert len(wfs.requests) == requests
+
+
+def test_restart_ingests_from_zero():
+    wfs, repo = FakeWfs(total=15), MemorySectorRepository()
+    service = make_service(wfs, repo)
+    asyncio.run(service.ingest(LAYER))
+
+    result = asyncio.run(service.ingest(LAYER, restart=True))
+    assert result == {"job": LAYER, "status": "finished", "total_written": 15}
+    assert [start for start, _ in wfs.requests] == [0, 10, 0, 10]
+    assert len(repo.sectors) == 15